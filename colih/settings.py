@@ -83,6 +83,17 @@ DATABASES = {
     }
 }
 
+# Cache no próprio banco: as versões da configuração de e-mail e dos
+# grupos do GVP precisam ser as mesmas para todos os processos, inclusive
+# em outras máquinas (dynos). A tabela é criada com `createcachetable`
+# (fase release do Procfile).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'colih_cache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
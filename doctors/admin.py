@@ -1,22 +1,28 @@
 from django.contrib import admin
 
-from .models import Doctor, City, Hospital, Specialty, MembroColih, MembroGvp
+from .models import Doctor, City, ExportJob, Hospital, Specialty, MembroColih, MembroGvp, OutboundEmail
 
 # Register your models here.
 
 @admin.register(MembroColih)
 class MembroColihAdmin(admin.ModelAdmin):
-    list_display = ('get_full_name', 'ativo', 'get_visitas_30_dias')
+    list_display = ('get_full_name', 'ativo', 'capacidade', 'get_visitas_30_dias')
     list_filter = ('ativo',)
     search_fields = ('user__first_name', 'user__last_name')
 
+    def get_queryset(self, request):
+        # Usuário e contagem de 30 dias de todos os membros na mesma consulta
+        return super().get_queryset(request).com_visitas_recentes()
+
     def get_full_name(self, obj):
         return obj.user.get_full_name()
     get_full_name.short_description = 'Nome'
+    get_full_name.admin_order_field = 'user__first_name'
 
     def get_visitas_30_dias(self, obj):
-        return obj.total_visitas_recentes
+        return obj.visitas_recentes
     get_visitas_30_dias.short_description = 'Visitas Médicas (30 dias)'
+    get_visitas_30_dias.admin_order_field = 'visitas_recentes'
 
 @admin.register(MembroGvp)
 class MembroGvpAdmin(admin.ModelAdmin):
@@ -40,6 +46,9 @@ class MembroGvpAdmin(admin.ModelAdmin):
         }),
     )
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_visitas_recentes()
+
     # Métodos para exibir dados do modelo User na lista do MembroGvp
     def get_full_name(self, obj):
         return obj.user.get_full_name() or obj.user.username
@@ -51,9 +60,10 @@ class MembroGvpAdmin(admin.ModelAdmin):
     get_email.short_description = 'E-mail'
 
     def get_total_visitas(self, obj):
-        # Utiliza a property que criamos no Model para mostrar no Admin
-        return obj.total_visitas_recentes
+        # Contagem anotada em get_queryset (sem uma consulta por linha)
+        return obj.visitas_recentes
     get_total_visitas.short_description = 'Visitas (30 dias)'
+    get_total_visitas.admin_order_field = 'visitas_recentes'
 
 @admin.register(City)
 class CityAdmin(admin.ModelAdmin):
@@ -103,4 +113,24 @@ class DoctorAdmin(admin.ModelAdmin):
     # Agora que Hospital tem cidade, podemos filtrar médicos pela cidade do hospital também
     list_filter = ('hospital', 'city', 'status')
     
-    search_fields = ('name', 'crm', 'email')
\ No newline at end of file
+    search_fields = ('name', 'crm', 'email')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'file_format', 'status', 'progress', 'total', 'attempts', 'user', 'created_at',
+                    'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('user',)
+    readonly_fields = ('created_at', 'started_at', 'heartbeat_at', 'finished_at', 'filename')
+
+    def get_queryset(self, request):
+        # O arquivo gerado fica no registro: não carrega na listagem
+        return super().get_queryset(request).defer('content')
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at')
@@ -0,0 +1,213 @@
+"""
+Resumos de visitas (VisitRollup) para o painel da página inicial.
+
+Cada gravação de Visit soma ou subtrai 1 nas linhas do dia e do mês da
+visita; a troca de membros (m2m) ajusta só as linhas por membro. O comando
+`rebuild_visit_rollups` recalcula tudo a partir de Visit. Os gráficos
+(`chart_data`) leem apenas VisitRollup.
+"""
+import datetime
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce, TruncMonth
+
+from .models import Doctor, Hospital, Visit, VisitRollup
+
+CHART_MONTHS = 12
+CHART_DAYS = 30
+CHART_SERIES = 6  # demais grupos somados em "Outros"
+
+VISIT_TYPE_LABELS = dict(Visit.VISIT_TYPE_CHOICES)
+
+# grupo do gráfico -> (campos lidos do resumo, linhas por membro?)
+CHART_GROUPS = {
+    'visit_type': (['visit_type'], False),
+    'specialty': (['specialty__name'], False),
+    'city': (['city__name'], False),
+    'hospital': (['hospital__name'], False),
+    'member': (['member__first_name', 'member__last_name'], True),
+}
+
+
+def visit_dimensions(visit):
+    """(data, tipo, especialidade, hospital, cidade) de uma visita."""
+    city_id = None
+    if visit.hospital_id:
+        city_id = Hospital.objects.filter(pk=visit.hospital_id).values_list('city_id', flat=True).first()
+    if city_id is None and visit.doctor_id:
+        city_id = Doctor.objects.filter(pk=visit.doctor_id).values_list('city_id', flat=True).first()
+    return visit.visit_date, visit.visit_type, visit.specialty_id, visit.hospital_id, city_id
+
+
+def previous_dimensions(visit):
+    """Dimensões gravadas no banco antes de uma edição (None para visita nova)."""
+    if not visit.pk:
+        return None
+    saved = Visit.objects.filter(pk=visit.pk)\
+        .only('doctor_id', 'visit_date', 'visit_type', 'specialty_id', 'hospital_id').first()
+    return visit_dimensions(saved) if saved else None
+
+
+def _apply(dimensions, member_ids, delta, totals=True):
+    """
+    Soma delta nas linhas do dia e do mês. Cada combinação tem uma linha só
+    (visitrollup_unique_key): quem perde a corrida para criá-la cai no
+    get_or_create e soma na linha do outro; o desconto trava a linha antes
+    de decidir entre apagá-la e descontar.
+    """
+    visit_date, visit_type, specialty_id, hospital_id, city_id = dimensions
+    members = ([None] if totals else []) + list(member_ids)
+    with transaction.atomic():
+        for period, start in (('D', visit_date), ('M', visit_date.replace(day=1))):
+            for member_id in members:
+                key = {
+                    'period': period, 'period_start': start, 'visit_type': visit_type, 'specialty_id': specialty_id,
+                    'hospital_id': hospital_id, 'city_id': city_id, 'member_id': member_id,
+                }
+                rows = VisitRollup.objects.filter(**key)
+                if delta > 0:
+                    if not rows.update(count=F('count') + delta):
+                        row, created = VisitRollup.objects.get_or_create(defaults={'count': delta}, **key)
+                        if not created:
+                            rows.filter(pk=row.pk).update(count=F('count') + delta)
+                    continue
+                row = rows.select_for_update().first()
+                if row is None:
+                    continue
+                if row.count <= -delta:
+                    row.delete()
+                else:
+                    rows.filter(pk=row.pk).update(count=F('count') + delta)
+
+
+def visit_saved(visit, created, previous=None):
+    dimensions = visit_dimensions(visit)
+    if created:
+        # Os membros ainda não foram gravados: entram pelo m2m_changed
+        _apply(dimensions, [], 1)
+    elif previous is not None and previous != dimensions:
+        members = list(visit.members.values_list('id', flat=True))
+        _apply(previous, members, -1)
+        _apply(dimensions, members, 1)
+
+
+def visits_added(visits, member_ids):
+    """
+    Visitas gravadas em lote (bulk_create, sem sinais), todas com os mesmos
+    membros: as cidades vêm em duas consultas e cada combinação de
+    dimensões é somada de uma vez.
+    """
+    hospital_city = dict(Hospital.objects.filter(pk__in={visit.hospital_id for visit in visits if visit.hospital_id})
+                         .values_list('id', 'city_id'))
+    doctor_city = dict(Doctor.objects.filter(pk__in={visit.doctor_id for visit in visits})
+                       .values_list('id', 'city_id'))
+    grouped = Counter(
+        (visit.visit_date, visit.visit_type, visit.specialty_id, visit.hospital_id,
+         hospital_city.get(visit.hospital_id) or doctor_city.get(visit.doctor_id))
+        for visit in visits
+    )
+    for dimensions, count in grouped.items():
+        _apply(dimensions, member_ids, count)
+
+
+def visit_deleted(visit):
+    members = list(visit.members.values_list('id', flat=True))
+    _apply(visit_dimensions(visit), members, -1)
+
+
+def members_changed(visit, member_ids, delta):
+    if member_ids:
+        _apply(visit_dimensions(visit), member_ids, delta, totals=False)
+
+
+def rebuild_visit_rollups(batch_size=1000):
+    """Recria todos os resumos com GROUP BY sobre Visit. Retorna o total de linhas."""
+    VisitRollup.objects.all().delete()
+    sources = [
+        # (consulta, prefixo do caminho até Visit, campo do membro)
+        (Visit.objects.all(), '', None),
+        (Visit.members.through.objects.all(), 'visit__', 'user_id'),
+    ]
+    total = 0
+    for period, trunc in (('D', F), ('M', TruncMonth)):
+        for queryset, prefix, member in sources:
+            grouped = queryset.order_by().annotate(
+                start=trunc('%svisit_date' % prefix),
+                visit_type_key=F('%svisit_type' % prefix),
+                specialty_key=F('%sspecialty' % prefix),
+                hospital_key=F('%shospital' % prefix),
+                city_key=Coalesce('%shospital__city' % prefix, '%sdoctor__city' % prefix),
+                member_key=F(member) if member else Value(None, output_field=IntegerField()),
+            ).values_list('start', 'visit_type_key', 'specialty_key', 'hospital_key', 'city_key', 'member_key')\
+                .annotate(n=Count('pk'))
+            rows = [
+                VisitRollup(period=period, period_start=start, visit_type=visit_type, specialty_id=specialty_id,
+                            hospital_id=hospital_id, city_id=city_id, member_id=member_id, count=n)
+                for start, visit_type, specialty_id, hospital_id, city_id, member_id, n in grouped.iterator()
+            ]
+            VisitRollup.objects.bulk_create(rows, batch_size=batch_size)
+            total += len(rows)
+    return total
+
+
+def _month_starts(today, months):
+    start = today.replace(day=1)
+    result = [start]
+    for _ in range(months - 1):
+        start = (start - datetime.timedelta(days=1)).replace(day=1)
+        result.append(start)
+    return result[::-1]
+
+
+def _group_label(group, values):
+    if group == 'visit_type':
+        return VISIT_TYPE_LABELS.get(values[0], values[0])
+    label = ' '.join(value for value in values if value)
+    return label or 'Não informado'
+
+
+def chart_data(group, today=None, months=CHART_MONTHS):
+    """
+    Séries mensais por grupo para o Chart.js:
+    {'labels': ['01/2025', ...], 'datasets': [{'label', 'data'}], 'totals': [{'label', 'total'}]}.
+    """
+    today = today or datetime.date.today()
+    fields, per_member = CHART_GROUPS[group]
+    starts = _month_starts(today, months)
+    # Limitado aos dois lados: visitas com data futura ficam fora da janela
+    rows = VisitRollup.objects.filter(period='M', period_start__gte=starts[0], period_start__lte=starts[-1],
+                                      member__isnull=not per_member)\
+        .values_list('period_start', *fields).annotate(total=Sum('count')).order_by()
+
+    series = {}
+    for start, *values, total in rows:
+        label = _group_label(group, values)
+        series.setdefault(label, dict.fromkeys(starts, 0))[start] += total
+    ranked = sorted(series.items(), key=lambda item: (-sum(item[1].values()), item[0]))
+    if len(ranked) > CHART_SERIES:
+        others = dict.fromkeys(starts, 0)
+        for _, months_total in ranked[CHART_SERIES - 1:]:
+            for start, total in months_total.items():
+                others[start] += total
+        ranked = ranked[:CHART_SERIES - 1] + [('Outros', others)]
+    return {
+        'labels': [start.strftime('%m/%Y') for start in starts],
+        'datasets': [{'label': label, 'data': [months_total[start] for start in starts]} for label, months_total in ranked],
+        'totals': [{'label': label, 'total': sum(months_total.values())} for label, months_total in ranked],
+    }
+
+
+def daily_chart_data(today=None, days=CHART_DAYS):
+    today = today or datetime.date.today()
+    first = today - datetime.timedelta(days=days - 1)
+    totals = dict(
+        VisitRollup.objects.filter(period='D', period_start__gte=first, period_start__lte=today, member__isnull=True)
+        .values_list('period_start').annotate(total=Sum('count')).order_by()
+    )
+    dates = [first + datetime.timedelta(days=i) for i in range(days)]
+    return {
+        'labels': [date.strftime('%d/%m') for date in dates],
+        'datasets': [{'label': 'Visitas', 'data': [totals.get(date, 0) for date in dates]}],
+    }
@@ -0,0 +1,122 @@
+"""
+Arquivamento dos casos finalizados.
+
+Planilhas com situação FIN sem alteração há mais de ARCHIVE_AFTER_DAYS
+dias saem das tabelas quentes junto com as visitas GVP e o histórico:
+cada caso vira uma linha de ArchivedCase com as colunas de busca e o
+restante serializado (serializers do Django, mesmo formato do dumpdata) e
+comprimido com zlib. O arquivamento anda em lotes de ARCHIVE_CHUNK casos,
+cada lote na sua transação, de modo que uma execução longa não segura o
+banco e pode ser interrompida a qualquer momento.
+
+As listagens de emergência e do GVP continuam lendo só as tabelas
+quentes; os arquivados têm uma busca própria (search_archive), mais lenta,
+por trecho do nome normalizado.
+"""
+import datetime
+import json
+import zlib
+
+from django.core import serializers
+from django.db import transaction
+from django.db.models import Prefetch, Q
+
+from .models import ArchivedCase, CaseHistory, GvpVisit, PlanilhaEmergencia
+from .printable import RELATED, sheet_sections
+from .search import normalize_search
+
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_CHUNK = 100
+
+
+def archivable(days=ARCHIVE_AFTER_DAYS, now=None):
+    """Casos finalizados sem alteração há mais de `days` dias."""
+    cutoff = (now or datetime.datetime.now()) - datetime.timedelta(days=days)
+    return PlanilhaEmergencia.objects.filter(status_gvp='FIN', updated_at__lt=cutoff)
+
+
+def _visit_summary(visit):
+    return {
+        'id': visit.id,
+        'submission_date': visit.submission_date.strftime('%d/%m/%Y %H:%M'),
+        'status_patient': visit.status_patient,
+        'action_taken': visit.action_taken,
+        'designated_members': [member.get_full_name() or member.username for member in visit.designated_members.all()],
+    }
+
+
+def _payload(planilha):
+    visits = list(planilha.gvp_followups.all())
+    history = list(planilha.history.all())
+    data = {
+        # Registros completos, no formato do loaddata
+        'records': json.loads(serializers.serialize('json', [planilha] + visits + history)),
+        # Já formatados para a consulta do arquivo
+        'sheet': sheet_sections(planilha),
+        'visits': [_visit_summary(visit) for visit in visits],
+    }
+    return zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+def load_payload(archived):
+    return json.loads(zlib.decompress(bytes(archived.payload)).decode('utf-8'))
+
+
+@transaction.atomic
+def archive_chunk(ids, days=ARCHIVE_AFTER_DAYS, now=None):
+    """Arquiva os casos `ids` que ainda estiverem aptos; devolve quantos foram."""
+    # Refiltra dentro da transação: o caso pode ter sido reaberto no meio
+    planilhas = list(
+        archivable(days, now).filter(id__in=ids).select_related(*RELATED).prefetch_related(
+            Prefetch('gvp_followups', queryset=GvpVisit.objects.order_by('submission_date', 'id')),
+            'gvp_followups__designated_members',
+            Prefetch('history', queryset=CaseHistory.objects.order_by('created_at', 'id')),
+        )
+    )
+    if not planilhas:
+        return 0
+    ArchivedCase.objects.bulk_create([
+        ArchivedCase(
+            original_id=planilha.id,
+            nome_paciente=planilha.nome_paciente,
+            nome_paciente_search=planilha.nome_paciente_search or normalize_search(planilha.nome_paciente),
+            hospital=planilha.nome_hospital.name if planilha.nome_hospital else '',
+            data_hora_contato=planilha.data_hora_contato,
+            finalized_at=planilha.updated_at,
+            visits=len(planilha.gvp_followups.all()),
+            payload=_payload(planilha),
+        )
+        for planilha in planilhas
+    ])
+    # Visitas, designações e histórico saem em cascata; os sinais limpam os índices de busca e telefones
+    PlanilhaEmergencia.objects.filter(id__in=[planilha.id for planilha in planilhas]).delete()
+    return len(planilhas)
+
+
+def archive_finalized(days=ARCHIVE_AFTER_DAYS, chunk_size=ARCHIVE_CHUNK, now=None, stdout=None):
+    """Arquiva todos os casos aptos, lote a lote; devolve o total arquivado."""
+    total = 0
+    last_id = 0
+    while True:
+        # Ids em ordem: cada lote lê a partir do último, sem reler o que já passou
+        ids = list(archivable(days, now).filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        last_id = ids[-1]
+        total += archive_chunk(ids, days, now)
+        if stdout:
+            stdout.write(f'{total} caso(s) arquivado(s)...')
+
+
+def search_archive(nome_paciente='', hospital=''):
+    """
+    Filtro dos casos arquivados por trecho do nome do paciente e do
+    hospital. É uma varredura da tabela de arquivo (sem o índice de busca
+    das tabelas quentes), aceitável para consultas eventuais.
+    """
+    filter_search = Q()
+    if normalize_search(nome_paciente):
+        filter_search &= Q(nome_paciente_search__contains=normalize_search(nome_paciente))
+    if hospital:
+        filter_search &= Q(hospital__icontains=hospital.strip())
+    return ArchivedCase.objects.filter(filter_search)
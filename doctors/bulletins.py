@@ -0,0 +1,88 @@
+"""
+Boletins de WhatsApp dos casos GVP.
+
+O trecho de cada caso fica no cache com a chave (id, updated_at): qualquer
+alteração da planilha muda a chave, e casos sem alteração não são
+renderizados de novo. O boletim diário lê os casos em andamento numa
+consulta só pelos índices e carrega os campos de texto apenas dos casos
+que não estão no cache.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import PlanilhaEmergencia
+
+CACHE_SECONDS = 24 * 60 * 60
+SEPARADOR = "------------------------------------------\n"
+
+SNIPPET_FIELDS = ('nome_paciente', 'numero_quarto', 'medico_responsavel', 'problema_especifico',
+                  'estrategias_opcoes', 'status_gvp', 'updated_at', 'nome_hospital__name')
+
+
+def _cache_key(planilha_id, updated_at):
+    return 'doctors:boletim:%s:%s' % (planilha_id, updated_at.isoformat())
+
+
+def render_snippet(p):
+    return (
+        f"*👤 PACIENTE:* {p.nome_paciente}\n"
+        f"*🏥 HOSPITAL:* {p.nome_hospital.name if p.nome_hospital else 'Não informado'}\n"
+        f"*🚪 QUARTO:* {p.numero_quarto or '-'}\n"
+        f"*🩺 MÉDICO:* {p.medico_responsavel}\n"
+        f"*📝 DIAGNÓSTICO:* {p.problema_especifico[:200]}...\n\n"
+        f"*💡 ESTRATÉGIA:* {p.estrategias_opcoes[:200]}...\n\n"
+        f"*📍 SITUAÇÃO GVP:* {p.get_status_gvp_display()}\n"
+    )
+
+
+def case_snippets(queryset):
+    """
+    [(id, nome do paciente, trecho)] dos casos de `queryset`, na ordem dele.
+    Só os casos fora do cache são carregados por inteiro e renderizados.
+    """
+    cases = list(queryset.values_list('id', 'nome_paciente', 'updated_at'))
+    keys = {planilha_id: _cache_key(planilha_id, updated_at) for planilha_id, _, updated_at in cases}
+    cached = cache.get_many(keys.values())
+    missing = [planilha_id for planilha_id, key in keys.items() if key not in cached]
+    if missing:
+        rendered = {
+            keys[p.id]: render_snippet(p)
+            for p in PlanilhaEmergencia.objects.filter(id__in=missing)
+            .select_related('nome_hospital').only(*SNIPPET_FIELDS)
+            if p.id in keys
+        }
+        cache.set_many(rendered, CACHE_SECONDS)
+        cached.update(rendered)
+    return [
+        (planilha_id, nome_paciente, cached[keys[planilha_id]])
+        for planilha_id, nome_paciente, _ in cases
+        if keys[planilha_id] in cached
+    ]
+
+
+def footer(user, when):
+    return f"_Gerado via Sistema COLIH/GVP em {when.strftime('%d/%m/%Y %H:%M')} por {user.first_name + ' ' + user.last_name}_"
+
+
+def case_bulletin(planilha, user):
+    """Boletim de um caso (botão de WhatsApp da listagem)."""
+    [(_, _, snippet)] = case_snippets(PlanilhaEmergencia.objects.filter(id=planilha.id))
+    return (
+        f"*📋 BOLETIM DE ACOMPANHAMENTO - GVP*\n\n"
+        f"{snippet}"
+        f"{SEPARADOR}"
+        f"{footer(user, planilha.updated_at)}"
+    )
+
+
+def daily_bulletin(queryset, user):
+    """Boletim único com todos os casos de `queryset`: (texto, [(id, paciente, trecho)])."""
+    snippets = case_snippets(queryset)
+    now = timezone.now()
+    texto = (
+        f"*📋 BOLETIM DIÁRIO - GVP ({now.strftime('%d/%m/%Y')})*\n"
+        f"*{len(snippets)} caso(s) em acompanhamento*\n\n"
+        + "\n".join(snippet + SEPARADOR for _, _, snippet in snippets)
+        + footer(user, now)
+    )
+    return texto, snippets
@@ -0,0 +1,39 @@
+"""
+Opções de select e contagens em cache (lidas em toda página de listagem).
+
+O valor fica no cache do Django até um sinal de alteração (signals.py)
+apagá-lo: o formulário valida pela lista e a listagem mostra o total sem
+consultar o banco.
+"""
+from django.core.cache import cache
+
+from .models import Doctor, Hospital
+
+HOSPITALS_KEY = 'doctors:hospital_choices'
+DOCTOR_TOTAL_KEY = 'doctors:doctor_total'
+EMPTY_CHOICE = ('', '---------')
+
+
+def hospital_choices():
+    choices = cache.get(HOSPITALS_KEY)
+    if choices is None:
+        choices = list(Hospital.objects.order_by('name', 'id').values_list('id', 'name'))
+        cache.set(HOSPITALS_KEY, choices, None)
+    return [EMPTY_CHOICE] + choices
+
+
+def invalidate_hospital_choices():
+    cache.delete(HOSPITALS_KEY)
+
+
+def doctor_total():
+    """Total de médicos cadastrados (o "de N" da listagem)."""
+    total = cache.get(DOCTOR_TOTAL_KEY)
+    if total is None:
+        total = Doctor.objects.count()
+        cache.set(DOCTOR_TOTAL_KEY, total, None)
+    return total
+
+
+def invalidate_doctor_total():
+    cache.delete(DOCTOR_TOTAL_KEY)
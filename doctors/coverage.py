@@ -0,0 +1,59 @@
+"""
+Relatório de cobertura: médicos sem visita nos últimos N dias.
+
+"Sem visita" é um anti-join (NOT EXISTS) sobre Visit no índice
+(doctor, visit_date): para cada médico o banco só verifica se existe uma
+entrada do médico com data a partir do corte, sem ler as visitas. O resumo
+por cidade/especialidade sai numa única agregação condicional.
+"""
+import datetime
+
+from django.db.models import Count, Exists, OuterRef, Q
+
+from .filters import doctor_filters
+from .models import Doctor, Visit
+
+COVERAGE_DAYS = 180
+MAX_COVERAGE_DAYS = 3650
+
+# agrupamento do resumo -> campo lido de Doctor
+COVERAGE_GROUPS = {
+    'city': 'city__name',
+    'specialty': 'specialty__name',
+    'hospital': 'hospital__name',
+}
+
+
+def coverage_days(params):
+    try:
+        days = int(params.get('days') or COVERAGE_DAYS)
+    except (TypeError, ValueError):
+        return COVERAGE_DAYS
+    return min(max(days, 1), MAX_COVERAGE_DAYS)
+
+
+def visited_since(days, today=None):
+    """Exists: o médico teve alguma visita nos últimos `days` dias."""
+    cutoff = (today or datetime.date.today()) - datetime.timedelta(days=days)
+    return Exists(Visit.objects.filter(doctor=OuterRef('pk'), visit_date__gte=cutoff).order_by())
+
+
+def overdue_doctors(params, today=None):
+    """Médicos (filtros de doctor_filters) sem visita no período de `params['days']`."""
+    return Doctor.objects.filter(doctor_filters(params))\
+        .filter(~visited_since(coverage_days(params), today))
+
+
+def coverage_summary(params, group='city', today=None):
+    """[{'label', 'total', 'overdue', 'percent'}] do grupo, dos mais descobertos para os menos."""
+    field = COVERAGE_GROUPS.get(group, COVERAGE_GROUPS['city'])
+    rows = Doctor.objects.filter(doctor_filters(params)).order_by()\
+        .values_list(field)\
+        .annotate(total=Count('id'), overdue=Count('id', filter=~Q(visited_since(coverage_days(params), today))))
+    summary = [
+        {'label': label or 'Não informado', 'total': total, 'overdue': overdue,
+         'percent': round(100.0 * overdue / total, 1) if total else 0}
+        for label, total, overdue in rows
+    ]
+    summary.sort(key=lambda row: (-row['overdue'], row['label']))
+    return summary
@@ -0,0 +1,48 @@
+"""
+Configuração de e-mail (EmailConfiguration) em cache no processo.
+
+Cada processo guarda a configuração e os parâmetros de conexão já
+montados junto com a versão em que foram lidos. A versão é compartilhada
+entre os processos (versions.py): salvar ou apagar a configuração (sinais
+em signals.py) troca a versão, e cada processo só volta ao banco quando
+percebe a troca. Enquanto isso, ler a configuração não consulta o banco.
+"""
+from .models import EmailConfiguration
+from .versions import bump_version, current_version
+
+VERSION_KEY = 'doctors:email_config_version'
+
+_local = {'version': None, 'config': None, 'params': None}
+
+
+def _load(version):
+    config = EmailConfiguration.objects.first()
+    params = None
+    if config is not None:
+        params = {
+            'host': config.smtp_server,
+            'port': config.smtp_port,
+            'username': config.email_user,
+            'password': config.email_password,
+            'use_tls': config.use_tls,
+        }
+    _local.update(version=version, config=config, params=params)
+
+
+def get_email_config():
+    """Configuração ativa (ou None) sem consultar o banco enquanto a versão não mudar."""
+    version = current_version(VERSION_KEY)
+    if version is None or version != _local['version']:
+        _load(version)
+    return _local['config']
+
+
+def connection_params():
+    """Parâmetros para get_connection() da configuração ativa (ou None)."""
+    get_email_config()
+    return _local['params']
+
+
+def invalidate_email_config():
+    _local.update(version=None, config=None, params=None)
+    bump_version(VERSION_KEY)
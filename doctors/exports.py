@@ -0,0 +1,259 @@
+"""
+Pipeline de exportação em memória constante.
+
+As linhas saem de um `.iterator()` em blocos e alimentam tanto a planilha
+XLSX (workbook write-only do openpyxl) quanto o CSV, que é enviado ao
+navegador à medida que é gerado.
+"""
+import csv
+import datetime
+from collections import namedtuple
+
+import openpyxl
+from django.db.models import Max
+from django.db.models.functions import Length
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from .coverage import overdue_doctors
+from .filters import (COVERAGE_FILTER_KEYS, DOCTOR_FILTER_KEYS, PLANILHA_FILTER_KEYS, VISIT_FILTER_KEYS,
+                      doctor_filters, planilha_filters, visit_filters)
+from .models import Doctor, PlanilhaEmergencia, Visit
+
+CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (cabeçalho, campo usado para medir a largura da coluna ou None)
+DOCTOR_COLUMNS = [
+    ('Nome completo do Médico', 'name'),
+    ('Especialidade 1', 'specialty__name'),
+    ('Especialidade 2 (opcional)', 'specialty2__name'),
+    ('Especialidade 3 (opcional)', 'specialty3__name'),
+    ('Subespecialidade (opcional)', 'subspecialty'),
+    ('Tipo de paciente', 'type_patient'),
+    ('Atende SUS?', None),
+    ('Faz cirurgias?', None),
+    ('Data da última visita ', None),
+    ('É Testemunha de Jeová?', None),
+    ('É Consultor  informado ao HID?', None),
+    ('CRM', 'crm'),
+    ('Hospital', 'hospital__name'),
+    ('Cidade', 'city__name'),
+    ('Atende particular?', None),
+    ('Total de visitas', None),
+    ('Tipo da última visita', None),
+]
+
+
+VISIT_COLUMNS = [
+    ('Data da Visita', None),
+    ('Médico', 'doctor__name'),
+    ('Tipo de Visita', None),
+    ('Especialidade Abordada', 'specialty__name'),
+    ('Local da Visita (Hospital)', 'hospital__name'),
+    ('Artigo Apresentado / Assunto', 'article'),
+    ('Desfecho / Resultado', None),
+]
+
+PLANILHA_COLUMNS = [
+    ('Data/hora do contato', None),
+    ('Nome do paciente', 'nome_paciente'),
+    ('Nome do Hospital', 'nome_hospital__name'),
+    ('Médico responsável', 'medico_responsavel'),
+    ('Nome da pessoa que telefonou', 'nome_telefonou'),
+    ('Contato da pessoa que telefonou', 'contato_telefonou'),
+    ('Situação do GVP', None),
+]
+
+COVERAGE_COLUMNS = [
+    ('Nome do Médico', 'name'),
+    ('Especialidade', 'specialty__name'),
+    ('Hospital', 'hospital__name'),
+    ('Cidade', 'city__name'),
+    ('Última visita', None),
+    ('Tipo da última visita', None),
+    ('Dias sem visita', None),
+    ('Total de visitas', None),
+]
+
+
+VISIT_TYPE_LABELS = dict(Visit.VISIT_TYPE_CHOICES)
+
+
+def yes_no(value):
+    return 'Sim' if value else 'Não'
+
+
+def doctor_export_queryset(filter_search):
+    # Todas as FKs lidas na linha vêm no mesmo SELECT
+    return Doctor.objects.filter(filter_search)\
+        .select_related('specialty', 'specialty2', 'specialty3', 'hospital', 'city')\
+        .order_by('name', 'id')
+
+
+def doctor_row(doctor):
+    return [
+        doctor.name,
+        doctor.specialty.name if doctor.specialty else "",
+        doctor.specialty2.name if doctor.specialty2 else "",
+        doctor.specialty3.name if doctor.specialty3 else "",
+        doctor.subspecialty if doctor.subspecialty else "",
+        doctor.type_patient,
+        yes_no(doctor.attends_sus),
+        yes_no(doctor.performs_surgeries),
+        doctor.last_visit.strftime('%d/%m/%Y') if doctor.last_visit else "",
+        yes_no(doctor.is_jehovah_witness),
+        yes_no(doctor.is_hid_consultant),
+        doctor.crm or "",
+        doctor.hospital.name if doctor.hospital else "",
+        doctor.city.name if doctor.city else "",
+        yes_no(doctor.attends_private),
+        doctor.visit_count,
+        VISIT_TYPE_LABELS.get(doctor.last_visit_type, ""),
+    ]
+
+
+def visit_export_queryset(filter_search):
+    return Visit.objects.filter(filter_search)\
+        .select_related('doctor', 'specialty', 'hospital')\
+        .only('visit_date', 'visit_type', 'article', 'outcome',
+              'doctor__name', 'specialty__name', 'hospital__name')\
+        .order_by('-visit_date', '-id')
+
+
+def visit_row(visit):
+    return [
+        visit.visit_date.strftime('%d/%m/%Y'),
+        visit.doctor.name,
+        visit.get_visit_type_display(),
+        visit.specialty.name,
+        visit.hospital.name if visit.hospital else "",
+        visit.article or "",
+        visit.outcome or "",
+    ]
+
+
+def planilha_export_queryset(filter_search):
+    # Só as colunas exportadas; os campos de texto longos ficam de fora
+    return PlanilhaEmergencia.objects.filter(filter_search)\
+        .select_related('nome_hospital')\
+        .only('data_hora_contato', 'nome_paciente', 'medico_responsavel', 'nome_telefonou',
+              'contato_telefonou', 'status_gvp', 'nome_hospital__name')\
+        .order_by('-data_hora_contato', '-id')
+
+
+def planilha_row(planilha):
+    return [
+        planilha.data_hora_contato.strftime('%d/%m/%Y %H:%M'),
+        planilha.nome_paciente,
+        planilha.nome_hospital.name if planilha.nome_hospital else "",
+        planilha.medico_responsavel,
+        planilha.nome_telefonou,
+        planilha.contato_telefonou,
+        planilha.get_status_gvp_display() or "",
+    ]
+
+
+def coverage_export_queryset(params):
+    return overdue_doctors(params)\
+        .select_related('specialty', 'hospital', 'city')\
+        .only('name', 'last_visit', 'last_visit_type', 'visit_count',
+              'specialty__name', 'hospital__name', 'city__name')\
+        .order_by('name', 'id')
+
+
+def coverage_row(doctor):
+    return [
+        doctor.name,
+        doctor.specialty.name if doctor.specialty else "",
+        doctor.hospital.name if doctor.hospital else "",
+        doctor.city.name if doctor.city else "",
+        doctor.last_visit.strftime('%d/%m/%Y') if doctor.last_visit else "Nunca visitado",
+        VISIT_TYPE_LABELS.get(doctor.last_visit_type, ""),
+        (datetime.date.today() - doctor.last_visit).days if doctor.last_visit else "",
+        doctor.visit_count,
+    ]
+
+
+ExportKind = namedtuple('ExportKind', 'title filename permission filter_keys columns queryset row')
+
+EXPORT_KINDS = {
+    'doctors': ExportKind(
+        'Lista de Médicos', 'Relatorio_Medicos', 'doctors.view_doctor', DOCTOR_FILTER_KEYS,
+        DOCTOR_COLUMNS, lambda params: doctor_export_queryset(doctor_filters(params)), doctor_row,
+    ),
+    'visits': ExportKind(
+        'Histórico de Visitas', 'Relatorio_Visitas', 'doctors.view_visit', VISIT_FILTER_KEYS,
+        VISIT_COLUMNS, lambda params: visit_export_queryset(visit_filters(params)), visit_row,
+    ),
+    'planilhas': ExportKind(
+        'Planilhas de Emergência', 'Relatorio_Planilhas', 'doctors.view_planilhaemergencia', PLANILHA_FILTER_KEYS,
+        PLANILHA_COLUMNS, lambda params: planilha_export_queryset(planilha_filters(params)), planilha_row,
+    ),
+    'coverage': ExportKind(
+        'Médicos sem Visita', 'Relatorio_Cobertura', 'doctors.view_doctor', COVERAGE_FILTER_KEYS,
+        COVERAGE_COLUMNS, coverage_export_queryset, coverage_row,
+    ),
+}
+
+
+def export_rows(queryset, row_func, chunk_size=CHUNK_SIZE):
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        yield row_func(obj)
+
+
+def column_widths(queryset, columns):
+    """
+    Largura de cada coluna calculada pelo banco numa única agregação.
+
+    O workbook write-only grava as larguras antes da primeira linha, então
+    elas precisam ser conhecidas de antemão; assim evitamos percorrer as
+    células uma segunda vez.
+    """
+    measured = [field for _, field in columns if field]
+    maximos = queryset.order_by().aggregate(**{
+        'w%d' % i: Max(Length(field)) for i, field in enumerate(measured)
+    }) if measured else {}
+    widths = []
+    for header, field in columns:
+        longest = len(header)
+        if field:
+            longest = max(longest, maximos['w%d' % measured.index(field)] or 0)
+        widths.append(longest + 2)
+    return widths
+
+
+def write_xlsx(fileobj, title, columns, rows, widths=None):
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for i, width in enumerate(widths or [], start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    # Cabeçalho em negrito com cor de fundo
+    header = []
+    for name, _ in columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="4E73DF", end_color="4E73DF", fill_type="solid")
+        header.append(cell)
+    ws.append(header)
+
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+class Echo:
+    """Pseudo-arquivo: o csv.writer devolve a linha em vez de gravá-la."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(Echo(), delimiter=';')
+    # BOM para o Excel reconhecer o UTF-8 (acentos)
+    yield '\ufeff' + writer.writerow([name for name, _ in columns])
+    for row in rows:
+        yield writer.writerow(row)
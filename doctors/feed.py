@@ -0,0 +1,101 @@
+"""
+Feed de alterações dos casos GVP para o painel ao vivo.
+
+Cada tabela (PlanilhaEmergencia e GvpVisit) tem o seu cursor em
+(updated_at, id), no mesmo formato da paginação por cursor: consultar o
+que mudou é uma leitura por intervalo no índice (updated_at, id), e o
+painel só recebe as linhas alteradas desde o último cursor.
+
+O updated_at é carimbado no save(), antes do commit: uma transação mais
+lenta pode ficar visível só depois que o cursor já passou do seu horário.
+Por isso cada consulta relê também os FEED_OVERLAP_SECONDS anteriores ao
+cursor, e o painel descarta o que já tinha (mesmo id e mesma `version`).
+"""
+import datetime
+
+from .models import GvpVisit, PlanilhaEmergencia
+from .pagination import decode_cursor, encode_cursor, keyset_paginate
+
+FEED_LIMIT = 200
+FEED_OVERLAP_SECONDS = 10
+FEED_START = ['1970-01-01 00:00:00', 0]  # cursor de uma tabela ainda vazia
+BOARD_STATUSES = ('AND', 'FIN')
+
+FEED_KEYS = ('updated_at', 'id')
+
+
+def _latest_cursor(queryset):
+    latest = queryset.order_by('-updated_at', '-id').values_list(*FEED_KEYS).first()
+    return encode_cursor(latest or FEED_START)
+
+
+def feed_cursors():
+    """Cursores atuais (o painel recebe só o que mudar a partir daqui)."""
+    return {
+        'planilhas': _latest_cursor(PlanilhaEmergencia.objects.all()),
+        'visits': _latest_cursor(GvpVisit.objects.all()),
+    }
+
+
+def planilha_payload(planilha):
+    return {
+        'id': planilha.id,
+        'nome_paciente': planilha.nome_paciente,
+        'hospital': planilha.nome_hospital.name if planilha.nome_hospital else '',
+        'status_gvp': planilha.status_gvp,
+        'status_display': planilha.get_status_gvp_display() or '',
+        'on_board': planilha.status_gvp in BOARD_STATUSES,
+        'updated_at': planilha.updated_at.strftime('%d/%m/%Y %H:%M'),
+        'version': planilha.updated_at.isoformat(),
+    }
+
+
+def visit_payload(visit):
+    return {
+        'id': visit.id,
+        'planilha_id': visit.planilha_id,
+        'nome_paciente': visit.planilha.nome_paciente,
+        'status_patient': visit.status_patient,
+        'updated_at': visit.updated_at.strftime('%d/%m/%Y %H:%M'),
+        'version': visit.updated_at.isoformat(),
+    }
+
+
+def _overlap(queryset, cursor, limit):
+    """Linhas dos FEED_OVERLAP_SECONDS até o cursor (inclusive), para pegar commits atrasados."""
+    values = decode_cursor(cursor, len(FEED_KEYS))
+    try:
+        until = datetime.datetime.fromisoformat(values[0])
+        last_id = int(values[1])
+    except (TypeError, ValueError):
+        return []
+    since = until - datetime.timedelta(seconds=FEED_OVERLAP_SECONDS)
+    window = queryset.filter(updated_at__gte=since, updated_at__lte=until).exclude(updated_at=until, id__gt=last_id)
+    return list(window.order_by(*FEED_KEYS)[:limit])
+
+
+def _changed(queryset, cursor, limit):
+    page = keyset_paginate(queryset, FEED_KEYS, after=cursor, per_page=limit)
+    rows = list(page)
+    next_cursor = encode_cursor(getattr(rows[-1], key) for key in FEED_KEYS) if rows else cursor
+    return _overlap(queryset, cursor, limit) + rows, next_cursor, page.has_next
+
+
+def changes_since(scope, planilhas_cursor, visits_cursor, limit=FEED_LIMIT):
+    """
+    Planilhas e visitas GVP alteradas depois dos cursores, dentro do
+    escopo `scope` (ver filters.gvp_scope_q), com os novos cursores.
+    """
+    planilhas = PlanilhaEmergencia.objects.filter(scope).select_related('nome_hospital')\
+        .only('nome_paciente', 'status_gvp', 'updated_at', 'nome_hospital__name')
+    visits = GvpVisit.objects.select_related('planilha').only('status_patient', 'updated_at', 'planilha__nome_paciente')
+    if scope:
+        visits = visits.filter(planilha__in=PlanilhaEmergencia.objects.filter(scope).values('id'))
+    changed_planilhas, planilhas_cursor, more_planilhas = _changed(planilhas, planilhas_cursor, limit)
+    changed_visits, visits_cursor, more_visits = _changed(visits, visits_cursor, limit)
+    return {
+        'planilhas': [planilha_payload(planilha) for planilha in changed_planilhas],
+        'visits': [visit_payload(visit) for visit in changed_visits],
+        'cursors': {'planilhas': planilhas_cursor, 'visits': visits_cursor},
+        'more': more_planilhas or more_visits,
+    }
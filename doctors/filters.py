@@ -0,0 +1,99 @@
+"""
+Filtros das listagens montados a partir dos parâmetros GET.
+
+São usados tanto pelas views quanto pelo worker de exportação, que recebe
+os mesmos parâmetros gravados no ExportJob, de modo que o arquivo gerado
+contenha exatamente o que a tela mostrava.
+"""
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Doctor, DoctorSpecialty, GvpVisit, PhoneIndex, PlanilhaEmergencia
+from .phones import phone_lookup_q
+from .search import search_q
+
+DOCTOR_FILTER_KEYS = ['name', 'specialty', 'hospital', 'city']
+VISIT_FILTER_KEYS = ['doctor_name', 'visit_type', 'specialty']
+PLANILHA_FILTER_KEYS = ['nome_paciente', 'nome_hospital']
+PHONE_FILTER_KEYS = ['doctor_name', 'specialty', 'number']
+COVERAGE_FILTER_KEYS = ['days', 'specialty', 'hospital', 'city']
+GVP_OPERACIONAL = 'GVP - Operacional'
+
+
+def _is_id(value):
+    return str(value).isdigit()
+
+
+def doctor_specialty_q(specialty, prefix=''):
+    """Médicos com a especialidade em qualquer posição (1, 2 ou 3)."""
+    links = DoctorSpecialty.objects.filter(specialty=specialty).values('doctor_id')
+    return Q(**{'%sid__in' % prefix: links})
+
+
+def doctor_filters(params):
+    filter_search = Q()
+    for key, value in params.items():
+        if key == 'name' and value:
+            filter_search &= search_q(Doctor, value)
+        elif key == 'specialty' and _is_id(value):
+            filter_search &= doctor_specialty_q(value)
+        elif key in ['hospital', 'city'] and _is_id(value):
+            filter_search &= Q(**{key: value})
+    return filter_search
+
+
+def visit_filters(params):
+    filter_search = Q()
+    if params.get('doctor_name'):
+        # Nome do médico (relacionamento doctor -> name), sem acentos
+        filter_search &= search_q(Doctor, params['doctor_name'], 'doctor__')
+    if params.get('visit_type'):
+        filter_search &= Q(visit_type=params['visit_type'])
+    if _is_id(params.get('specialty', '')):
+        filter_search &= Q(specialty=params['specialty'])
+    return filter_search
+
+
+def planilha_filters(params):
+    filter_search = Q()
+    if params.get('nome_paciente'):
+        filter_search &= search_q(PlanilhaEmergencia, params['nome_paciente'])
+    if _is_id(params.get('nome_hospital', '')):
+        filter_search &= Q(nome_hospital=params['nome_hospital'])
+    return filter_search
+
+
+def phone_filters(params):
+    """Filtros da agenda telefônica (sobre Phone)."""
+    filter_search = Q()
+    if params.get('doctor_name'):
+        filter_search &= search_q(Doctor, params['doctor_name'], 'doctor__')
+    if _is_id(params.get('specialty', '')):
+        filter_search &= doctor_specialty_q(params['specialty'], 'doctor__')
+    number = phone_lookup_q(params.get('number', ''))
+    if number is not None:
+        # Número ou final do número, pelo índice de telefones
+        matches = PhoneIndex.objects.filter(number, source='phone').values('object_id')
+        filter_search &= Q(id__in=matches)
+    return filter_search
+
+
+def gvp_scope_q(user, prefix='', operator=None):
+    """
+    Casos GVP que o usuário pode ver: todos, ou só aqueles em que foi
+    designado se for do grupo operacional. Q() vazio = sem restrição.
+    `operator` evita consultar os grupos quando já se sabe a resposta
+    (ver gvp_scope.is_gvp_operator).
+
+    A restrição é um EXISTS correlacionado: para cada planilha o banco
+    desce pelo índice de GvpVisit.planilha e pelo índice único
+    (gvpvisit, user) da tabela de designados, sem montar a lista de ids de
+    todos os casos do usuário.
+    """
+    if operator is None:
+        operator = not user.is_superuser and user.groups.filter(name=GVP_OPERACIONAL).exists()
+    if not operator:
+        return Q()
+    assigned = GvpVisit.designated_members.through.objects.filter(
+        user=user, gvpvisit__planilha=OuterRef('%spk' % prefix),
+    )
+    return Q(Exists(assigned))
@@ -1,11 +1,10 @@
 import datetime
-from datetime import timedelta
 
 from django import forms
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
-from django.utils import timezone
-from .models import EmailConfiguration, MembroColih, MembroGvp, Hospital, Doctor, Phone, Specialty, Visit, PlanilhaEmergencia, GvpVisit
+from django.db.models import OuterRef, Subquery
+from .models import EmailConfiguration, MembroColih, MembroGvp, City, Hospital, Doctor, Phone, Specialty, Visit, PlanilhaEmergencia, GvpVisit
+from .choices import hospital_choices
 from crispy_forms.bootstrap import TabHolder, Tab
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column, Fieldset, HTML, ButtonHolder, Submit
@@ -58,11 +57,6 @@ class AddDoctorForm(forms.ModelForm):
     class Meta:
         model = Doctor
         exclude = ['id', 'register_date'] # Excluímos id e data de cadastro automática
-        
-        # Isto transforma o campo de texto simples num calendário HTML5
-        widgets = {
-            'last_visit': forms.DateInput(attrs={'type': 'date'}),
-        }
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -108,7 +102,6 @@ class AddDoctorForm(forms.ModelForm):
                 "Detalhes do Atendimento",
                 Row(
                     Column("type_patient", css_class="col-md-6"),
-                    Column("last_visit", css_class="col-md-6"), # Calendário
                 ),
                 Row(
                     Column("attends_sus", css_class="col-md-2"),       # Ajustei largura
@@ -132,6 +125,71 @@ class FindDoctorForm(forms.ModelForm):
         fields = ['name', 'specialty', 'hospital', 'city']
 
 
+class NearestDoctorsForm(forms.Form):
+    hospital = forms.ModelChoiceField(queryset=Hospital.objects.all(), required=False, label="Hospital do paciente")
+    city = forms.ModelChoiceField(queryset=City.objects.all(), required=False, label="Ou cidade")
+    specialty = forms.ModelChoiceField(queryset=Specialty.objects.all(), required=False, label="Especialidade")
+    attends_sus = forms.BooleanField(required=False, label="Atende SUS")
+    attends_private = forms.BooleanField(required=False, label="Atende particular")
+    limit = forms.IntegerField(min_value=1, max_value=50, required=False, initial=10, label="Quantidade")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('hospital') and not cleaned_data.get('city'):
+            raise forms.ValidationError("Informe o hospital ou a cidade de referência.")
+        return cleaned_data
+
+
+class CoverageReportForm(forms.Form):
+    GROUP_CHOICES = [
+        ('city', 'Cidade'),
+        ('specialty', 'Especialidade'),
+        ('hospital', 'Hospital'),
+    ]
+
+    days = forms.IntegerField(label="Sem visita há (dias)", min_value=1, max_value=3650, initial=180, required=False)
+    group = forms.ChoiceField(label="Resumir por", choices=GROUP_CHOICES, required=False)
+    specialty = forms.ModelChoiceField(queryset=Specialty.objects.all(), required=False, label="Especialidade")
+    hospital = forms.ModelChoiceField(queryset=Hospital.objects.all(), required=False, label="Hospital")
+    city = forms.ModelChoiceField(queryset=City.objects.all(), required=False, label="Cidade")
+
+
+class ImportDoctorsForm(forms.Form):
+    file = forms.FileField(
+        label="Planilha de médicos (XLSX ou CSV)",
+        help_text="Use o mesmo layout gerado por \"Exportar para Excel\". Médicos já cadastrados (mesmo CRM ou nome) são atualizados.",
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(('.xlsx', '.csv')):
+            raise forms.ValidationError("Envie um arquivo .xlsx ou .csv.")
+        return file
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.helper = FormHelper()
+        self.helper.form_method = "post"
+        self.helper.form_tag = True
+        self.helper.layout = Layout(
+            Fieldset(
+                "Arquivo",
+                "file",
+            ),
+            ButtonHolder(
+                Submit("submit", "Importar", css_class="btn btn-primary")
+            ),
+        )
+
+
+class FindPhoneForm(forms.Form):
+    doctor_name = forms.CharField(label="Nome do Médico", required=False)
+    specialty = forms.ModelChoiceField(queryset=Specialty.objects.all(), required=False, label="Especialidade")
+    number = forms.CharField(label="Número (ou final)", required=False)
+    group = forms.BooleanField(label="Agrupar por médico", required=False)
+
+
 class AddPhoneForm(forms.ModelForm):
     class Meta:
         model = Phone
@@ -169,6 +227,17 @@ class FindVisitForm(forms.ModelForm):
         fields = ['visit_type', 'specialty'] # Filtros baseados no Model
 
 
+def usuarios_por_carga(membros):
+    """
+    Usuários dos membros ativos de `membros` (MembroColih ou MembroGvp),
+    anotados com a carga de com_visitas_recentes() e menos ocupados primeiro.
+    """
+    carga = membros.com_visitas_recentes().filter(user=OuterRef('pk')).values('visitas_recentes')
+    return User.objects.filter(id__in=membros.filter(ativo=True).values('user_id')).annotate(
+        num_visitas_recentes=Subquery(carga)
+    ).order_by('num_visitas_recentes', 'first_name')
+
+
 class AddVisitForm(forms.ModelForm):
     class Meta:
         model = Visit
@@ -183,16 +252,8 @@ class AddVisitForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # 1. Definir período para a métrica de escala (30 dias)
-        trinta_dias_atras = timezone.now() - timedelta(days=30)
-        membros_colih_ids = MembroColih.objects.filter(ativo=True).values_list('user_id', flat=True)
-        
-        queryset_membros = User.objects.filter(id__in=membros_colih_ids).annotate(
-            num_visitas_recentes=Count(
-                'visits', # Relacionamento reverso do model Visit
-                filter=Q(visits__visit_date__gte=trinta_dias_atras)
-            )
-        ).order_by('num_visitas_recentes', 'first_name')
+        # 1. Membros ativos ordenados pela carga dos últimos DIAS_VISITAS_RECENTES dias
+        queryset_membros = usuarios_por_carga(MembroColih.objects.all())
 
         # 3. Aplicar o queryset restrito ao campo 'user' (ou o nome do campo de visitante no seu model)
         self.fields['members'].queryset = queryset_membros
@@ -236,6 +297,87 @@ class AddVisitForm(forms.ModelForm):
         )
 
 
+class BatchVisitForm(forms.Form):
+    """Várias visitas de uma ronda: data, tipo, local e membros em comum."""
+    visit_date = forms.DateField(
+        label="Data da Visita", initial=datetime.date.today,
+        widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+    )
+    visit_type = forms.ChoiceField(label="Tipo de Visita", choices=Visit.VISIT_TYPE_CHOICES, initial='Preventiva')
+    hospital = forms.ModelChoiceField(
+        queryset=Hospital.objects.all(), label="Local da Visita (Hospital)",
+        # Recarrega a tela com os médicos do hospital escolhido
+        widget=forms.Select(attrs={'onchange': "window.location.search = this.value ? 'hospital=' + this.value : ''"}),
+    )
+    specialty = forms.ModelChoiceField(
+        queryset=Specialty.objects.all(), required=False, label="Especialidade Abordada",
+        help_text="Em branco: a especialidade principal de cada médico.",
+    )
+    doctors = forms.ModelMultipleChoiceField(
+        queryset=Doctor.objects.none(), label="Médicos visitados",
+        widget=forms.SelectMultiple(attrs={'size': 15}),
+    )
+    article = forms.CharField(label="Artigo Apresentado / Assunto", max_length=200, required=False)
+    outcome = forms.CharField(label="Desfecho / Resultado", required=False, widget=forms.Textarea(attrs={'rows': 3}))
+    members = forms.ModelMultipleChoiceField(
+        queryset=User.objects.none(), label="Membro Visitante (COLIH)", widget=forms.CheckboxSelectMultiple(),
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Mesma ordenação por carga do AddVisitForm, calculada uma vez para o lote
+        self.fields['members'].queryset = usuarios_por_carga(MembroColih.objects.all())
+        # Só os médicos do hospital da ronda (do POST ou do ?hospital= da tela),
+        # em vez do cadastro inteiro; a validação recusa médicos de fora dele
+        hospital_id = str(self['hospital'].value() or '')
+        if hospital_id.isdigit():
+            self.fields['doctors'].queryset = Doctor.objects.filter(hospital_id=hospital_id)\
+                .only('name', 'specialty').order_by('name', 'id')
+        else:
+            self.fields['doctors'].help_text = "Escolha o hospital para listar os médicos."
+
+        self.helper = FormHelper()
+        self.helper.form_method = "post"
+        self.helper.form_tag = True
+        self.helper.layout = Layout(
+            Fieldset(
+                "Dados da Ronda",
+                Row(
+                    Column("hospital", css_class="col-md-4"),
+                    Column("visit_date", css_class="col-md-4"),
+                    Column("visit_type", css_class="col-md-4"),
+                ),
+                "specialty",
+            ),
+            Fieldset(
+                "Médicos",
+                "doctors",
+            ),
+            Fieldset(
+                "Conteúdo da Visita",
+                "article",
+                "outcome",
+            ),
+            Fieldset(
+                "Quem realizou as visitas?",
+                "members",
+            ),
+            ButtonHolder(
+                Submit("submit", "Registrar Visitas", css_class="btn btn-primary")
+            ),
+        )
+
+
+class VisitPlanForm(forms.Form):
+    period_start = forms.DateField(
+        label="Início do período", initial=datetime.date.today,
+        widget=forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+    )
+    days = forms.IntegerField(label="Duração (dias)", min_value=1, max_value=365, initial=30)
+    specialty = forms.ModelChoiceField(queryset=Specialty.objects.all(), required=False, label="Especialidade")
+    city = forms.ModelChoiceField(queryset=City.objects.all(), required=False, label="Cidade")
+
+
 class PlanilhaEmergenciaForm(forms.ModelForm):
     class Meta:
         model = PlanilhaEmergencia
@@ -422,6 +564,11 @@ class FindPlanilhaForm(forms.ModelForm):
         self.fields['nome_hospital'].label = "Filtrar por Hospital"
 
 
+class FindArchivedCaseForm(forms.Form):
+    nome_paciente = forms.CharField(label="Nome do Paciente", required=False)
+    hospital = forms.CharField(label="Hospital", required=False)
+
+
 class FilterGvpStatusForm(forms.Form):
     nome_paciente = forms.CharField(label="Nome do Paciente", required=False)
     status_gvp = forms.ChoiceField(
@@ -429,9 +576,12 @@ class FilterGvpStatusForm(forms.Form):
         required=False,
         choices=[('', 'Todos (Andamento/Finalizado)'), ('AND', 'Em Acompanhamento'), ('FIN', 'Finalizado')]
     )
-    hospital = forms.ModelChoiceField(
-        queryset=Hospital.objects.all(), 
-        required=False, 
+    # Lista de hospitais em cache (choices.py): a página não consulta o banco
+    hospital = forms.TypedChoiceField(
+        choices=hospital_choices,
+        coerce=int,
+        empty_value=None,
+        required=False,
         label="Hospital"
     )
 
@@ -461,9 +611,8 @@ class GvpVisitForm(forms.ModelForm):
 
         # Filtra para que apenas Usuários vinculados ao MembroGvp apareçam
         # Usamos o 'user_id' para buscar no modelo User os IDs presentes em MembroGvp
-        membros_ids = MembroGvp.objects.filter(ativo=True).values_list('user_id', flat=True)
-        print(membros_ids)
-        self.fields['designated_members'].queryset = User.objects.filter(id__in=membros_ids)
+        # Como na escala da COLIH: carga recente anotada, menos ocupados primeiro
+        self.fields['designated_members'].queryset = usuarios_por_carga(MembroGvp.objects.all())
         # Estilização opcional para facilitar seleção
         #self.fields['designated_members'].widget = forms.CheckboxSelectMultiple()
 
@@ -0,0 +1,177 @@
+"""
+Localização de médicos e busca dos mais próximos.
+
+Cidades e hospitais guardam latitude/longitude (as cidades vêm do arquivo
+offline data/municipios.csv, ver `load_gazetteer`). Cada médico recebe uma
+cópia da coordenada do seu hospital (ou da cidade) e o número da célula de
+uma grade de GRID_STEP graus, indexada no banco. A busca pelos k mais
+próximos consulta anéis de células cada vez maiores ao redor da origem e
+para assim que nenhuma célula ainda não lida pode conter alguém mais perto.
+"""
+import csv
+import math
+import os
+
+from django.apps import apps
+from django.db.models import Q
+
+from .search import normalize_search
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'municipios.csv')
+GRID_STEP = 0.1  # graus; ~11 km de altura por célula
+GRID_COLUMNS = int(360 / GRID_STEP)
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_DISTANCE_KM = 500
+NEAREST_LIMIT = 10
+
+
+def cell_coords(latitude, longitude):
+    return int(math.floor((latitude + 90) / GRID_STEP)), int(math.floor((longitude + 180) / GRID_STEP))
+
+
+def geo_cell(latitude, longitude):
+    """Número da célula da grade (linha * GRID_COLUMNS + coluna) ou None sem coordenada."""
+    if latitude is None or longitude is None:
+        return None
+    row, column = cell_coords(latitude, longitude)
+    return row * GRID_COLUMNS + column
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distância pela fórmula de haversine."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def place_coordinates(place):
+    """(lat, lon) de um hospital (caindo para a cidade dele) ou de uma cidade."""
+    if place is None:
+        return None
+    if place.latitude is not None and place.longitude is not None:
+        return place.latitude, place.longitude
+    city = getattr(place, 'city', None)
+    if city is not None and city.latitude is not None and city.longitude is not None:
+        return city.latitude, city.longitude
+    return None
+
+
+def doctor_coordinates(doctor):
+    """Hospital do médico, cidade do hospital e, por fim, a cidade do médico."""
+    return place_coordinates(doctor.hospital) or place_coordinates(doctor.city)
+
+
+def set_location(doctor):
+    latitude, longitude = doctor_coordinates(doctor) or (None, None)
+    doctor.latitude = latitude
+    doctor.longitude = longitude
+    doctor.geo_cell = geo_cell(latitude, longitude)
+
+
+def locate_doctors(queryset, batch_size=500):
+    """Recalcula a localização dos médicos do queryset, gravando só os que mudaram."""
+    changed = []
+    doctors = queryset.select_related('hospital__city', 'city').only(
+        'latitude', 'longitude', 'geo_cell',
+        'hospital__latitude', 'hospital__longitude', 'hospital__city__latitude', 'hospital__city__longitude',
+        'city__latitude', 'city__longitude',
+    )
+    for doctor in doctors.iterator(chunk_size=batch_size):
+        before = (doctor.latitude, doctor.longitude)
+        set_location(doctor)
+        if (doctor.latitude, doctor.longitude) != before:
+            changed.append(doctor)
+    if changed:
+        queryset.model.objects.bulk_update(changed, ['latitude', 'longitude', 'geo_cell'], batch_size=batch_size)
+    return len(changed)
+
+
+def read_gazetteer(path=GAZETTEER_PATH):
+    """{(nome normalizado, UF): (lat, lon)} a partir do CSV 'nome;uf;latitude;longitude'."""
+    places = {}
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            places[(normalize_search(row['nome']), row['uf'].strip().upper())] = (
+                float(row['latitude']), float(row['longitude']),
+            )
+    return places
+
+
+def load_gazetteer(path=GAZETTEER_PATH, overwrite=False):
+    """
+    Preenche as coordenadas das cidades a partir do arquivo e atualiza a
+    localização dos médicos. Retorna (cidades atualizadas, cidades sem par).
+    """
+    City = apps.get_model('doctors', 'City')
+    Doctor = apps.get_model('doctors', 'Doctor')
+    places = read_gazetteer(path)
+    updated, missing = [], []
+    cities = City.objects.all() if overwrite else City.objects.filter(Q(latitude=None) | Q(longitude=None))
+    for city in cities:
+        coordinates = places.get((city.search_name or normalize_search(city.name), city.uf.strip().upper()))
+        if coordinates is None:
+            missing.append(city)
+            continue
+        city.latitude, city.longitude = coordinates
+        updated.append(city)
+    if updated:
+        City.objects.bulk_update(updated, ['latitude', 'longitude'])
+        locate_doctors(Doctor.objects.filter(Q(city__in=updated) | Q(hospital__city__in=updated)))
+    return updated, missing
+
+
+def _ring_q(row, column, inner, outer):
+    """
+    Células com distância de Chebyshev entre `inner` e `outer` da célula
+    (row, column), como intervalos contínuos de geo_cell por linha da grade.
+    """
+    condition = Q()
+    for y in range(row - outer, row + outer + 1):
+        base = y * GRID_COLUMNS
+        if inner and row - inner < y < row + inner:
+            # Linha que cruza o miolo já lido: só as duas pontas
+            condition |= Q(geo_cell__gte=base + column - outer, geo_cell__lte=base + column - inner)
+            condition |= Q(geo_cell__gte=base + column + inner, geo_cell__lte=base + column + outer)
+        else:
+            condition |= Q(geo_cell__gte=base + column - outer, geo_cell__lte=base + column + outer)
+    return condition
+
+
+def _covered_km(latitude, radius):
+    """Raio (km) garantidamente coberto por `radius` anéis de células ao redor da origem."""
+    if not radius:
+        return 0.0
+    edge = min(abs(latitude) + (radius + 1) * GRID_STEP, 89.0)
+    return radius * GRID_STEP * KM_PER_DEGREE * math.cos(math.radians(edge))
+
+
+def nearest_doctors(latitude, longitude, limit=NEAREST_LIMIT, filters=None, max_km=MAX_DISTANCE_KM, queryset=None):
+    """
+    Os `limit` médicos mais próximos de (latitude, longitude) até `max_km`,
+    como lista de (distância em km, médico), do mais perto ao mais longe.
+
+    Cada rodada lê só o anel novo de células (o raio dobra a cada rodada),
+    usando o índice de geo_cell; médicos sem coordenada nunca entram.
+    """
+    Doctor = apps.get_model('doctors', 'Doctor')
+    queryset = queryset if queryset is not None else Doctor.objects.all()
+    if filters is not None:
+        queryset = queryset.filter(filters)
+    row, column = cell_coords(latitude, longitude)
+
+    found = []
+    inner, outer = 0, 0
+    while True:
+        # inner=0 na primeira rodada: a própria célula da origem
+        ring = _ring_q(row, column, inner + 1 if outer else 0, outer)
+        for doctor in queryset.filter(ring):
+            found.append((distance_km(latitude, longitude, doctor.latitude, doctor.longitude), doctor))
+        found.sort(key=lambda item: (item[0], item[1].pk))
+        covered = _covered_km(latitude, outer)
+        if len(found) >= limit and found[limit - 1][0] <= covered:
+            break
+        if covered >= max_km:
+            break
+        inner, outer = outer, max(1, outer * 2)
+    return [(distance, doctor) for distance, doctor in found if distance <= max_km][:limit]
@@ -0,0 +1,39 @@
+"""
+Escopo dos casos GVP por usuário, com o grupo em cache na sessão.
+
+Quem é do grupo operacional só vê os casos em que foi designado
+(filters.gvp_scope_q, um EXISTS sobre GvpVisit.designated_members). Saber
+se o usuário é do grupo custava uma consulta por página; a resposta fica
+na sessão junto com uma versão compartilhada (versions.py), que os sinais
+de grupos (signals.py) trocam, de modo que nenhuma sessão fica com a
+resposta antiga depois de uma mudança (em outros processos, passados no
+máximo versions.VERSION_CHECK_SECONDS).
+"""
+from .filters import GVP_OPERACIONAL, gvp_scope_q
+from .versions import bump_version, current_version
+
+VERSION_KEY = 'doctors:gvp_groups_version'
+SESSION_KEY = 'doctors_gvp_operacional'
+
+
+def is_gvp_operator(request):
+    """O usuário da requisição é do grupo operacional (e não superusuário)?"""
+    user = request.user
+    if user.is_superuser:
+        return False
+    version = current_version(VERSION_KEY)
+    cached = request.session.get(SESSION_KEY)
+    if cached and cached['user'] == user.pk and cached['version'] == version:
+        return cached['operator']
+    operator = user.groups.filter(name=GVP_OPERACIONAL).exists()
+    request.session[SESSION_KEY] = {'user': user.pk, 'version': version, 'operator': operator}
+    return operator
+
+
+def request_scope_q(request, prefix=''):
+    """gvp_scope_q do usuário da requisição, sem consultar os grupos a cada página."""
+    return gvp_scope_q(request.user, prefix, operator=is_gvp_operator(request))
+
+
+def invalidate_gvp_groups():
+    bump_version(VERSION_KEY)
@@ -0,0 +1,140 @@
+"""
+Histórico compacto dos casos (PlanilhaEmergencia e GvpVisit).
+
+A view tira um retrato (snapshot) dos campos acompanhados antes de mexer
+no registro e, depois de salvar, chama record_change na mesma transação:
+só os campos que mudaram vão para o CaseHistory, como {campo: [antes,
+depois]}. Relacionamentos são gravados pelo nome (e não pelo id), para a
+linha do tempo sair de uma única consulta sobre o índice
+(planilha, created_at, id).
+"""
+import datetime
+
+from django.contrib.auth.models import User
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+from .models import CaseHistory, GvpVisit, PlanilhaEmergencia
+
+# modelo -> (tipo no histórico, campos acompanhados ou None para todos os
+# editáveis, grava os valores iniciais na criação?)
+TRACKED = {
+    PlanilhaEmergencia: ('planilha', None, False),
+    GvpVisit: ('gvpvisit', ('planilha', 'designated_members', 'status_patient', 'action_taken'), True),
+}
+KIND_MODELS = {kind: model for model, (kind, _, _) in TRACKED.items()}
+
+
+def _fields(model):
+    _, names, _ = TRACKED[model]
+    if names is None:
+        return [f for f in model._meta.concrete_fields if f.editable and not f.primary_key]
+    return [model._meta.get_field(name) for name in names]
+
+
+def _raw(instance, field):
+    if field.many_to_many:
+        if instance.pk is None:
+            return []
+        return sorted(getattr(instance, field.name).values_list('pk', flat=True))
+    value = getattr(instance, field.attname)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def snapshot(instance):
+    """Valores atuais dos campos acompanhados, ou None se o registro é novo."""
+    if instance.pk is None:
+        return None
+    return {field.name: _raw(instance, field) for field in _fields(type(instance))}
+
+
+def _label(obj):
+    if isinstance(obj, User):
+        return obj.get_full_name() or obj.username
+    return str(obj)
+
+
+def _with_labels(model, changes):
+    """Troca os ids dos relacionamentos alterados pelos nomes, numa consulta por campo."""
+    for name, (old, new) in changes.items():
+        field = model._meta.get_field(name)
+        if not field.is_relation:
+            continue
+        ids = set(old or []) | set(new or []) if field.many_to_many else {old, new} - {None}
+        objects = field.related_model.objects.in_bulk(ids)
+
+        def label(pk):
+            return _label(objects[pk]) if pk in objects else '#%s' % pk
+
+        if field.many_to_many:
+            changes[name] = [[label(pk) for pk in old or []], [label(pk) for pk in new]]
+        else:
+            changes[name] = [None if old is None else label(old), None if new is None else label(new)]
+    return changes
+
+
+def record_change(instance, previous, user=None):
+    """
+    Grava o que mudou em `instance` desde `previous` (o snapshot de antes da
+    alteração; None na criação). Não grava nada se nenhum campo mudou.
+    """
+    model = type(instance)
+    kind, _, initial_values = TRACKED[model]
+    current = snapshot(instance)
+    if previous is None:
+        action = 'CRE'
+        previous = {} if initial_values else current
+    else:
+        action = 'UPD'
+    changes = {
+        name: [previous.get(name), value]
+        for name, value in current.items()
+        if previous.get(name) != value and (previous.get(name) or value)
+    }
+    if action == 'UPD' and not changes:
+        return None
+    return CaseHistory.objects.create(
+        planilha_id=instance.pk if model is PlanilhaEmergencia else instance.planilha_id,
+        kind=kind,
+        object_id=instance.pk,
+        action=action,
+        changes=_with_labels(model, changes),
+        user=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def _display(field, value):
+    if value is None or value == '' or value == []:
+        return '-'
+    if field is None:
+        return str(value)
+    if isinstance(value, list):
+        return ', '.join(value)
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    if field.choices:
+        return dict(field.flatchoices).get(value, value)
+    if isinstance(field, models.DateField):
+        parsed = datetime.datetime.fromisoformat(value)
+        return parsed.strftime('%d/%m/%Y %H:%M' if 'T' in value else '%d/%m/%Y')
+    return str(value)
+
+
+def timeline(entries):
+    """[(entrada, [(rótulo, antes, depois)])] prontos para o template."""
+    rows = []
+    for entry in entries:
+        model = KIND_MODELS.get(entry.kind)
+        changes = []
+        for name, (old, new) in entry.changes.items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # Campo que deixou de existir: mostra o nome e os valores crus
+                field = None
+            label = str(field.verbose_name) if field is not None else name
+            changes.append((label, _display(field, old), _display(field, new)))
+        rows.append((entry, changes))
+    return rows
@@ -0,0 +1,241 @@
+"""
+Importação em lote de médicos a partir do XLSX/CSV gerado por export_doctors_xlsx.
+
+Cidades, hospitais, especialidades e os médicos já cadastrados (por CRM e
+por nome normalizado) são carregados uma única vez em dicionários; as linhas
+são gravadas com bulk_create/bulk_update em lotes. Uma linha inválida é
+registrada em `errors` e não interrompe o restante do arquivo.
+
+Linhas com CRM só casam com o médico desse CRM; o nome serve de chave
+apenas para linhas sem CRM, e um nome que corresponde a mais de um médico
+é recusado. Na atualização só mudam as colunas que a linha trouxe.
+"""
+import csv
+import io
+
+import openpyxl
+from django.db import transaction
+
+from .choices import invalidate_doctor_total
+from .exports import DOCTOR_COLUMNS
+from .geo import locate_doctors
+from .models import PATIENT_TYPE_CHOICES, City, Doctor, DoctorSpecialty, Hospital, Specialty
+from .search import index_objects, normalize_search
+
+BATCH_SIZE = 500
+
+# Cabeçalho da exportação -> campo interno
+COLUMN_KEYS = dict(zip(
+    (normalize_search(header) for header, _ in DOCTOR_COLUMNS),
+    # None: coluna calculada a partir das visitas, ignorada na importação
+    ['name', 'specialty', 'specialty2', 'specialty3', 'subspecialty', 'type_patient', 'attends_sus',
+     'performs_surgeries', None, 'is_jehovah_witness', 'is_hid_consultant', 'crm', 'hospital', 'city',
+     'attends_private', None, None],
+))
+BOOLEAN_KEYS = ['attends_sus', 'performs_surgeries', 'is_jehovah_witness', 'is_hid_consultant', 'attends_private']
+TRUE_VALUES = ['sim', 's', 'x', 'true', '1', 'yes']
+PATIENT_TYPES = {normalize_search(value): value for value, _ in PATIENT_TYPE_CHOICES}
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []  # (número da linha, mensagem)
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def read_rows(fileobj, filename):
+    """Gera as linhas do arquivo (listas de valores), cabeçalho incluído."""
+    if filename.lower().endswith('.csv'):
+        text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=';,\t').delimiter
+        except csv.Error:
+            delimiter = ';'
+        yield from csv.reader(text, delimiter=delimiter)
+        return
+    wb = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        for row in wb.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        wb.close()
+
+
+def _text(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+class DoctorImporter:
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.result = ImportResult()
+        # Mapas montados uma vez: nome normalizado -> id
+        self.specialties = {normalize_search(name): pk for pk, name in Specialty.objects.values_list('id', 'name')}
+        self.hospitals = {normalize_search(name): (pk, city_id)
+                          for pk, name, city_id in Hospital.objects.values_list('id', 'name', 'city_id')}
+        self.cities = {normalize_search(name): pk for pk, name in City.objects.values_list('id', 'name')}
+        self.by_crm = {}
+        self.by_name = {}  # nome normalizado -> ids (homônimos são comuns)
+        for pk, crm, name in Doctor.objects.values_list('id', 'crm', 'name').iterator():
+            if crm:
+                self.by_crm[normalize_search(crm)] = pk
+            self.by_name.setdefault(normalize_search(name), []).append(pk)
+        self._reset_batch()
+
+    def _reset_batch(self):
+        self.to_create = []
+        self.to_update = {}  # id -> campos lidos do arquivo
+        # Médicos novos do lote atual, ainda sem id
+        self.new_by_crm = {}
+        self.new_by_name = {}
+
+    def run(self, rows):
+        rows = iter(rows)
+        header = next(rows, None)
+        if header is None:
+            self.result.error(1, 'Arquivo vazio.')
+            return self.result
+        self.columns = [COLUMN_KEYS.get(normalize_search(_text(name))) for name in header]
+        if 'name' not in self.columns:
+            self.result.error(1, 'Coluna "Nome completo do Médico" não encontrada no cabeçalho.')
+            return self.result
+        self.update_fields = [key for key in dict.fromkeys(self.columns) if key]
+        self.update_fields = [
+            '%s_id' % key if key in ['specialty', 'specialty2', 'specialty3', 'hospital', 'city'] else key
+            for key in self.update_fields
+        ] + ['search_name']
+
+        for line, row in enumerate(rows, start=2):
+            if not any(_text(value) for value in row):
+                continue
+            try:
+                self._add(self._parse(row))
+            except ValueError as e:
+                self.result.error(line, str(e))
+            if len(self.to_create) + len(self.to_update) >= self.batch_size:
+                self._flush()
+        self._flush()
+        return self.result
+
+    def _parse(self, row):
+        data = {}
+        for key, value in zip(self.columns, row):
+            if key:
+                data[key] = value
+        fields = {'name': _text(data.get('name'))}
+        if not fields['name']:
+            raise ValueError('nome do médico em branco')
+
+        for key in ['specialty', 'specialty2', 'specialty3']:
+            if key not in data:
+                continue
+            name = normalize_search(_text(data[key]))
+            if not name:
+                fields['%s_id' % key] = None
+            elif name in self.specialties:
+                fields['%s_id' % key] = self.specialties[name]
+            else:
+                raise ValueError(f'especialidade "{_text(data[key])}" não cadastrada')
+        if 'specialty_id' in fields and not fields['specialty_id']:
+            raise ValueError('Especialidade 1 é obrigatória')
+
+        if 'hospital' in data:
+            name = normalize_search(_text(data['hospital']))
+            if name and name not in self.hospitals:
+                raise ValueError(f'hospital "{_text(data["hospital"])}" não cadastrado')
+            fields['hospital_id'] = self.hospitals[name][0] if name else None
+        if 'city' in data:
+            name = normalize_search(_text(data['city']))
+            if name and name not in self.cities:
+                raise ValueError(f'cidade "{_text(data["city"])}" não cadastrada')
+            fields['city_id'] = self.cities[name] if name else None
+        if not fields.get('city_id') and fields.get('hospital_id'):
+            # Sem cidade informada, assume a cidade do hospital
+            fields['city_id'] = self.hospitals[normalize_search(_text(data['hospital']))][1]
+
+        if 'type_patient' in data:
+            tipo = normalize_search(_text(data['type_patient']))
+            if tipo and tipo not in PATIENT_TYPES:
+                raise ValueError(f'tipo de paciente "{_text(data["type_patient"])}" inválido')
+            fields['type_patient'] = PATIENT_TYPES.get(tipo, 'Adulto')
+        for key in BOOLEAN_KEYS:
+            if key in data:
+                fields[key] = normalize_search(_text(data[key])) in TRUE_VALUES
+        for key in ['subspecialty', 'crm']:
+            if key in data:
+                fields[key] = _text(data[key]) or None
+        fields['search_name'] = normalize_search(fields['name'])
+        return fields
+
+    def _add(self, fields):
+        crm = normalize_search(fields.get('crm') or '')
+        name = fields['search_name']
+
+        if crm:
+            existing_id = self.by_crm.get(crm)
+            pending = self.new_by_crm.get(crm)
+        else:
+            # Sem CRM: o nome só identifica o médico se não houver homônimos
+            fields.pop('crm', None)
+            existing = self.by_name.get(name, [])
+            new = self.new_by_name.get(name, [])
+            if len(existing) + len(new) > 1:
+                raise ValueError(f'há mais de um médico chamado "{fields["name"]}"; informe o CRM')
+            existing_id = existing[0] if existing else None
+            pending = new[0] if new else None
+
+        if existing_id is not None:
+            self.to_update.setdefault(existing_id, {}).update(fields)
+        elif pending is not None:
+            for field, value in fields.items():
+                setattr(pending, field, value)
+        else:
+            if 'specialty_id' not in fields:
+                raise ValueError('Especialidade 1 é obrigatória para novos médicos')
+            doctor = Doctor(address='', status='', **fields)
+            self.to_create.append(doctor)
+            if crm:
+                self.new_by_crm[crm] = doctor
+            self.new_by_name.setdefault(name, []).append(doctor)
+
+    def _flush(self):
+        if not self.to_create and not self.to_update:
+            return
+        with transaction.atomic():
+            # Parte dos registros atuais: as colunas que a linha não trouxe ficam como estão
+            updated = list(Doctor.objects.in_bulk(list(self.to_update)).values())
+            for doctor in updated:
+                for field, value in self.to_update[doctor.pk].items():
+                    setattr(doctor, field, value)
+            created = Doctor.objects.bulk_create(self.to_create, batch_size=self.batch_size)
+            if updated:
+                Doctor.objects.bulk_update(updated, self.update_fields, batch_size=self.batch_size)
+            # bulk_* não chamam save(): mantém os índices derivados em dia
+            index_objects(created + updated)
+            if any(field.startswith('specialty') for field in self.update_fields) or created:
+                full = Doctor.objects.filter(id__in=[doctor.pk for doctor in created + updated])\
+                    .only('specialty_id', 'specialty2_id', 'specialty3_id')
+                DoctorSpecialty.rebuild_for(full)
+            if {'hospital_id', 'city_id'} & set(self.update_fields) or created:
+                locate_doctors(Doctor.objects.filter(id__in=[doctor.pk for doctor in created + updated]))
+        if created:
+            invalidate_doctor_total()
+        for doctor in created:
+            if doctor.crm:
+                self.by_crm[normalize_search(doctor.crm)] = doctor.pk
+            self.by_name.setdefault(doctor.search_name, []).append(doctor.pk)
+        self.result.created += len(created)
+        self.result.updated += len(updated)
+        self._reset_batch()
+
+
+def import_doctors(fileobj, filename, batch_size=BATCH_SIZE):
+    return DoctorImporter(batch_size=batch_size).run(read_rows(fileobj, filename))
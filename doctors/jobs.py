@@ -0,0 +1,156 @@
+"""
+Fila de exportações gravada no banco (modelo ExportJob).
+
+A view só cria o registro; o comando `run_export_worker` pega os pedidos da
+fila, gera o arquivo e vai atualizando o progresso, que a tela de
+acompanhamento consulta por polling. O arquivo pronto é gravado no próprio
+pedido (ExportJob.content), porque o worker roda em outra máquina e o web
+não enxerga o disco dele; pedidos com mais de EXPORT_RETENTION_DAYS dias
+são apagados pelo worker, junto com o arquivo.
+
+Cada atualização de progresso renova também o heartbeat_at do pedido. Se o
+worker cair no meio, o pedido fica sem sinal e, passados JOB_LEASE_SECONDS,
+volta para a fila (até MAX_ATTEMPTS tentativas). O pedido é identificado
+por (id, started_at): um worker que perdeu o pedido para outro não grava
+mais nada nele.
+"""
+import tempfile
+import time
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .exports import CHUNK_SIZE, EXPORT_KINDS, column_widths, export_rows, stream_csv, write_xlsx
+from .models import ExportJob
+
+JOB_LEASE_SECONDS = 600
+MAX_ATTEMPTS = 3
+EXPORT_RETENTION_DAYS = 7
+PURGE_INTERVAL_SECONDS = 60 * 60
+
+
+class JobLost(Exception):
+    """O pedido expirou e foi devolvido para a fila enquanto era gerado."""
+
+
+def enqueue_export(user, kind, params, file_format='xlsx'):
+    export = EXPORT_KINDS[kind]
+    filtros = {key: params.get(key) for key in export.filter_keys if params.get(key)}
+    return ExportJob.objects.create(user=user, kind=kind, file_format=file_format, params=filtros)
+
+
+def requeue_stale_jobs(now=None):
+    """
+    Devolve para a fila os pedidos em andamento cujo worker parou de dar
+    sinal. Quem já esgotou MAX_ATTEMPTS é dado como falho, para um pedido
+    que derruba o worker não derrubar todos os seguintes.
+    """
+    now = now or timezone.now()
+    cutoff = now - timedelta(seconds=JOB_LEASE_SECONDS)
+    stale = ExportJob.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff), status='RUN',
+    )
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status='ERR', error='O worker parou de responder durante a geração.', finished_at=now,
+    )
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(
+        status='PEN', progress=0, started_at=None, heartbeat_at=None,
+    )
+    return requeued + failed
+
+
+def claim_next_job():
+    """
+    Reserva o pedido mais antigo da fila. O UPDATE condicionado ao status
+    garante que dois workers nunca peguem o mesmo pedido.
+    """
+    pendentes = ExportJob.objects.filter(status='PEN').order_by('created_at').values_list('id', flat=True)[:10]
+    for job_id in pendentes:
+        now = timezone.now()
+        if ExportJob.objects.filter(id=job_id, status='PEN').update(
+                status='RUN', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1):
+            return ExportJob.objects.get(id=job_id)
+    return None
+
+
+def _owned(job):
+    """O pedido, desde que ainda esteja com este worker."""
+    return ExportJob.objects.filter(id=job.id, status='RUN', started_at=job.started_at)
+
+
+def _with_progress(job, rows):
+    processed = 0
+    for row in rows:
+        yield row
+        processed += 1
+        if processed % CHUNK_SIZE == 0:
+            if not _owned(job).update(progress=processed, heartbeat_at=timezone.now()):
+                raise JobLost('Pedido devolvido para a fila por falta de sinal do worker.')
+    job.progress = processed
+
+
+def _finish(job, status, error=None):
+    job.status = status
+    job.error = error
+    job.finished_at = timezone.now()
+    # Se outro worker já assumiu o pedido, nada é gravado
+    _owned(job).update(status=job.status, error=job.error, content=job.content, filename=job.filename,
+                       progress=job.progress, finished_at=job.finished_at)
+    return job
+
+
+def run_job(job):
+    try:
+        export = EXPORT_KINDS[job.kind]
+        queryset = export.queryset(job.params)
+        job.total = queryset.count()
+        _owned(job).update(total=job.total, heartbeat_at=timezone.now())
+
+        rows = _with_progress(job, export_rows(queryset, export.row))
+        with tempfile.TemporaryFile() as output:
+            if job.file_format == 'csv':
+                for line in stream_csv(export.columns, rows):
+                    output.write(line.encode('utf-8'))
+            else:
+                write_xlsx(output, export.title, export.columns, rows,
+                           widths=column_widths(queryset, export.columns))
+            output.seek(0)
+            job.content = output.read()
+        job.filename = '%s_%s.%s' % (export.filename, job.id, job.file_format)
+    except Exception as e:
+        return _finish(job, 'ERR', str(e))
+    return _finish(job, 'FIN')
+
+
+def purge_old_jobs(days=EXPORT_RETENTION_DAYS, now=None):
+    """Apaga os pedidos encerrados há mais de `days` dias (e os arquivos com eles)."""
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    deleted, _ = ExportJob.objects.filter(status__in=['FIN', 'ERR'], created_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_worker(poll_interval=2.0, once=False, stdout=None):
+    """Processa a fila continuamente (ou até esvaziá-la, com once=True)."""
+    next_purge = 0
+    while True:
+        if time.monotonic() >= next_purge:
+            purge_old_jobs()
+            next_purge = time.monotonic() + PURGE_INTERVAL_SECONDS
+        requeue_stale_jobs()
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(job)
+        except Exception as e:
+            # Falha ao registrar o resultado (ex.: banco indisponível): segue
+            # com a fila; o pedido volta sozinho quando o heartbeat expirar
+            if stdout:
+                stdout.write(f'Exportação #{job.id}: erro inesperado ({e})')
+            continue
+        if stdout:
+            stdout.write(f'Exportação #{job.id}: {job.get_status_display()} ({job.progress} linhas)')
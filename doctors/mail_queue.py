@@ -0,0 +1,156 @@
+"""
+Fila de e-mails de saída gravada no banco (modelo OutboundEmail).
+
+A requisição só grava a mensagem já renderizada; o comando
+`run_mail_worker` reserva os e-mails vencidos em lotes, envia todos por uma
+única conexão SMTP e registra o resultado. Falhas voltam para a fila com
+espera exponencial (1, 2, 4... minutos) até MAX_ATTEMPTS tentativas.
+
+A tentativa é contada na reserva, e não só na falha: uma mensagem que
+derruba o worker volta pela expiração da reserva já com a tentativa
+contada e, esgotado o limite, é dada como falha em vez de voltar sempre.
+"""
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .email_config import connection_params, get_email_config
+from .models import OutboundEmail
+
+BATCH_SIZE = 50
+BCC_GROUP_SIZE = 50  # destinatários por mensagem (limite comum dos servidores SMTP)
+MAX_ATTEMPTS = 6
+RETRY_BASE_SECONDS = 60
+LEASE_SECONDS = 300  # reserva de um lote; se o worker cair, o lote volta para a fila
+SMTP_TIMEOUT = 30
+
+
+def enqueue_email(subject, html_content, recipients, text_content=None, bcc=None):
+    return OutboundEmail.objects.create(
+        subject=subject[:255],
+        body_text=text_content if text_content is not None else strip_tags(html_content),
+        body_html=html_content,
+        recipients=list(recipients),
+        bcc=list(bcc or []),
+    )
+
+
+def enqueue_fanout(subject, html_content, recipients, text_content=None):
+    """
+    Mesmo conteúdo para muitos destinatários: uma mensagem por grupo de
+    BCC_GROUP_SIZE endereços em cópia oculta, com o corpo já renderizado.
+    """
+    recipients = list(recipients)
+    text_content = text_content if text_content is not None else strip_tags(html_content)
+    return OutboundEmail.objects.bulk_create([
+        OutboundEmail(subject=subject[:255], body_text=text_content, body_html=html_content,
+                      recipients=[], bcc=recipients[i:i + BCC_GROUP_SIZE])
+        for i in range(0, len(recipients), BCC_GROUP_SIZE)
+    ])
+
+
+def claim_batch(limit=BATCH_SIZE):
+    """
+    Reserva até `limit` e-mails vencidos. O UPDATE condicionado ao status e
+    à data garante que dois workers nunca peguem a mesma mensagem.
+    """
+    now = timezone.now()
+    # Reservas vencidas de quem já esgotou as tentativas: o worker caiu em todas
+    OutboundEmail.objects.filter(status='RUN', next_attempt_at__lte=now, attempts__gte=MAX_ATTEMPTS).update(
+        status='ERR', error='O worker parou durante o envio em todas as tentativas.',
+    )
+    due = OutboundEmail.objects.filter(status__in=['PEN', 'RUN'], next_attempt_at__lte=now)
+    ids = list(due.order_by('next_attempt_at', 'id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    lease = now + timedelta(seconds=LEASE_SECONDS)
+    due.filter(id__in=ids).update(status='RUN', next_attempt_at=lease, attempts=F('attempts') + 1)
+    return list(OutboundEmail.objects.filter(id__in=ids, status='RUN', next_attempt_at=lease).order_by('id'))
+
+
+def smtp_connection(params):
+    return get_connection(timeout=SMTP_TIMEOUT, **params)
+
+
+def _message(email, config, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body_text, config.email_user, email.recipients, bcc=email.bcc, connection=connection,
+    )
+    if email.body_html:
+        message.attach_alternative(email.body_html, "text/html")
+    return message
+
+
+def _failed(email, error):
+    # email.attempts já conta esta tentativa (somada em claim_batch)
+    email.error = str(error)[:1000]
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = 'ERR'
+    else:
+        email.status = 'PEN'
+        email.next_attempt_at = timezone.now() + timedelta(seconds=RETRY_BASE_SECONDS * 2 ** (email.attempts - 1))
+    email.save(update_fields=['error', 'status', 'next_attempt_at'])
+
+
+def send_batch(emails):
+    """Envia o lote por uma única conexão. Retorna (enviados, falhas)."""
+    config = get_email_config()
+    if config is None:
+        for email in emails:
+            _failed(email, 'Nenhuma configuração de e-mail cadastrada.')
+        return 0, len(emails)
+
+    connection = smtp_connection(connection_params())
+    sent = []
+    failures = 0
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _failed(email, e)
+        return 0, len(emails)
+    try:
+        for email in emails:
+            try:
+                _message(email, config, connection).send()
+            except Exception as e:
+                failures += 1
+                _failed(email, e)
+                # A conexão pode ter caído: reabre para o restante do lote
+                connection.close()
+                try:
+                    connection.open()
+                except Exception:
+                    pass
+            else:
+                sent.append(email.id)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.filter(id__in=sent).update(status='FIN', sent_at=timezone.now(), error=None)
+    return len(sent), failures
+
+
+def run_mail_worker(poll_interval=5.0, once=False, stdout=None):
+    """Processa a fila continuamente (ou até não haver e-mails vencidos, com once=True)."""
+    while True:
+        emails = claim_batch()
+        if not emails:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+        try:
+            sent, failures = send_batch(emails)
+        except Exception as e:
+            # Erro fora do envio de cada mensagem (ex.: banco indisponível): o
+            # lote volta para a fila quando a reserva vencer, com a tentativa contada
+            if stdout:
+                stdout.write(f'E-mails: erro inesperado no lote ({e})')
+            continue
+        if stdout:
+            stdout.write(f'E-mails: {sent} enviado(s), {failures} falha(s)')
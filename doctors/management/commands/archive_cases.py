@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_CHUNK, archive_finalized
+
+
+class Command(BaseCommand):
+    help = 'Arquiva os casos finalizados (planilha, visitas GVP e histórico) sem alteração há mais de N dias.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                            help='Idade mínima, em dias desde a última alteração.')
+        parser.add_argument('--chunk', type=int, default=ARCHIVE_CHUNK, help='Casos por transação.')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days deve ser maior que zero.')
+        if options['chunk'] < 1:
+            raise CommandError('--chunk deve ser maior que zero.')
+        total = archive_finalized(days=options['days'], chunk_size=options['chunk'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'{total} caso(s) arquivado(s).'))
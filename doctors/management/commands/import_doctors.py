@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.imports import BATCH_SIZE, import_doctors
+
+
+class Command(BaseCommand):
+    help = 'Importa médicos de um XLSX/CSV no layout de export_doctors_xlsx (inclui novos e atualiza existentes).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path.lower().endswith(('.xlsx', '.csv')):
+            raise CommandError('Informe um arquivo .xlsx ou .csv.')
+        with open(path, 'rb') as fileobj:
+            result = import_doctors(fileobj, path, batch_size=options['batch_size'])
+        for line, message in result.errors:
+            self.stderr.write(f'Linha {line}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.created} médico(s) incluído(s), {result.updated} atualizado(s), {len(result.errors)} erro(s).'
+        ))
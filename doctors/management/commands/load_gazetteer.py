@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from doctors.geo import GAZETTEER_PATH, load_gazetteer, locate_doctors
+from doctors.models import Doctor
+
+
+class Command(BaseCommand):
+    help = 'Preenche latitude/longitude das cidades a partir do arquivo de municípios e relocaliza os médicos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=GAZETTEER_PATH,
+                            help='CSV "nome;uf;latitude;longitude" (padrão: doctors/data/municipios.csv).')
+        parser.add_argument('--overwrite', action='store_true', help='Substitui coordenadas já preenchidas.')
+
+    def handle(self, *args, **options):
+        updated, missing = load_gazetteer(options['path'], overwrite=options['overwrite'])
+        for city in missing:
+            self.stderr.write(f'Sem coordenada no arquivo: {city.name}/{city.uf}')
+        # Hospitais com coordenada própria ou gravados antes do comando
+        located = locate_doctors(Doctor.objects.all())
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(updated)} cidade(s) atualizada(s), {len(missing)} sem coordenada, {located} médico(s) relocalizado(s).'
+        ))
@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.models import City, Specialty
+from doctors.scheduler import PLAN_DAYS, create_plan
+
+
+class Command(BaseCommand):
+    help = 'Gera a escala de visitas do período, distribuindo os médicos vencidos entre os membros ativos da COLIH.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Início do período (AAAA-MM-DD); padrão: hoje.')
+        parser.add_argument('--days', type=int, default=PLAN_DAYS)
+        parser.add_argument('--specialty', type=int, help='ID da especialidade.')
+        parser.add_argument('--city', type=int, help='ID da cidade.')
+
+    def handle(self, *args, **options):
+        try:
+            start = datetime.date.fromisoformat(options['start']) if options['start'] else datetime.date.today()
+        except ValueError:
+            raise CommandError('Data inválida em --start (use AAAA-MM-DD).')
+        if options['days'] < 1:
+            raise CommandError('--days deve ser maior que zero.')
+        specialty = Specialty.objects.filter(pk=options['specialty']).first() if options['specialty'] else None
+        city = City.objects.filter(pk=options['city']).first() if options['city'] else None
+        if options['specialty'] and specialty is None:
+            raise CommandError('Especialidade não encontrada.')
+        if options['city'] and city is None:
+            raise CommandError('Cidade não encontrada.')
+
+        plan = create_plan(start, days=options['days'], specialty=specialty, city=city)
+        self.stdout.write(self.style.SUCCESS(
+            f'{plan} (#{plan.id}): {plan.due_total} médico(s) vencido(s), '
+            f'{plan.due_total - plan.unassigned} escalado(s), {plan.unassigned} sem membro disponível.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from doctors.phones import rebuild_phone_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice de telefones (médicos, hospitais e planilhas de emergência).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_phone_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} número(s) indexado(s).'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from doctors.search import install_search_backend, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os nomes normalizados e reconstrói o índice de busca sem acentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        install_search_backend(options['database'])
+        total = rebuild_search_index(options['database'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} registro(s) indexado(s).'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from doctors.models import Doctor, DoctorSpecialty
+
+
+class Command(BaseCommand):
+    help = 'Recria a tabela DoctorSpecialty a partir de specialty/specialty2/specialty3 dos médicos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        with transaction.atomic():
+            DoctorSpecialty.objects.all().delete()
+            doctors = Doctor.objects.only('specialty_id', 'specialty2_id', 'specialty3_id')
+            batch = []
+            for doctor in doctors.iterator(chunk_size=batch_size):
+                batch.extend(
+                    DoctorSpecialty(doctor_id=doctor.id, specialty_id=specialty_id, position=position)
+                    for position, specialty_id in DoctorSpecialty.expected_for(doctor).items()
+                )
+                if len(batch) >= batch_size:
+                    DoctorSpecialty.objects.bulk_create(batch)
+                    total += len(batch)
+                    batch = []
+            DoctorSpecialty.objects.bulk_create(batch)
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'{total} vínculo(s) médico-especialidade criado(s).'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from doctors.analytics import rebuild_visit_rollups
+
+
+class Command(BaseCommand):
+    help = 'Recalcula os resumos diários e mensais de visitas usados pelo painel da página inicial.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = rebuild_visit_rollups(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'{total} linha(s) de resumo gravada(s).'))
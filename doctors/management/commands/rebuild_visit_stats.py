@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from doctors.visit_stats import rebuild_visit_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula última visita, total de visitas e tipo da última visita de todos os médicos.'
+
+    def handle(self, *args, **options):
+        total = rebuild_visit_stats()
+        self.stdout.write(self.style.SUCCESS(f'{total} médico(s) atualizado(s).'))
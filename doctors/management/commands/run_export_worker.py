@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from doctors.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de exportações (ExportJob) gerando os arquivos em MEDIA_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Esvazia a fila e encerra.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre consultas à fila.')
+
+    def handle(self, *args, **options):
+        run_worker(poll_interval=options['interval'], once=options['once'], stdout=self.stdout)
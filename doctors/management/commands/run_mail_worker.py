@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from doctors.mail_queue import run_mail_worker
+
+
+class Command(BaseCommand):
+    help = 'Envia os e-mails da fila (OutboundEmail) por uma conexão SMTP reutilizada, com novas tentativas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Envia os e-mails vencidos e encerra.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Segundos entre consultas à fila.')
+
+    def handle(self, *args, **options):
+        run_mail_worker(poll_interval=options['interval'], once=options['once'], stdout=self.stdout)
@@ -0,0 +1,274 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0002_alter_doctor_crm_alter_doctor_hospital_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='City',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Cidade')),
+                ('uf', models.CharField(max_length=2, verbose_name='UF')),
+            ],
+            options={
+                'verbose_name': 'Cidade',
+                'verbose_name_plural': 'Cidades',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='EmailConfiguration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_config', models.CharField(default='Padrao', max_length=50, verbose_name='Nome da Configuração')),
+                ('smtp_server', models.CharField(max_length=255, verbose_name='Servidor SMTP (Ex: smtp.gmail.com)')),
+                ('smtp_port', models.IntegerField(default=587, verbose_name='Porta SMTP')),
+                ('use_tls', models.BooleanField(default=True, verbose_name='Usar TLS?')),
+                ('email_user', models.EmailField(max_length=254, verbose_name='E-mail de Origem (Usuário)')),
+                ('email_password', models.CharField(max_length=255, verbose_name='Senha do E-mail')),
+                ('imap_server', models.CharField(blank=True, max_length=255, null=True, verbose_name='Servidor IMAP')),
+            ],
+            options={
+                'verbose_name': 'Configuração de E-mail',
+                'verbose_name_plural': 'Configurações de E-mail',
+            },
+        ),
+        migrations.CreateModel(
+            name='Hospital',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Hospital')),
+                ('address', models.CharField(blank=True, max_length=200, null=True, verbose_name='Endereço')),
+                ('phone', models.CharField(blank=True, max_length=20, null=True, verbose_name='Telefone')),
+                ('register_date', models.DateTimeField(auto_now_add=True, verbose_name='Data do cadastro')),
+                ('observation', models.TextField(blank=True, null=True, verbose_name='Observação')),
+                ('city', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='doctors.city', verbose_name='Cidade')),
+            ],
+            options={
+                'verbose_name': 'Hospital',
+                'verbose_name_plural': 'Hospitais',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='attends_private',
+            field=models.BooleanField(default=False, verbose_name='Atende particular?'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='attends_sus',
+            field=models.BooleanField(default=False, verbose_name='Atende SUS?'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='email',
+            field=models.EmailField(blank=True, max_length=254, null=True, verbose_name='E-mail'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='is_hid_consultant',
+            field=models.BooleanField(default=False, verbose_name='É Consultor informado ao HID?'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='is_jehovah_witness',
+            field=models.BooleanField(default=False, verbose_name='É Testemunha de Jeová?'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='last_visit',
+            field=models.DateField(blank=True, null=True, verbose_name='Data da última visita'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='performs_surgeries',
+            field=models.BooleanField(default=False, verbose_name='Faz cirurgias?'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='specialty2',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='doctors_secondary', to='doctors.specialty', verbose_name='Especialidade 2'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='specialty3',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='doctors_tertiary', to='doctors.specialty', verbose_name='Especialidade 3'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='subspecialty',
+            field=models.CharField(blank=True, max_length=30, null=True, verbose_name='Subespecialidade'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='type_patient',
+            field=models.CharField(choices=[('Pediátrico', 'Pediátrico'), ('Adulto', 'Adulto'), ('Ambos', 'Ambos')], default='Adulto', max_length=40, verbose_name='Tipo de paciente'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, verbose_name='Usuário (COLIH)'),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='crm',
+            field=models.CharField(blank=True, max_length=80, null=True, verbose_name='CRM'),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='specialty',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='doctors_primary', to='doctors.specialty', verbose_name='Especialidade 1'),
+        ),
+        migrations.AlterField(
+            model_name='specialty',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Nome'),
+        ),
+        migrations.CreateModel(
+            name='Visit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('visit_type', models.CharField(choices=[('Preventiva', 'Preventiva'), ('Apresentacao', 'Apresentação de Artigo'), ('Intervencao', 'Intervenção')], default='Preventiva', max_length=20, verbose_name='Tipo de Visita')),
+                ('article', models.CharField(blank=True, max_length=200, null=True, verbose_name='Artigo Apresentado / Assunto')),
+                ('visit_date', models.DateField(verbose_name='Data da Visita')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Data do Lançamento')),
+                ('outcome', models.TextField(blank=True, null=True, verbose_name='Desfecho / Resultado')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='doctors.doctor', verbose_name='Médico')),
+                ('hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='doctors.hospital', verbose_name='Local da Visita (Hospital)')),
+                ('members', models.ManyToManyField(related_name='visits', to=settings.AUTH_USER_MODEL, verbose_name='Membros Visitantes')),
+                ('specialty', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='doctors.specialty', verbose_name='Especialidade Abordada')),
+            ],
+            options={
+                'verbose_name': 'Visita',
+                'verbose_name_plural': 'Visitas',
+                'ordering': ['-visit_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PlanilhaEmergencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data_hora_contato', models.DateTimeField(verbose_name='Data/hora do contato')),
+                ('nome_telefonou', models.CharField(max_length=150, verbose_name='Nome da pessoa que telefonou')),
+                ('contato_telefonou', models.CharField(max_length=100, verbose_name='Contato da pessoa que telefonou')),
+                ('paciente_solicitou_ajuda', models.BooleanField(default=False, verbose_name='Paciente solicitou ajuda da Colih?')),
+                ('parentesco', models.CharField(max_length=100, verbose_name='Parentesco com o paciente')),
+                ('membros_colih', models.TextField(verbose_name='Membros da Colih envolvidos')),
+                ('nome_paciente', models.CharField(max_length=200, verbose_name='Nome do paciente')),
+                ('sexo', models.CharField(choices=[('M', 'Masculino'), ('F', 'Feminino')], max_length=1, verbose_name='Sexo')),
+                ('idade', models.CharField(max_length=50, verbose_name='Idade')),
+                ('batizado', models.BooleanField(default=False, verbose_name='Batizado?')),
+                ('boa_condicao_espiritual', models.BooleanField(default=True, verbose_name='Boa condição espiritual?')),
+                ('cartao_diretivas', models.BooleanField(default=False, verbose_name='Cartão de Diretivas completo?')),
+                ('tipo_atendimento', models.CharField(choices=[('PAR', 'Particular'), ('PUB', 'Público')], max_length=3, verbose_name='Tipo de atendimento')),
+                ('plano_saude', models.CharField(blank=True, max_length=150, null=True, verbose_name='Plano de saúde e abrangência')),
+                ('numero_quarto', models.CharField(blank=True, max_length=50, null=True, verbose_name='N.º do quarto')),
+                ('telefone_hospital', models.CharField(blank=True, max_length=50, null=True, verbose_name='Telefone do hospital/quarto')),
+                ('congregacao', models.CharField(max_length=150, verbose_name='Congregação (Nome, Cidade, UF)')),
+                ('anciaos_contatados', models.TextField(verbose_name='Nomes e telefones dos anciãos contatados')),
+                ('comentarios_espirituais', models.TextField(blank=True, null=True, verbose_name='Comentários (condição espiritual, etc.)')),
+                ('nome_pai', models.CharField(blank=True, max_length=150, null=True, verbose_name='Nome completo do pai')),
+                ('pai_batizado', models.BooleanField(default=False, verbose_name='Pai batizado?')),
+                ('nome_mae', models.CharField(blank=True, max_length=150, null=True, verbose_name='Nome completo da mãe')),
+                ('mae_batizada', models.BooleanField(default=False, verbose_name='Mãe batizada?')),
+                ('peso_nascer', models.CharField(blank=True, max_length=50, null=True, verbose_name='Peso ao nascer')),
+                ('apgar', models.CharField(blank=True, max_length=50, null=True, verbose_name='Pontuação APGAR (5 min)')),
+                ('idade_gestacional', models.CharField(blank=True, max_length=50, null=True, verbose_name='Idade gestacional')),
+                ('data_nascimento', models.DateField(blank=True, null=True, verbose_name='Data de nascimento')),
+                ('documento_s55_considerado', models.BooleanField(default=False, verbose_name='Documento S-55 foi considerado com os pais?')),
+                ('problema_especifico', models.TextField(verbose_name='Problema específico / Diagnóstico')),
+                ('historico_saude', models.TextField(verbose_name='Histórico de saúde / Causa da emergência')),
+                ('medico_responsavel', models.CharField(max_length=150, verbose_name='Médico responsável')),
+                ('outro_medico', models.CharField(blank=True, max_length=150, null=True, verbose_name='Outro médico')),
+                ('plano_tratamento', models.TextField(verbose_name='Plano de tratamento médico')),
+                ('equipe_informada_colih', models.BooleanField(default=False, verbose_name='Equipe informada sobre ajuda da Colih?')),
+                ('equipe_cooperando', models.BooleanField(default=False, verbose_name='Equipe está cooperando?')),
+                ('acao_judicial_mencionada', models.BooleanField(default=False, verbose_name='Foi mencionada ação judicial?')),
+                ('estrategias_opcoes', models.TextField(verbose_name='Estratégias / Opções de tratamento')),
+                ('artigos_fornecidos', models.TextField(blank=True, null=True, verbose_name='Artigos médicos fornecidos')),
+                ('medico_cooperativo_apos_artigos', models.BooleanField(default=False, verbose_name='Médico disposto a cooperar após artigos?')),
+                ('medico_consultor', models.CharField(blank=True, max_length=150, null=True, verbose_name='Nome do médico consultor')),
+                ('especialidade_consultor', models.CharField(blank=True, max_length=100, null=True, verbose_name='Especialidade do consultor')),
+                ('infos_consultor', models.TextField(blank=True, null=True, verbose_name='Preferências de contato / Outras infos')),
+                ('necessidade_transferencia', models.BooleanField(default=False, verbose_name='Necessidade de transferência?')),
+                ('procedimentos_transferencia_confirmados', models.BooleanField(default=False, verbose_name='Procedimentos confirmados?')),
+                ('hospital_destino', models.CharField(blank=True, max_length=200, null=True, verbose_name='Hospital de destino')),
+                ('medico_destino', models.CharField(blank=True, max_length=150, null=True, verbose_name='Médico no destino')),
+                ('telefone_destino', models.CharField(blank=True, max_length=50, null=True, verbose_name='Telefone no destino')),
+                ('colih_destino_informada', models.BooleanField(default=False, verbose_name='Colih de destino informada?')),
+                ('resultado_acompanhamento', models.TextField(blank=True, null=True, verbose_name='Resultado / Acompanhamento')),
+                ('anciaos_locais_acompanhamento', models.BooleanField(default=False, verbose_name='Anciãos locais contatados para acompanhamento?')),
+                ('status_gvp', models.CharField(blank=True, choices=[('PEN', 'Pendente'), ('AND', 'Em Acompanhamento'), ('FIN', 'Finalizado')], default='PEN', max_length=3, null=True, verbose_name='Situação do GVP')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('especialidade_outro', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='planilhas_emergencia_secundaria', to='doctors.specialty', verbose_name='Especialidade')),
+                ('especialidade_responsavel', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='doctors.specialty', verbose_name='Especialidade')),
+                ('nome_hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='doctors.hospital', verbose_name='Nome do Hospital')),
+            ],
+            options={
+                'verbose_name': 'Planilha de Emergência',
+                'verbose_name_plural': 'Planilhas de Emergência',
+            },
+        ),
+        migrations.CreateModel(
+            name='MembroGvp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ativo', models.BooleanField(default=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Membro do GVP',
+                'verbose_name_plural': 'Membros do GVP',
+            },
+        ),
+        migrations.CreateModel(
+            name='MembroColih',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='perfil_colih', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Membro da COLIH',
+                'verbose_name_plural': 'Membros da COLIH',
+            },
+        ),
+        migrations.CreateModel(
+            name='GvpVisit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_taken', models.TextField(help_text='Descreva como o GVP atuou junto ao paciente e equipe médica.', verbose_name='Ações realizadas / Resumo da visita')),
+                ('status_patient', models.CharField(help_text='Ex: Estável, em UTI, aguardando cirurgia...', max_length=100, verbose_name='Status atual do paciente')),
+                ('submission_date', models.DateTimeField(auto_now_add=True, verbose_name='Data/Hora da Submissão')),
+                ('designated_members', models.ManyToManyField(related_name='gvp_assignments', to=settings.AUTH_USER_MODEL, verbose_name='Membros do GVP Designados')),
+                ('planilha', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gvp_followups', to='doctors.planilhaemergencia', verbose_name='Paciente (Planilha de Emergência)')),
+            ],
+            options={
+                'verbose_name': 'Visita GVP',
+                'verbose_name_plural': 'Visitas GVP',
+                'ordering': ['-submission_date'],
+            },
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='doctors.city', verbose_name='Cidade'),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='hospital',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, to='doctors.hospital', verbose_name='Hospital'),
+        ),
+    ]
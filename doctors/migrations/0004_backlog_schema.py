@@ -0,0 +1,395 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0003_baseline_models'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.PositiveIntegerField(unique=True, verbose_name='Id da planilha')),
+                ('nome_paciente', models.CharField(max_length=200, verbose_name='Nome do paciente')),
+                ('nome_paciente_search', models.CharField(default='', editable=False, max_length=200)),
+                ('hospital', models.CharField(blank=True, default='', max_length=100, verbose_name='Hospital')),
+                ('data_hora_contato', models.DateTimeField(verbose_name='Data/hora do contato')),
+                ('finalized_at', models.DateTimeField(verbose_name='Última alteração')),
+                ('visits', models.PositiveSmallIntegerField(default=0, verbose_name='Visitas GVP')),
+                ('payload', models.BinaryField(verbose_name='Dados comprimidos')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Arquivado em')),
+            ],
+            options={
+                'verbose_name': 'Caso arquivado',
+                'verbose_name_plural': 'Casos arquivados',
+            },
+        ),
+        migrations.CreateModel(
+            name='CaseHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('planilha', 'Planilha de Emergência'), ('gvpvisit', 'Visita GVP')], max_length=10, verbose_name='Registro')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Id do registro')),
+                ('action', models.CharField(choices=[('CRE', 'Criação'), ('UPD', 'Alteração')], max_length=3, verbose_name='Ação')),
+                ('changes', models.JSONField(blank=True, default=dict, verbose_name='Alterações')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Histórico do caso',
+                'verbose_name_plural': 'Históricos dos casos',
+            },
+        ),
+        migrations.CreateModel(
+            name='DoctorSpecialty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Posição')),
+            ],
+            options={
+                'verbose_name': 'Especialidade do Médico',
+                'verbose_name_plural': 'Especialidades dos Médicos',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('doctors', 'Médicos'), ('visits', 'Visitas'), ('planilhas', 'Planilhas de Emergência'), ('coverage', 'Cobertura de visitas')], max_length=20, verbose_name='Tipo de exportação')),
+                ('file_format', models.CharField(choices=[('xlsx', 'Excel (XLSX)'), ('csv', 'CSV')], default='xlsx', max_length=4, verbose_name='Formato')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Filtros')),
+                ('status', models.CharField(choices=[('PEN', 'Na fila'), ('RUN', 'Gerando'), ('FIN', 'Concluído'), ('ERR', 'Falhou')], default='PEN', max_length=3, verbose_name='Situação')),
+                ('progress', models.PositiveIntegerField(default=0, verbose_name='Linhas processadas')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de linhas')),
+                ('file', models.FileField(blank=True, null=True, upload_to='exports/', verbose_name='Arquivo')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Solicitado em')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True, verbose_name='Último sinal do worker')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+            ],
+            options={
+                'verbose_name': 'Exportação',
+                'verbose_name_plural': 'Exportações',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Assunto')),
+                ('body_text', models.TextField(verbose_name='Texto')),
+                ('body_html', models.TextField(blank=True, null=True, verbose_name='HTML')),
+                ('recipients', models.JSONField(blank=True, default=list, verbose_name='Destinatários')),
+                ('bcc', models.JSONField(blank=True, default=list, verbose_name='Cópia oculta')),
+                ('status', models.CharField(choices=[('PEN', 'Na fila'), ('RUN', 'Enviando'), ('FIN', 'Enviado'), ('ERR', 'Falhou')], default='PEN', max_length=3, verbose_name='Situação')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviado em')),
+            ],
+            options={
+                'verbose_name': 'E-mail de saída',
+                'verbose_name_plural': 'E-mails de saída',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PhoneIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('phone', 'Telefone do médico'), ('hospital', 'Telefone do hospital'), ('contato', 'Contato da emergência'), ('telefone_hospital', 'Telefone do hospital/quarto (emergência)')], max_length=20, verbose_name='Origem')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Registro')),
+                ('number', models.CharField(max_length=100, verbose_name='Número informado')),
+                ('digits', models.CharField(max_length=20, verbose_name='Dígitos')),
+                ('reversed_digits', models.CharField(max_length=20)),
+            ],
+            options={
+                'verbose_name': 'Índice de Telefone',
+                'verbose_name_plural': 'Índice de Telefones',
+            },
+        ),
+        migrations.CreateModel(
+            name='VisitAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('due_date', models.DateField(blank=True, null=True, verbose_name='Vencida desde')),
+            ],
+            options={
+                'verbose_name': 'Visita Escalada',
+                'verbose_name_plural': 'Visitas Escaladas',
+            },
+        ),
+        migrations.CreateModel(
+            name='VisitPlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(verbose_name='Início do período')),
+                ('period_end', models.DateField(verbose_name='Fim do período')),
+                ('due_total', models.PositiveIntegerField(default=0, verbose_name='Médicos com visita vencida')),
+                ('unassigned', models.PositiveIntegerField(default=0, verbose_name='Sem membro disponível')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Gerada em')),
+            ],
+            options={
+                'verbose_name': 'Escala de Visitas',
+                'verbose_name_plural': 'Escalas de Visitas',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VisitRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('D', 'Dia'), ('M', 'Mês')], max_length=1, verbose_name='Período')),
+                ('period_start', models.DateField(verbose_name='Início do período')),
+                ('visit_type', models.CharField(choices=[('Preventiva', 'Preventiva'), ('Apresentacao', 'Apresentação de Artigo'), ('Intervencao', 'Intervenção')], max_length=20, verbose_name='Tipo de Visita')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Visitas')),
+            ],
+            options={
+                'verbose_name': 'Resumo de Visitas',
+                'verbose_name_plural': 'Resumos de Visitas',
+            },
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddField(
+            model_name='city',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='geo_cell',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='last_visit_type',
+            field=models.CharField(blank=True, editable=False, max_length=20, null=True, verbose_name='Tipo da última visita'),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='doctor',
+            name='visit_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de visitas'),
+        ),
+        migrations.AddField(
+            model_name='gvpvisit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última alteração'),
+        ),
+        migrations.AddField(
+            model_name='hospital',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Latitude'),
+        ),
+        migrations.AddField(
+            model_name='hospital',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, verbose_name='Longitude'),
+        ),
+        migrations.AddField(
+            model_name='hospital',
+            name='search_name',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='membrocolih',
+            name='capacidade',
+            field=models.PositiveSmallIntegerField(default=10, help_text='Quantas visitas o membro pode assumir em cada escala gerada (0 = indisponível).', verbose_name='Visitas por escala'),
+        ),
+        migrations.AddField(
+            model_name='planilhaemergencia',
+            name='nome_paciente_search',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=200),
+        ),
+        migrations.AlterField(
+            model_name='doctor',
+            name='last_visit',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Data da última visita'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['name', 'id'], name='doctor_name_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctor',
+            index=models.Index(fields=['geo_cell'], name='doctor_geo_cell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gvpvisit',
+            index=models.Index(fields=['updated_at', 'id'], name='gvpvisit_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planilhaemergencia',
+            index=models.Index(fields=['data_hora_contato', 'id'], name='planilha_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planilhaemergencia',
+            index=models.Index(fields=['status_gvp', 'data_hora_contato'], name='planilha_status_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planilhaemergencia',
+            index=models.Index(fields=['nome_hospital', 'data_hora_contato'], name='planilha_hospital_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='planilhaemergencia',
+            index=models.Index(fields=['updated_at', 'id'], name='planilha_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['doctor', 'visit_date'], name='visit_doctor_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='visitrollup',
+            name='city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='doctors.city', verbose_name='Cidade'),
+        ),
+        migrations.AddField(
+            model_name='visitrollup',
+            name='hospital',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='doctors.hospital', verbose_name='Hospital'),
+        ),
+        migrations.AddField(
+            model_name='visitrollup',
+            name='member',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Membro'),
+        ),
+        migrations.AddField(
+            model_name='visitrollup',
+            name='specialty',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='doctors.specialty', verbose_name='Especialidade'),
+        ),
+        migrations.AddField(
+            model_name='visitplan',
+            name='city',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='doctors.city', verbose_name='Cidade'),
+        ),
+        migrations.AddField(
+            model_name='visitplan',
+            name='created_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Gerada por'),
+        ),
+        migrations.AddField(
+            model_name='visitplan',
+            name='specialty',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='doctors.specialty', verbose_name='Especialidade'),
+        ),
+        migrations.AddField(
+            model_name='visitassignment',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visit_assignments', to='doctors.doctor', verbose_name='Médico'),
+        ),
+        migrations.AddField(
+            model_name='visitassignment',
+            name='member',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='visit_assignments', to=settings.AUTH_USER_MODEL, verbose_name='Membro'),
+        ),
+        migrations.AddField(
+            model_name='visitassignment',
+            name='plan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='doctors.visitplan', verbose_name='Escala'),
+        ),
+        migrations.AddIndex(
+            model_name='phoneindex',
+            index=models.Index(fields=['digits'], name='phoneindex_digits_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phoneindex',
+            index=models.Index(fields=['reversed_digits'], name='phoneindex_suffix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phoneindex',
+            index=models.Index(fields=['object_id', 'source'], name='phoneindex_owner_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='outboundemail_queue_idx'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='Solicitante'),
+        ),
+        migrations.AddField(
+            model_name='doctorspecialty',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='specialty_links', to='doctors.doctor', verbose_name='Médico'),
+        ),
+        migrations.AddField(
+            model_name='doctorspecialty',
+            name='specialty',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doctor_links', to='doctors.specialty', verbose_name='Especialidade'),
+        ),
+        migrations.AddField(
+            model_name='casehistory',
+            name='planilha',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='doctors.planilhaemergencia'),
+        ),
+        migrations.AddField(
+            model_name='casehistory',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedcase',
+            index=models.Index(fields=['data_hora_contato', 'id'], name='archivedcase_data_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitrollup',
+            index=models.Index(fields=['period', 'period_start'], name='visitrollup_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitassignment',
+            index=models.Index(fields=['plan', 'member', 'id'], name='visitassignment_plan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exportjob',
+            index=models.Index(fields=['status', 'created_at'], name='exportjob_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctorspecialty',
+            index=models.Index(fields=['specialty', 'doctor'], name='doctorspecialty_lookup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='doctorspecialty',
+            constraint=models.UniqueConstraint(fields=('doctor', 'position'), name='doctorspecialty_unique_position'),
+        ),
+        migrations.AddIndex(
+            model_name='casehistory',
+            index=models.Index(fields=['planilha', 'created_at', 'id'], name='casehistory_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_backlog_schema'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='file',
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='content',
+            field=models.BinaryField(null=True, verbose_name='Arquivo'),
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='filename',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Nome do arquivo'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:28
+
+from django.db import migrations, models
+import django.db.models.functions.comparison
+
+
+def merge_duplicates(apps, schema_editor):
+    """Soma as linhas repetidas de VisitRollup na primeira de cada combinação."""
+    VisitRollup = apps.get_model('doctors', 'VisitRollup')
+    key = ['period', 'period_start', 'visit_type', 'specialty_id', 'hospital_id', 'city_id', 'member_id']
+    kept = {}
+    for row in list(VisitRollup.objects.order_by('id')):
+        first = kept.setdefault(tuple(getattr(row, field) for field in key), row)
+        if first is not row:
+            first.count += row.count
+            first.save(update_fields=['count'])
+            row.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0005_exportjob_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='visitrollup',
+            constraint=models.UniqueConstraint(models.F('period'), models.F('period_start'), models.F('visit_type'), models.F('specialty'), django.db.models.functions.comparison.Coalesce('hospital', 0), django.db.models.functions.comparison.Coalesce('city', 0), django.db.models.functions.comparison.Coalesce('member', 0), name='visitrollup_unique_key'),
+        ),
+    ]
@@ -2,8 +2,12 @@ from datetime import timedelta
 
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
+from .geo import set_location
+from .search import normalize_search
+
 PATIENT_TYPE_CHOICES = (
     ('Pediátrico', 'Pediátrico'),
     ('Adulto', 'Adulto'),
@@ -39,9 +43,38 @@ class EmailConfiguration(models.Model):
     def __str__(self):
         return f"Servidor: {self.smtp_server} ({self.email_user})"
 
+DIAS_VISITAS_RECENTES = 30
+
+
+class MembroColihQuerySet(models.QuerySet):
+    def com_visitas_recentes(self, dias=DIAS_VISITAS_RECENTES):
+        """Anota `visitas_recentes` de todos os membros numa só consulta, já com o usuário."""
+        desde = timezone.now() - timedelta(days=dias)
+        return self.select_related('user').annotate(
+            visitas_recentes=models.Count('user__visits', filter=models.Q(user__visits__visit_date__gte=desde))
+        )
+
+
+class MembroGvpQuerySet(models.QuerySet):
+    def com_visitas_recentes(self, dias=DIAS_VISITAS_RECENTES):
+        desde = timezone.now() - timedelta(days=dias)
+        return self.select_related('user').annotate(
+            visitas_recentes=models.Count(
+                'user__gvp_assignments', filter=models.Q(user__gvp_assignments__submission_date__gte=desde)
+            )
+        )
+
+
 class MembroColih(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="Usuário", related_name='perfil_colih')
     ativo = models.BooleanField(default=True, verbose_name="Ativo")
+    # Usado pela escala de visitas (ver scheduler.py)
+    capacidade = models.PositiveSmallIntegerField(
+        default=10, verbose_name="Visitas por escala",
+        help_text="Quantas visitas o membro pode assumir em cada escala gerada (0 = indisponível)."
+    )
+
+    objects = MembroColihQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
@@ -51,8 +84,11 @@ class MembroColih(models.Model):
         """
         Calcula o total de visitas a MÉDICOS/HOSPITAIS (Model Visit) 
         que este usuário realizou nos últimos 30 dias.
+        Em listagens, use MembroColih.objects.com_visitas_recentes().
         """
-        trinta_dias_atras = timezone.now() - timedelta(days=30)
+        if hasattr(self, 'visitas_recentes'):
+            return self.visitas_recentes
+        trinta_dias_atras = timezone.now() - timedelta(days=DIAS_VISITAS_RECENTES)
         from .models import Visit
         # Filtramos as visitas (Visit) onde este usuário é o autor/visitante
         # Ajuste o campo 'user' se o nome no seu model Visit for diferente (ex: 'membro')
@@ -69,6 +105,8 @@ class MembroGvp(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, verbose_name="Usuário")
     ativo = models.BooleanField(default=True)
 
+    objects = MembroGvpQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
 
@@ -77,8 +115,11 @@ class MembroGvp(models.Model):
         """
         Calcula o total de visitas que este usuário realizou nos últimos 30 dias.
         Útil para o Admin e para a lógica de escala.
+        Em listagens, use MembroGvp.objects.com_visitas_recentes().
         """
-        trinta_dias_atras = timezone.now() - timedelta(days=30)
+        if hasattr(self, 'visitas_recentes'):
+            return self.visitas_recentes
+        trinta_dias_atras = timezone.now() - timedelta(days=DIAS_VISITAS_RECENTES)
         from .models import GvpVisit
         # Filtramos as visitas onde este usuário específico está na lista de membros designados
         return GvpVisit.objects.filter(
@@ -94,6 +135,11 @@ class MembroGvp(models.Model):
 class City(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Cidade")
     uf = models.CharField(max_length=2, verbose_name="UF")
+    # Nome sem acentos e em minúsculas, mantido pelo save() (ver search.py)
+    search_name = models.CharField(max_length=100, db_index=True, editable=False, default='')
+    # Preenchidas pelo comando load_gazetteer (ver geo.py)
+    latitude = models.FloatField('Latitude', null=True, blank=True)
+    longitude = models.FloatField('Longitude', null=True, blank=True)
 
     class Meta:
         verbose_name = "Cidade"
@@ -103,6 +149,10 @@ class City(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        super().save(*args, **kwargs)
+
 # 2. Modelo para Hospitais (Padronização)
 class Hospital(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Hospital")
@@ -111,6 +161,10 @@ class Hospital(models.Model):
     phone = models.CharField(max_length=20, verbose_name="Telefone", null=True, blank=True)
     register_date = models.DateTimeField('Data do cadastro', auto_now_add=True)
     observation = models.TextField('Observação', null=True, blank=True)
+    search_name = models.CharField(max_length=100, db_index=True, editable=False, default='')
+    # Em branco, vale a coordenada da cidade
+    latitude = models.FloatField('Latitude', null=True, blank=True)
+    longitude = models.FloatField('Longitude', null=True, blank=True)
 
     class Meta:
         verbose_name = "Hospital"
@@ -120,6 +174,10 @@ class Hospital(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        super().save(*args, **kwargs)
+
 class Specialty(models.Model):
     name = models.CharField('Nome', max_length=100)
     register_date = models.DateTimeField('Data do cadastro', auto_now_add=True)
@@ -164,7 +222,10 @@ class Doctor(models.Model):
     attends_private = models.BooleanField('Atende particular?', default=False) # <--- NOVO CAMPO
     performs_surgeries = models.BooleanField('Faz cirurgias?', default=False)
     # null=True, blank=True pois pode ser um médico novo que ainda não foi visitado
-    last_visit = models.DateField('Data da última visita', null=True, blank=True) 
+    # last_visit, visit_count e last_visit_type são mantidos a partir de Visit (ver visit_stats.py)
+    last_visit = models.DateField('Data da última visita', null=True, blank=True, editable=False)
+    visit_count = models.PositiveIntegerField('Total de visitas', default=0, editable=False)
+    last_visit_type = models.CharField('Tipo da última visita', max_length=20, null=True, blank=True, editable=False)
     is_jehovah_witness = models.BooleanField('É Testemunha de Jeová?', default=False)
     is_hid_consultant = models.BooleanField('É Consultor informado ao HID?', default=False)
     # -------------------------------------    
@@ -177,15 +238,126 @@ class Doctor(models.Model):
         blank=True
     )    
     register_date = models.DateTimeField('Data do cadastro', auto_now_add=True)
+    search_name = models.CharField(max_length=100, db_index=True, editable=False, default='')
+    # Cópia da coordenada do hospital (ou da cidade) e célula da grade (ver geo.py)
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+    geo_cell = models.IntegerField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Suporta a paginação por cursor (name, id) da listagem de médicos
+            models.Index(fields=['name', 'id'], name='doctor_name_id_idx'),
+            # Busca por vizinhança em nearest_doctors
+            models.Index(fields=['geo_cell'], name='doctor_geo_cell_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = normalize_search(self.name)
+        set_location(self)
+        super().save(*args, **kwargs)
+
+class DoctorSpecialty(models.Model):
+    """
+    Cópia indexada de specialty/specialty2/specialty3 do médico, uma linha por
+    posição, para que "médicos com a especialidade X" seja uma única busca
+    no índice (specialty, doctor) em vez de um OR entre três colunas.
+    Mantida pelo post_save de Doctor (ver signals.py).
+    """
+    POSITION_FIELDS = {1: 'specialty_id', 2: 'specialty2_id', 3: 'specialty3_id'}
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Médico', related_name='specialty_links')
+    specialty = models.ForeignKey(Specialty, on_delete=models.CASCADE, verbose_name='Especialidade', related_name='doctor_links')
+    position = models.PositiveSmallIntegerField('Posição')
+
+    class Meta:
+        verbose_name = "Especialidade do Médico"
+        verbose_name_plural = "Especialidades dos Médicos"
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'position'], name='doctorspecialty_unique_position'),
+        ]
+        indexes = [
+            models.Index(fields=['specialty', 'doctor'], name='doctorspecialty_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} - {self.specialty} ({self.position})"
+
+    @classmethod
+    def expected_for(cls, doctor):
+        """{posição: specialty_id} a partir das três FKs do médico."""
+        links = {}
+        for position, field in cls.POSITION_FIELDS.items():
+            specialty_id = getattr(doctor, field)
+            if specialty_id:
+                links[position] = specialty_id
+        return links
+
+    @classmethod
+    def sync_doctor(cls, doctor):
+        expected = cls.expected_for(doctor)
+        current = dict(cls.objects.filter(doctor=doctor).values_list('position', 'specialty_id'))
+        stale = [position for position, specialty_id in current.items() if expected.get(position) != specialty_id]
+        if stale:
+            cls.objects.filter(doctor=doctor, position__in=stale).delete()
+        cls.objects.bulk_create([
+            cls(doctor=doctor, specialty_id=specialty_id, position=position)
+            for position, specialty_id in expected.items()
+            if current.get(position) != specialty_id
+        ])
+
+    @classmethod
+    def rebuild_for(cls, doctors):
+        """Recria os vínculos de vários médicos de uma vez (após bulk_create/bulk_update)."""
+        doctors = [doctor for doctor in doctors if doctor.pk]
+        cls.objects.filter(doctor__in=[doctor.pk for doctor in doctors]).delete()
+        cls.objects.bulk_create([
+            cls(doctor_id=doctor.pk, specialty_id=specialty_id, position=position)
+            for doctor in doctors
+            for position, specialty_id in cls.expected_for(doctor).items()
+        ])
+
 class Phone(models.Model):
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Médico')
     number = models.CharField('Número de telefone', max_length=20, null=True, blank=True)
     observation = models.TextField('Observação', null=True, blank=True)
 
+class PhoneIndex(models.Model):
+    """
+    Números de telefone de médicos, hospitais e planilhas de emergência em
+    forma canônica (só dígitos, sem +55 nem 0 de longa distância), uma linha
+    por número encontrado no texto. Mantida pelos signals (ver phones.py).
+    """
+    SOURCE_CHOICES = [
+        ('phone', 'Telefone do médico'),
+        ('hospital', 'Telefone do hospital'),
+        ('contato', 'Contato da emergência'),
+        ('telefone_hospital', 'Telefone do hospital/quarto (emergência)'),
+    ]
+
+    source = models.CharField('Origem', max_length=20, choices=SOURCE_CHOICES)
+    object_id = models.PositiveIntegerField('Registro')
+    number = models.CharField('Número informado', max_length=100)
+    digits = models.CharField('Dígitos', max_length=20)
+    # Dígitos de trás para frente: busca por final do número vira busca por prefixo
+    reversed_digits = models.CharField(max_length=20)
+
+    class Meta:
+        verbose_name = "Índice de Telefone"
+        verbose_name_plural = "Índice de Telefones"
+        indexes = [
+            models.Index(fields=['digits'], name='phoneindex_digits_idx'),
+            models.Index(fields=['reversed_digits'], name='phoneindex_suffix_idx'),
+            # object_id primeiro: um filtro só por origem não deve escolher este índice
+            models.Index(fields=['object_id', 'source'], name='phoneindex_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.digits} ({self.get_source_display()})"
+
 class Visit(models.Model):
     # Opções de Tipo de Visita
     VISIT_TYPE_CHOICES = (
@@ -247,10 +419,100 @@ class Visit(models.Model):
         verbose_name = "Visita"
         verbose_name_plural = "Visitas"
         ordering = ['-visit_date'] # Ordena da mais recente para a mais antiga
+        indexes = [
+            # Última visita de um médico: ORDER BY visit_date DESC LIMIT 1 no índice
+            models.Index(fields=['doctor', 'visit_date'], name='visit_doctor_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_visit_type_display()} - {self.doctor.name} ({self.visit_date})"
 
+class VisitRollup(models.Model):
+    """
+    Totais de visitas por dia e por mês, já agrupados por tipo, especialidade,
+    hospital, cidade e membro. Os gráficos leem só esta tabela; ela é
+    ajustada a cada gravação de Visit (ver analytics.py).
+
+    Linhas com member vazio contam cada visita uma vez; as linhas por membro
+    contam a visita para cada membro que participou dela.
+    """
+    PERIOD_CHOICES = [
+        ('D', 'Dia'),
+        ('M', 'Mês'),
+    ]
+
+    period = models.CharField('Período', max_length=1, choices=PERIOD_CHOICES)
+    period_start = models.DateField('Início do período')
+    visit_type = models.CharField('Tipo de Visita', max_length=20, choices=Visit.VISIT_TYPE_CHOICES)
+    specialty = models.ForeignKey(Specialty, on_delete=models.CASCADE, verbose_name='Especialidade', related_name='+')
+    # SET_NULL como em Visit.hospital: apagar o hospital não some com as visitas dos totais
+    hospital = models.ForeignKey(Hospital, on_delete=models.SET_NULL, verbose_name='Hospital', null=True, blank=True,
+                                 related_name='+')
+    city = models.ForeignKey(City, on_delete=models.SET_NULL, verbose_name='Cidade', null=True, blank=True,
+                             related_name='+')
+    member = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Membro', null=True, blank=True,
+                               related_name='+')
+    count = models.PositiveIntegerField('Visitas', default=0)
+
+    class Meta:
+        verbose_name = "Resumo de Visitas"
+        verbose_name_plural = "Resumos de Visitas"
+        indexes = [
+            # Os gráficos filtram por período e intervalo de datas
+            models.Index(fields=['period', 'period_start'], name='visitrollup_period_idx'),
+        ]
+        constraints = [
+            # Uma linha por combinação; os campos vazios viram 0 porque NULL nunca repete num índice único
+            models.UniqueConstraint(
+                'period', 'period_start', 'visit_type', 'specialty',
+                Coalesce('hospital', 0), Coalesce('city', 0), Coalesce('member', 0),
+                name='visitrollup_unique_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_period_display()} {self.period_start}: {self.count}"
+
+class VisitPlan(models.Model):
+    """Escala de visitas proposta para um período (ver scheduler.py)."""
+    period_start = models.DateField('Início do período')
+    period_end = models.DateField('Fim do período')
+    specialty = models.ForeignKey(Specialty, on_delete=models.SET_NULL, verbose_name='Especialidade', null=True,
+                                  blank=True, related_name='+')
+    city = models.ForeignKey(City, on_delete=models.SET_NULL, verbose_name='Cidade', null=True, blank=True,
+                             related_name='+')
+    due_total = models.PositiveIntegerField('Médicos com visita vencida', default=0)
+    unassigned = models.PositiveIntegerField('Sem membro disponível', default=0)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, verbose_name='Gerada por', null=True, blank=True,
+                                   related_name='+')
+    created_at = models.DateTimeField('Gerada em', auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Escala de Visitas"
+        verbose_name_plural = "Escalas de Visitas"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Escala {self.period_start:%d/%m/%Y} a {self.period_end:%d/%m/%Y}"
+
+class VisitAssignment(models.Model):
+    plan = models.ForeignKey(VisitPlan, on_delete=models.CASCADE, verbose_name='Escala', related_name='assignments')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, verbose_name='Médico', related_name='visit_assignments')
+    member = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Membro', related_name='visit_assignments')
+    # Data em que a visita venceu; vazio para médico nunca visitado
+    due_date = models.DateField('Vencida desde', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Visita Escalada"
+        verbose_name_plural = "Visitas Escaladas"
+        indexes = [
+            # Página da escala: visitas agrupadas por membro
+            models.Index(fields=['plan', 'member', 'id'], name='visitassignment_plan_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor} - {self.member}"
+
 class PlanilhaEmergencia(models.Model):
     # --- Choices ---
     SEXO_CHOICES = [
@@ -273,6 +535,7 @@ class PlanilhaEmergencia(models.Model):
 
     # --- 2. Informações do Paciente e Hospital ---
     nome_paciente = models.CharField(max_length=200, verbose_name="Nome do paciente")
+    nome_paciente_search = models.CharField(max_length=200, db_index=True, editable=False, default='')
     sexo = models.CharField(max_length=1, choices=SEXO_CHOICES, verbose_name="Sexo")
     idade = models.CharField(max_length=50, verbose_name="Idade") # CharField para aceitar "2 meses", "45 anos"
     
@@ -376,9 +639,21 @@ class PlanilhaEmergencia(models.Model):
     def __str__(self):
         return f"{self.nome_paciente} - {self.data_hora_contato.strftime('%d/%m/%Y')}"
 
+    def save(self, *args, **kwargs):
+        self.nome_paciente_search = normalize_search(self.nome_paciente)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Planilha de Emergência"
         verbose_name_plural = "Planilhas de Emergência"
+        indexes = [
+            # Listagens ordenadas pelo contato mais recente, com ou sem filtro
+            models.Index(fields=['data_hora_contato', 'id'], name='planilha_data_idx'),
+            models.Index(fields=['status_gvp', 'data_hora_contato'], name='planilha_status_data_idx'),
+            models.Index(fields=['nome_hospital', 'data_hora_contato'], name='planilha_hospital_data_idx'),
+            # Feed de alterações do painel GVP (ver feed.py)
+            models.Index(fields=['updated_at', 'id'], name='planilha_updated_idx'),
+        ]
 
 class GvpVisit(models.Model):
     # 1. Vínculo com a Planilha de Emergência (Uma planilha pode ter vários acompanhamentos GVP)
@@ -414,11 +689,177 @@ class GvpVisit(models.Model):
         auto_now_add=True, 
         verbose_name="Data/Hora da Submissão"
     )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Última alteração")
 
     class Meta:
         verbose_name = "Visita GVP"
         verbose_name_plural = "Visitas GVP"
         ordering = ['-submission_date']
+        indexes = [
+            # Feed de alterações do painel GVP (ver feed.py)
+            models.Index(fields=['updated_at', 'id'], name='gvpvisit_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"GVP: {self.planilha.nome_paciente} - {self.submission_date.strftime('%d/%m/%Y')}"
+
+class CaseHistory(models.Model):
+    """
+    Histórico de alterações de um caso (planilha e visitas GVP), só de
+    inclusão: cada entrada guarda apenas os campos alterados, como
+    {campo: [antes, depois]} (ver history.py).
+    """
+    KIND_CHOICES = [
+        ('planilha', 'Planilha de Emergência'),
+        ('gvpvisit', 'Visita GVP'),
+    ]
+    ACTION_CHOICES = [
+        ('CRE', 'Criação'),
+        ('UPD', 'Alteração'),
+    ]
+
+    planilha = models.ForeignKey(PlanilhaEmergencia, on_delete=models.CASCADE, related_name='history')
+    kind = models.CharField('Registro', max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField('Id do registro')
+    action = models.CharField('Ação', max_length=3, choices=ACTION_CHOICES)
+    changes = models.JSONField('Alterações', default=dict, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField('Data', default=timezone.now)
+
+    class Meta:
+        verbose_name = "Histórico do caso"
+        verbose_name_plural = "Históricos dos casos"
+        indexes = [
+            # Linha do tempo de uma planilha numa leitura de intervalo
+            models.Index(fields=['planilha', 'created_at', 'id'], name='casehistory_timeline_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} - {self.get_action_display()}"
+
+class ArchivedCase(models.Model):
+    """
+    Caso finalizado retirado das tabelas quentes (ver archive.py). Só os
+    campos de busca e listagem ficam em colunas; a planilha, as visitas GVP
+    e o histórico vão serializados e comprimidos em `payload`.
+    """
+    original_id = models.PositiveIntegerField('Id da planilha', unique=True)
+    nome_paciente = models.CharField('Nome do paciente', max_length=200)
+    nome_paciente_search = models.CharField(max_length=200, editable=False, default='')
+    hospital = models.CharField('Hospital', max_length=100, blank=True, default='')
+    data_hora_contato = models.DateTimeField('Data/hora do contato')
+    finalized_at = models.DateTimeField('Última alteração')
+    visits = models.PositiveSmallIntegerField('Visitas GVP', default=0)
+    payload = models.BinaryField('Dados comprimidos')
+    archived_at = models.DateTimeField('Arquivado em', default=timezone.now)
+
+    class Meta:
+        verbose_name = "Caso arquivado"
+        verbose_name_plural = "Casos arquivados"
+        indexes = [
+            models.Index(fields=['data_hora_contato', 'id'], name='archivedcase_data_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nome_paciente} - {self.data_hora_contato.strftime('%d/%m/%Y')} (arquivado)"
+
+    def save(self, *args, **kwargs):
+        self.nome_paciente_search = normalize_search(self.nome_paciente)
+        super().save(*args, **kwargs)
+
+
+class ExportJob(models.Model):
+    KIND_CHOICES = [
+        ('doctors', 'Médicos'),
+        ('visits', 'Visitas'),
+        ('planilhas', 'Planilhas de Emergência'),
+        ('coverage', 'Cobertura de visitas'),
+    ]
+    FORMAT_CHOICES = [
+        ('xlsx', 'Excel (XLSX)'),
+        ('csv', 'CSV'),
+    ]
+    STATUS_CHOICES = [
+        ('PEN', 'Na fila'),
+        ('RUN', 'Gerando'),
+        ('FIN', 'Concluído'),
+        ('ERR', 'Falhou'),
+    ]
+
+    kind = models.CharField('Tipo de exportação', max_length=20, choices=KIND_CHOICES)
+    file_format = models.CharField('Formato', max_length=4, choices=FORMAT_CHOICES, default='xlsx')
+    # Parâmetros GET da listagem no momento do pedido (ver filters.py)
+    params = models.JSONField('Filtros', default=dict, blank=True)
+    status = models.CharField('Situação', max_length=3, choices=STATUS_CHOICES, default='PEN')
+    progress = models.PositiveIntegerField('Linhas processadas', default=0)
+    total = models.PositiveIntegerField('Total de linhas', default=0)
+    # O arquivo fica no banco: o worker e o web rodam em máquinas (dynos)
+    # diferentes e não enxergam o disco um do outro. Apagado com o pedido
+    # depois de jobs.EXPORT_RETENTION_DAYS dias.
+    content = models.BinaryField('Arquivo', null=True, editable=False)
+    filename = models.CharField('Nome do arquivo', max_length=100, blank=True, default='')
+    error = models.TextField('Erro', null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Solicitante', related_name='export_jobs')
+    created_at = models.DateTimeField('Solicitado em', auto_now_add=True)
+    started_at = models.DateTimeField('Iniciado em', null=True, blank=True)
+    # Renovado pelo worker a cada lote de linhas; parado há mais de
+    # JOB_LEASE_SECONDS, o pedido volta para a fila (ver jobs.py)
+    heartbeat_at = models.DateTimeField('Último sinal do worker', null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField('Tentativas', default=0)
+    finished_at = models.DateTimeField('Concluído em', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Exportação"
+        verbose_name_plural = "Exportações"
+        ordering = ['-created_at']
+        indexes = [
+            # O worker busca o próximo da fila por (status, created_at)
+            models.Index(fields=['status', 'created_at'], name='exportjob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} ({self.get_file_format_display()}) - {self.get_status_display()}"
+
+    @property
+    def percent(self):
+        if self.status == 'FIN':
+            return 100
+        if not self.total:
+            return 0
+        return min(int(self.progress * 100 / self.total), 99)
+
+
+class OutboundEmail(models.Model):
+    """Fila de e-mails de saída, enviada pelo comando `run_mail_worker` (ver mail_queue.py)."""
+    STATUS_CHOICES = [
+        ('PEN', 'Na fila'),
+        ('RUN', 'Enviando'),
+        ('FIN', 'Enviado'),
+        ('ERR', 'Falhou'),
+    ]
+
+    subject = models.CharField('Assunto', max_length=255)
+    body_text = models.TextField('Texto')
+    body_html = models.TextField('HTML', null=True, blank=True)
+    recipients = models.JSONField('Destinatários', default=list, blank=True)
+    # Cópia oculta: um e-mail (e uma transação SMTP) para um grupo de membros
+    bcc = models.JSONField('Cópia oculta', default=list, blank=True)
+    status = models.CharField('Situação', max_length=3, choices=STATUS_CHOICES, default='PEN')
+    attempts = models.PositiveSmallIntegerField('Tentativas', default=0)
+    # Próxima tentativa (PEN) ou fim da reserva pelo worker (RUN)
+    next_attempt_at = models.DateTimeField('Próxima tentativa', default=timezone.now)
+    error = models.TextField('Último erro', null=True, blank=True)
+    created_at = models.DateTimeField('Criado em', auto_now_add=True)
+    sent_at = models.DateTimeField('Enviado em', null=True, blank=True)
+
+    class Meta:
+        verbose_name = "E-mail de saída"
+        verbose_name_plural = "E-mails de saída"
+        ordering = ['-created_at']
+        indexes = [
+            # O worker busca os vencidos por (status, next_attempt_at)
+            models.Index(fields=['status', 'next_attempt_at'], name='outboundemail_queue_idx'),
+        ]
 
     def __str__(self):
-        return f"GVP: {self.planilha.nome_paciente} - {self.submission_date.strftime('%d/%m/%Y')}"
\ No newline at end of file
+        return f"{self.subject} - {self.get_status_display()}"
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    """Serializa os valores da última linha da página num token seguro para URL."""
+    raw = json.dumps(list(values), default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor, size=None):
+    """
+    Retorna a lista de valores do cursor ou None se o token for inválido
+    (inclusive se não tiver `size` valores ou trouxer listas/objetos).
+    """
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(values, list) or (size is not None and len(values) != size):
+        return None
+    if not all(isinstance(value, (str, int, float)) for value in values):
+        return None
+    return values
+
+
+def _valid_values(queryset, keys, values):
+    """
+    Os valores só valem se servirem de filtro para as colunas: um cursor
+    adulterado (texto no lugar do id, data inválida...) vira "sem cursor".
+    """
+    if values is None:
+        return None
+    try:
+        queryset.filter(_seek_filter(keys, values, False))
+    except (TypeError, ValueError, ValidationError):
+        return None
+    return values
+
+
+def _seek_filter(keys, values, descending):
+    # (k1, k2, ..., kn) > (v1, v2, ..., vn) expandido em ORs, pois nem todo
+    # banco aceita comparação de tuplas.
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, key in enumerate(keys):
+        step = Q(**{'%s__%s' % (key, lookup): values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            step &= Q(**{prev_key: prev_value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def keyset_paginate(queryset, keys, after=None, before=None, per_page=50, descending=False):
+    """
+    Paginação por busca (seek) sobre as colunas em `keys`.
+
+    Em vez de OFFSET, filtra a partir dos valores da última linha vista, de
+    modo que qualquer página custa o mesmo que a primeira quando existe um
+    índice sobre `keys`. As chaves precisam ser atributos das instâncias
+    (campos ou anotações) e a última deve ser única (normalmente 'id').
+    """
+    keys = list(keys)
+    after_values = _valid_values(queryset, keys, decode_cursor(after, len(keys)))
+    before_values = _valid_values(queryset, keys, decode_cursor(before, len(keys)))
+    backwards = before_values is not None and after_values is None
+
+    order = [('-%s' if descending != backwards else '%s') % key for key in keys]
+    qs = queryset.order_by(*order)
+    if backwards:
+        qs = qs.filter(_seek_filter(keys, before_values, not descending))
+    elif after_values is not None:
+        qs = qs.filter(_seek_filter(keys, after_values, descending))
+
+    rows = list(qs[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_for(obj):
+        return encode_cursor(getattr(obj, key) for key in keys)
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or backwards:
+            next_cursor = cursor_for(rows[-1])
+        if (backwards and has_more) or (not backwards and after_values is not None):
+            previous_cursor = cursor_for(rows[0])
+    return KeysetPage(rows, next_cursor, previous_cursor)
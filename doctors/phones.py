@@ -0,0 +1,133 @@
+"""
+Telefones em forma canônica e identificação de quem está ligando.
+
+Os campos de telefone são texto livre ("(16) 3333-4444 / 99999-0000",
+"+55 16 ..."). Cada número encontrado vira uma linha de PhoneIndex com só os
+dígitos, sem o +55 e sem o 0 de longa distância, e também com os dígitos
+invertidos: procurar pelo final do número é então uma busca por prefixo no
+índice, e a consulta reversa é uma única leitura indexada.
+"""
+import re
+
+from django.db.models import Q
+
+from .models import Hospital, Phone, PhoneIndex, PlanilhaEmergencia
+
+MIN_LOOKUP_DIGITS = 4
+MIN_LOCAL_DIGITS = 8  # número sem DDD
+LOOKUP_LIMIT = 50
+
+# origem -> (modelo, campo de texto, permissão para ver o resultado)
+PHONE_SOURCES = {
+    'phone': (Phone, 'number', 'doctors.view_phone'),
+    'hospital': (Hospital, 'phone', 'doctors.view_hospital'),
+    'contato': (PlanilhaEmergencia, 'contato_telefonou', 'doctors.view_planilhaemergencia'),
+    'telefone_hospital': (PlanilhaEmergencia, 'telefone_hospital', 'doctors.view_planilhaemergencia'),
+}
+
+# Sequência de dígitos com os separadores usuais; "/", ",", "ou" etc. separam números
+NUMBER_RE = re.compile(r'\+?\d[\d\s().\-]*\d')
+
+
+def normalize_phone(text):
+    """'+55 (16) 9 9999-0000' -> '16999990000'; '0xx16 3333-4444' -> '1633334444'."""
+    digits = re.sub(r'\D', '', str(text or ''))
+    if len(digits) in (12, 13) and digits.startswith('55'):
+        digits = digits[2:]
+    elif len(digits) in (11, 12) and digits.startswith('0'):
+        digits = digits[1:]
+    return digits
+
+
+def extract_phones(text):
+    """Números (forma canônica) contidos num campo de texto livre, sem repetição."""
+    found = []
+    for match in NUMBER_RE.findall(str(text or '')):
+        digits = normalize_phone(match)
+        if len(digits) >= MIN_LOCAL_DIGITS and digits not in found:
+            found.append(digits)
+    return found
+
+
+def _entries(source, obj):
+    _, field, _ = PHONE_SOURCES[source]
+    number = getattr(obj, field) or ''
+    return [
+        PhoneIndex(source=source, object_id=obj.pk, number=number[:100], digits=digits[:20],
+                   reversed_digits=digits[::-1][:20])
+        for digits in extract_phones(number)
+    ]
+
+
+def sources_for(model):
+    return [source for source, (source_model, _, _) in PHONE_SOURCES.items() if source_model is model]
+
+
+def index_phones(instance):
+    sources = sources_for(type(instance))
+    PhoneIndex.objects.filter(source__in=sources, object_id=instance.pk).delete()
+    PhoneIndex.objects.bulk_create([entry for source in sources for entry in _entries(source, instance)])
+
+
+def unindex_phones(instance):
+    PhoneIndex.objects.filter(source__in=sources_for(type(instance)), object_id=instance.pk).delete()
+
+
+def rebuild_phone_index(batch_size=1000):
+    """Recria o índice inteiro. Retorna o total de números indexados."""
+    PhoneIndex.objects.all().delete()
+    total = 0
+    for source, (model, field, _) in PHONE_SOURCES.items():
+        batch = []
+        for obj in model.objects.exclude(**{field: None}).exclude(**{field: ''}).only(field).iterator(chunk_size=batch_size):
+            batch.extend(_entries(source, obj))
+            if len(batch) >= batch_size:
+                PhoneIndex.objects.bulk_create(batch)
+                total += len(batch)
+                batch = []
+        PhoneIndex.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+
+def phone_lookup_q(term):
+    """
+    Q sobre PhoneIndex para o número (ou final de número) digitado:
+    - números indexados que terminam em `term` (inclui o número completo);
+    - números indexados sem DDD que são o final de `term`.
+    Os dois lados são intervalos/igualdades nos índices de PhoneIndex.
+    """
+    digits = normalize_phone(term)
+    if len(digits) < MIN_LOOKUP_DIGITS:
+        return None
+    suffix = digits[::-1]
+    # ':' é o caractere seguinte ao '9': intervalo = "começa com"
+    condition = Q(reversed_digits__gte=suffix, reversed_digits__lt=suffix + ':')
+    local = [digits[-size:] for size in range(MIN_LOCAL_DIGITS, len(digits))]
+    if local:
+        condition |= Q(digits__in=local)
+    return condition
+
+
+def lookup_phone(term, user=None, limit=LOOKUP_LIMIT):
+    """
+    Quem tem o número `term`: lista de (PhoneIndex, objeto dono), limitada às
+    origens que `user` pode ver.
+    """
+    condition = phone_lookup_q(term)
+    if condition is None:
+        return []
+    sources = [source for source, (_, _, perm) in PHONE_SOURCES.items() if user is None or user.has_perm(perm)]
+    entries = list(PhoneIndex.objects.filter(condition, source__in=sources).order_by('source', 'object_id')[:limit])
+
+    # Donos carregados em uma consulta por modelo
+    owners = {}
+    related = {Phone: ['doctor__specialty'], Hospital: ['city'], PlanilhaEmergencia: ['nome_hospital']}
+    for model in {PHONE_SOURCES[entry.source][0] for entry in entries}:
+        ids = {entry.object_id for entry in entries if PHONE_SOURCES[entry.source][0] is model}
+        owners[model] = model.objects.select_related(*related[model]).in_bulk(ids)
+    return [
+        (entry, owners[PHONE_SOURCES[entry.source][0]][entry.object_id])
+        for entry in entries
+        if entry.object_id in owners[PHONE_SOURCES[entry.source][0]]
+    ]
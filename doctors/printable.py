@@ -0,0 +1,148 @@
+"""
+Ficha de impressão da Planilha de Emergência (HTML e PDF).
+
+A ficha é só leitura: uma consulta com os relacionamentos já resolvidos e
+um template próprio, sem o formulário de abas. O resultado fica no cache
+com a chave (id, updated_at, formato), então reimpressões e o envio para a
+COLIH de destino não renderizam de novo; qualquer alteração na planilha
+muda a chave. O PDF é montado com o fpdf2, que é Python puro.
+"""
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils import timezone
+from fpdf import FPDF
+from fpdf.enums import XPos, YPos
+from unidecode import unidecode
+
+from .models import PlanilhaEmergencia
+
+CACHE_SECONDS = 7 * 24 * 60 * 60
+
+# (título, campos, opcional) na mesma ordem das abas do formulário;
+# seções opcionais não saem na ficha quando estão todas em branco
+SECTIONS = (
+    ('Dados da Notificação', ('data_hora_contato', 'nome_telefonou', 'contato_telefonou', 'parentesco',
+                              'membros_colih', 'paciente_solicitou_ajuda'), False),
+    ('Dados do Paciente', ('nome_paciente', 'sexo', 'idade', 'batizado', 'boa_condicao_espiritual',
+                           'cartao_diretivas'), False),
+    ('Localização e Convênio', ('nome_hospital', 'tipo_atendimento', 'plano_saude', 'numero_quarto',
+                                'telefone_hospital'), False),
+    ('Suporte Espiritual', ('congregacao', 'anciaos_contatados', 'comentarios_espirituais'), False),
+    ('Menores/Recém-Nascido', ('nome_pai', 'pai_batizado', 'nome_mae', 'mae_batizada', 'data_nascimento',
+                               'peso_nascer', 'apgar', 'idade_gestacional', 'documento_s55_considerado'), True),
+    ('Quadro Clínico', ('problema_especifico', 'historico_saude'), False),
+    ('Equipe Médica', ('medico_responsavel', 'especialidade_responsavel', 'outro_medico', 'especialidade_outro',
+                       'plano_tratamento', 'equipe_informada_colih', 'equipe_cooperando',
+                       'acao_judicial_mencionada'), False),
+    ('Estratégias', ('estrategias_opcoes', 'artigos_fornecidos', 'medico_cooperativo_apos_artigos'), False),
+    ('Consultoria e Transferência', ('medico_consultor', 'especialidade_consultor', 'infos_consultor',
+                                     'necessidade_transferencia', 'procedimentos_transferencia_confirmados',
+                                     'hospital_destino', 'colih_destino_informada', 'medico_destino',
+                                     'telefone_destino'), False),
+    ('Resultado', ('resultado_acompanhamento', 'anciaos_locais_acompanhamento'), False),
+)
+
+RELATED = ('nome_hospital__city', 'especialidade_responsavel', 'especialidade_outro')
+
+
+def _value(planilha, field):
+    value = getattr(planilha, field.name)
+    if field.choices:
+        return getattr(planilha, 'get_%s_display' % field.name)() or ''
+    if isinstance(value, bool):
+        return 'Sim' if value else 'Não'
+    if field.name == 'nome_hospital' and value:
+        return '%s (%s/%s)' % (value.name, value.city.name, value.city.uf) if value.city else value.name
+    if hasattr(value, 'strftime'):
+        return value.strftime('%d/%m/%Y %H:%M' if hasattr(value, 'hour') else '%d/%m/%Y')
+    return '' if value is None else str(value).strip()
+
+
+def sheet_sections(planilha):
+    """[(título, [(rótulo, valor)])] da planilha, já formatados para impressão."""
+    sections = []
+    for title, names, optional in SECTIONS:
+        rows = []
+        for name in names:
+            field = PlanilhaEmergencia._meta.get_field(name)
+            rows.append((str(field.verbose_name), _value(planilha, field)))
+        if optional and all(value in ('', 'Não') for _, value in rows):
+            continue
+        sections.append((title, rows))
+    return sections
+
+
+def _context(planilha):
+    return {
+        'planilha': planilha,
+        'sections': sheet_sections(planilha),
+        'rendered_at': timezone.now(),
+    }
+
+
+def render_html(planilha):
+    return render_to_string('emergency/print.html', _context(planilha))
+
+
+def _latin1(text):
+    # As fontes padrão do PDF são latin-1: o que ficar de fora é transliterado
+    return ''.join(char if ord(char) < 256 else unidecode(char) for char in text)
+
+
+def render_pdf(planilha):
+    context = _context(planilha)
+    pdf = FPDF(format='A4')
+    pdf.set_title(_latin1('Planilha de Emergência - %s' % planilha.nome_paciente))
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font('Helvetica', 'B', 14)
+    pdf.cell(0, 8, _latin1('Planilha de Emergência - %s' % planilha.nome_paciente),
+             new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.set_font('Helvetica', '', 8)
+    pdf.cell(0, 5, _latin1('Situação do GVP: %s   |   Atualizada em %s' % (
+        planilha.get_status_gvp_display() or '-', planilha.updated_at.strftime('%d/%m/%Y %H:%M'))),
+        new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    for title, rows in context['sections']:
+        pdf.ln(3)
+        pdf.set_font('Helvetica', 'B', 10)
+        pdf.set_fill_color(230, 230, 230)
+        pdf.cell(0, 6, _latin1(title), fill=True, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+        # Rótulo e valor em linhas próprias: os textos longos quebram de página
+        for label, value in rows:
+            pdf.set_font('Helvetica', 'B', 8)
+            pdf.cell(0, 4, _latin1(label), new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.set_font('Helvetica', '', 9)
+            pdf.multi_cell(0, 4.5, _latin1(value or '-'), align='L', new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+            pdf.ln(1)
+    return bytes(pdf.output())
+
+
+RENDERERS = {
+    'html': render_html,
+    'pdf': render_pdf,
+}
+
+
+def _cache_key(planilha_id, updated_at, fmt):
+    return 'doctors:ficha:%s:%s:%s' % (planilha_id, updated_at.isoformat(), fmt)
+
+
+def printable_planilha(planilha_id, fmt='html'):
+    """
+    Ficha da planilha no formato `fmt` ('html' ou 'pdf'), ou None se ela
+    não existe. Com o cache quente custa uma leitura de updated_at pela
+    chave primária; sem cache, uma consulta com os relacionamentos.
+    """
+    updated_at = PlanilhaEmergencia.objects.filter(id=planilha_id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    key = _cache_key(planilha_id, updated_at, fmt)
+    content = cache.get(key)
+    if content is None:
+        planilha = PlanilhaEmergencia.objects.select_related(*RELATED).filter(id=planilha_id).first()
+        if planilha is None:
+            return None
+        content = RENDERERS[fmt](planilha)
+        # A chave usa o updated_at da planilha que foi de fato renderizada
+        cache.set(_cache_key(planilha_id, planilha.updated_at, fmt), content, CACHE_SECONDS)
+    return content
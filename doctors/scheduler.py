@@ -0,0 +1,101 @@
+"""
+Escala de visitas aos médicos entre os membros da COLIH.
+
+1. Médicos com visita vencida no período: nunca visitados ou cuja última
+   visita (Doctor.last_visit) somada ao intervalo do tipo dessa visita cai
+   até o fim do período. Sai de uma única consulta nos campos
+   desnormalizados do médico, sem ler a tabela de visitas.
+2. Os vencidos são ordenados por prioridade (nunca visitados primeiro, depois
+   os mais atrasados) e distribuídos com um heap pela menor carga: visitas
+   dos últimos 30 dias + visitas já escaladas. Cada membro recebe no máximo
+   a sua capacidade. Custo O(n log m) para n médicos e m membros.
+3. A escala é gravada com bulk_create.
+"""
+import datetime
+import heapq
+
+from django.db import transaction
+from django.db.models import Q
+
+from .filters import doctor_specialty_q
+from .models import Doctor, MembroColih, VisitAssignment, VisitPlan
+
+PLAN_DAYS = 30
+BATCH_SIZE = 1000
+
+# Dias até a próxima visita, conforme o tipo da última
+VISIT_INTERVAL_DAYS = {
+    'Intervencao': 60,
+    'Apresentacao': 120,
+    'Preventiva': 180,
+}
+DEFAULT_INTERVAL_DAYS = 180
+
+
+def due_doctors(period_end, specialty=None, city=None):
+    """
+    [(doctor_id, vencida desde ou None)] dos médicos a visitar até
+    `period_end`, do mais prioritário para o menos.
+    """
+    overdue = Q(last_visit__isnull=True)
+    for visit_type, days in VISIT_INTERVAL_DAYS.items():
+        overdue |= Q(last_visit_type=visit_type, last_visit__lte=period_end - datetime.timedelta(days=days))
+    overdue |= Q(~Q(last_visit_type__in=list(VISIT_INTERVAL_DAYS)) | Q(last_visit_type__isnull=True),
+                 last_visit__lte=period_end - datetime.timedelta(days=DEFAULT_INTERVAL_DAYS))
+    doctors = Doctor.objects.filter(overdue)
+    if specialty:
+        doctors = doctors.filter(doctor_specialty_q(specialty))
+    if city:
+        doctors = doctors.filter(city=city)
+
+    due = []
+    for doctor_id, last_visit, last_visit_type in doctors.values_list('id', 'last_visit', 'last_visit_type')\
+            .order_by().iterator(chunk_size=BATCH_SIZE):
+        due_date = None
+        if last_visit:
+            due_date = last_visit + datetime.timedelta(days=VISIT_INTERVAL_DAYS.get(last_visit_type, DEFAULT_INTERVAL_DAYS))
+        due.append((doctor_id, due_date))
+    due.sort(key=lambda item: (item[1] is not None, item[1] or datetime.date.min, item[0]))
+    return due
+
+
+def available_members():
+    """[(user_id, carga atual, capacidade)] dos membros ativos com capacidade."""
+    return [
+        (membro.user_id, membro.visitas_recentes, membro.capacidade)
+        for membro in MembroColih.objects.filter(ativo=True, capacidade__gt=0).com_visitas_recentes()
+    ]
+
+
+def balance(due, members):
+    """
+    Distribui `due` entre `members` pela menor carga.
+    Retorna ([(doctor_id, user_id, vencida desde)], quantidade sem membro).
+    """
+    heap = [(load, user_id, capacity) for user_id, load, capacity in members]
+    heapq.heapify(heap)
+    assigned = []
+    for position, (doctor_id, due_date) in enumerate(due):
+        if not heap:
+            return assigned, len(due) - position
+        load, user_id, capacity = heapq.heappop(heap)
+        assigned.append((doctor_id, user_id, due_date))
+        if capacity > 1:
+            heapq.heappush(heap, (load + 1, user_id, capacity - 1))
+    return assigned, 0
+
+
+@transaction.atomic
+def create_plan(period_start, days=PLAN_DAYS, specialty=None, city=None, user=None):
+    period_end = period_start + datetime.timedelta(days=days - 1)
+    due = due_doctors(period_end, specialty=specialty, city=city)
+    assigned, unassigned = balance(due, available_members())
+    plan = VisitPlan.objects.create(
+        period_start=period_start, period_end=period_end, specialty=specialty, city=city,
+        due_total=len(due), unassigned=unassigned, created_by=user,
+    )
+    VisitAssignment.objects.bulk_create([
+        VisitAssignment(plan=plan, doctor_id=doctor_id, member_id=user_id, due_date=due_date)
+        for doctor_id, user_id, due_date in assigned
+    ], batch_size=BATCH_SIZE)
+    return plan
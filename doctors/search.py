@@ -0,0 +1,170 @@
+"""
+Busca por nome sem acentos e sem diferenciar maiúsculas.
+
+Cada modelo pesquisável guarda uma coluna normalizada (ver `normalize_search`).
+No SQLite essa coluna é espelhada numa tabela FTS5 com tokenizador trigram, o
+que permite busca por trecho do nome sem varrer a tabela inteira; no
+PostgreSQL a própria coluna recebe um índice GIN (pg_trgm). Termos com menos
+de 3 letras não formam trigramas: buscam o trecho na coluna normalizada,
+como o antigo icontains (sem índice, mas sem acentos).
+"""
+from django.apps import apps
+from django.db import DatabaseError, connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from unidecode import unidecode
+
+FTS_TABLE = 'doctors_search_index'
+MIN_TRIGRAM_LENGTH = 3
+
+# modelo -> (campo de origem, coluna normalizada)
+SEARCH_FIELDS = {
+    'doctors.Doctor': ('name', 'search_name'),
+    'doctors.Hospital': ('name', 'search_name'),
+    'doctors.City': ('name', 'search_name'),
+    'doctors.PlanilhaEmergencia': ('nome_paciente', 'nome_paciente_search'),
+}
+
+_fts_ready = {}
+
+
+def normalize_search(text):
+    """'  José  da SILVA ' -> 'jose da silva'"""
+    if not text:
+        return ''
+    return ' '.join(unidecode(str(text)).lower().split())
+
+
+def _search_field(model):
+    return SEARCH_FIELDS[model._meta.label][1]
+
+
+def _fts_enabled(using):
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    if using not in _fts_ready:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [FTS_TABLE])
+            _fts_ready[using] = cursor.fetchone() is not None
+    return _fts_ready[using]
+
+
+def install_search_backend(using='default'):
+    """Cria a tabela FTS5 (SQLite) ou os índices trigram (PostgreSQL)."""
+    connection = connections[using]
+    _fts_ready.pop(using, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                    "label UNINDEXED, object_id UNINDEXED, key, tokenize = 'trigram')" % FTS_TABLE
+                )
+            except DatabaseError:
+                # SQLite sem FTS5/trigram (< 3.34): fica só a coluna normalizada
+                return False
+            return True
+        if connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for label, (source, column) in SEARCH_FIELDS.items():
+                table = apps.get_model(label)._meta.db_table
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS %s_%s_trgm ON %s USING gin (%s gin_trgm_ops)"
+                    % (table, column, table, column)
+                )
+            return True
+    return False
+
+
+def index_instance(instance, using='default'):
+    if not _fts_enabled(using):
+        return
+    label = instance._meta.label
+    with connections[using].cursor() as cursor:
+        cursor.execute("DELETE FROM %s WHERE label = %%s AND object_id = %%s" % FTS_TABLE, [label, instance.pk])
+        cursor.execute(
+            "INSERT INTO %s (label, object_id, key) VALUES (%%s, %%s, %%s)" % FTS_TABLE,
+            [label, instance.pk, getattr(instance, _search_field(instance))],
+        )
+
+
+def index_objects(objects, using='default'):
+    """Versão em lote de index_instance, para quem grava com bulk_create/bulk_update."""
+    objects = [obj for obj in objects if obj.pk]
+    if not objects or not _fts_enabled(using):
+        return
+    label = objects[0]._meta.label
+    column = _search_field(objects[0])
+    with connections[using].cursor() as cursor:
+        cursor.executemany(
+            "DELETE FROM %s WHERE label = %%s AND object_id = %%s" % FTS_TABLE,
+            [(label, obj.pk) for obj in objects],
+        )
+        cursor.executemany(
+            "INSERT INTO %s (label, object_id, key) VALUES (%%s, %%s, %%s)" % FTS_TABLE,
+            [(label, obj.pk, getattr(obj, column)) for obj in objects],
+        )
+
+
+def unindex_instance(instance, using='default'):
+    if not _fts_enabled(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "DELETE FROM %s WHERE label = %%s AND object_id = %%s" % FTS_TABLE,
+            [instance._meta.label, instance.pk],
+        )
+
+
+def rebuild_search_index(using='default', batch_size=1000):
+    """Recalcula as colunas normalizadas e repopula a tabela FTS. Retorna o total de linhas."""
+    total = 0
+    fts = _fts_enabled(using)
+    if fts:
+        with connections[using].cursor() as cursor:
+            cursor.execute("DELETE FROM %s" % FTS_TABLE)
+    for label, (source, column) in SEARCH_FIELDS.items():
+        model = apps.get_model(label)
+        batch = []
+        for obj in model.objects.using(using).only(source, column).iterator(chunk_size=batch_size):
+            setattr(obj, column, normalize_search(getattr(obj, source)))
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                total += _flush(model, batch, column, fts, using)
+                batch = []
+        if batch:
+            total += _flush(model, batch, column, fts, using)
+    return total
+
+
+def _flush(model, batch, column, fts, using):
+    model.objects.using(using).bulk_update(batch, [column])
+    if fts:
+        with connections[using].cursor() as cursor:
+            cursor.executemany(
+                "INSERT INTO %s (label, object_id, key) VALUES (%%s, %%s, %%s)" % FTS_TABLE,
+                [(model._meta.label, obj.pk, getattr(obj, column)) for obj in batch],
+            )
+    return len(batch)
+
+
+def search_q(model, term, prefix=''):
+    """
+    Retorna um Q que filtra `model` (ou a relação `prefix`, ex.: 'doctor__')
+    pelo trecho `term`, ignorando acentos e maiúsculas.
+    """
+    key = normalize_search(term)
+    if not key:
+        return Q()
+    column = _search_field(model)
+    using = router.db_for_read(model)
+
+    if len(key) >= MIN_TRIGRAM_LENGTH and _fts_enabled(using):
+        phrase = '"%s"' % key.replace('"', '""')
+        subquery = RawSQL(
+            "SELECT object_id FROM %s WHERE label = %%s AND %s MATCH %%s" % (FTS_TABLE, FTS_TABLE),
+            [model._meta.label, phrase],
+        )
+        return Q(**{'%spk__in' % prefix: subquery})
+    return Q(**{'%s%s__contains' % (prefix, column): key})
@@ -0,0 +1,146 @@
+from django.contrib.auth.models import Group, User
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import analytics, geo, phones, search, visit_stats
+from .choices import invalidate_doctor_total, invalidate_hospital_choices
+from .email_config import invalidate_email_config
+from .gvp_scope import invalidate_gvp_groups
+from .models import City, Doctor, DoctorSpecialty, EmailConfiguration, Hospital, Phone, PlanilhaEmergencia, Visit
+
+SEARCHABLE_MODELS = (Doctor, Hospital, City, PlanilhaEmergencia)
+PHONE_MODELS = (Phone, Hospital, PlanilhaEmergencia)
+
+
+@receiver(post_migrate)
+def criar_indice_busca(sender, using='default', **kwargs):
+    if sender.name == 'doctors':
+        search.install_search_backend(using)
+
+
+@receiver(post_save, sender=Doctor)
+def sincronizar_especialidades(sender, instance, raw=False, **kwargs):
+    if not raw:
+        DoctorSpecialty.sync_doctor(instance)
+
+
+@receiver(post_save, sender=Hospital)
+def relocalizar_medicos_hospital(sender, instance, raw=False, **kwargs):
+    if not raw:
+        geo.locate_doctors(Doctor.objects.filter(hospital=instance))
+
+
+@receiver(post_save, sender=City)
+def relocalizar_medicos_cidade(sender, instance, raw=False, **kwargs):
+    if not raw:
+        geo.locate_doctors(Doctor.objects.filter(Q(city=instance) | Q(hospital__city=instance)))
+
+
+@receiver(post_save, sender=EmailConfiguration)
+@receiver(post_delete, sender=EmailConfiguration)
+def invalidar_configuracao_email(sender, **kwargs):
+    invalidate_email_config()
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidar_total_medicos(sender, created=True, **kwargs):
+    # Edições não mudam o total; só inclusões e exclusões
+    if created:
+        invalidate_doctor_total()
+
+
+@receiver(post_save, sender=Hospital)
+@receiver(post_delete, sender=Hospital)
+def invalidar_opcoes_hospital(sender, **kwargs):
+    invalidate_hospital_choices()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidar_grupos_gvp(sender, **kwargs):
+    # Entrar ou sair de um grupo (ou renomeá-lo) muda o escopo GVP das sessões
+    invalidate_gvp_groups()
+
+
+@receiver(pre_save, sender=Visit)
+def guardar_medico_anterior(sender, instance, raw=False, **kwargs):
+    # Numa edição, a visita pode ter mudado de médico, data, tipo...
+    instance._previous_doctor_id = None
+    instance._previous_dimensions = None
+    if instance.pk and not raw:
+        instance._previous_doctor_id = Visit.objects.filter(pk=instance.pk)\
+            .values_list('doctor_id', flat=True).first()
+        instance._previous_dimensions = analytics.previous_dimensions(instance)
+
+
+@receiver(post_save, sender=Visit)
+def atualizar_contadores_visita(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        visit_stats.visit_added(instance)
+    else:
+        visit_stats.visit_changed(instance, getattr(instance, '_previous_doctor_id', None))
+    analytics.visit_saved(instance, created, getattr(instance, '_previous_dimensions', None))
+
+
+@receiver(pre_delete, sender=Visit)
+def descontar_resumo_visita(sender, instance, **kwargs):
+    # Antes de apagar: os membros ainda estão gravados
+    analytics.visit_deleted(instance)
+
+
+@receiver(post_delete, sender=Visit)
+def descontar_visita(sender, instance, **kwargs):
+    visit_stats.visit_removed(instance.doctor_id)
+
+
+@receiver(m2m_changed, sender=Visit.members.through)
+def ajustar_resumo_membros(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    delta = 1 if action == 'post_add' else -1
+    if reverse:
+        # user.visits.add(...): instance é o usuário, pk_set são visitas
+        if action == 'post_add':
+            visits = Visit.objects.filter(pk__in=pk_set)
+        else:
+            visits = instance.visits.all() if action == 'pre_clear' else instance.visits.filter(pk__in=pk_set)
+        for visit in visits:
+            analytics.members_changed(visit, [instance.pk], delta)
+        return
+    if action != 'post_add':
+        # remove() recebe ids que podem nem estar na visita
+        members = instance.members.all() if action == 'pre_clear' else instance.members.filter(pk__in=pk_set)
+        pk_set = set(members.values_list('id', flat=True))
+    analytics.members_changed(instance, pk_set, delta)
+
+
+def atualizar_indice_busca(sender, instance, using='default', **kwargs):
+    search.index_instance(instance, using)
+
+
+def remover_indice_busca(sender, instance, using='default', **kwargs):
+    search.unindex_instance(instance, using)
+
+
+for model in SEARCHABLE_MODELS:
+    post_save.connect(atualizar_indice_busca, sender=model, dispatch_uid='busca_save_%s' % model._meta.model_name)
+    post_delete.connect(remover_indice_busca, sender=model, dispatch_uid='busca_delete_%s' % model._meta.model_name)
+
+
+def atualizar_indice_telefones(sender, instance, raw=False, **kwargs):
+    if not raw:
+        phones.index_phones(instance)
+
+
+def remover_indice_telefones(sender, instance, **kwargs):
+    phones.unindex_phones(instance)
+
+
+for model in PHONE_MODELS:
+    post_save.connect(atualizar_indice_telefones, sender=model, dispatch_uid='telefone_save_%s' % model._meta.model_name)
+    post_delete.connect(remover_indice_telefones, sender=model, dispatch_uid='telefone_delete_%s' % model._meta.model_name)
@@ -1,3 +1,293 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.db import IntegrityError
+from django.db.models import Q
 from django.test import TestCase
 
-# Create your tests here.
+from . import analytics, email_config, jobs, mail_queue, versions
+from .analytics import CHART_GROUPS
+from .feed import FEED_OVERLAP_SECONDS, changes_since, feed_cursors
+from .imports import DoctorImporter
+from .search import search_q
+from .models import (City, Doctor, EmailConfiguration, ExportJob, Hospital, OutboundEmail, PlanilhaEmergencia, Specialty,
+                     Visit, VisitRollup)
+
+HEADER = ['Nome completo do Médico', 'Especialidade 1', 'CRM', 'Hospital', 'Cidade', 'Atende SUS?']
+
+
+class DoctorImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.specialty = Specialty.objects.create(name='Cardiologia')
+        cls.city = City.objects.create(name='Franca', uf='SP')
+        cls.hospital = Hospital.objects.create(name='Santa Casa', city=cls.city)
+
+    def doctor(self, name, crm=None, **fields):
+        return Doctor.objects.create(name=name, crm=crm, specialty=self.specialty, address='', status='', **fields)
+
+    def run_import(self, *rows):
+        return DoctorImporter().run([HEADER] + [list(row) for row in rows])
+
+    def test_homonimos_com_crm_diferente_nao_se_fundem(self):
+        existing = self.doctor('João da Silva', crm='111')
+        result = self.run_import(
+            ['João da Silva', 'Cardiologia', '222', '', '', ''],
+            ['João da Silva', 'Cardiologia', '333', '', '', ''],
+            ['João da Silva', 'Cardiologia', '333', '', '', 'Sim'],
+        )
+        existing.refresh_from_db()
+        self.assertEqual(existing.crm, '111')
+        self.assertEqual(result.created, 2)
+        self.assertEqual(sorted(Doctor.objects.values_list('crm', flat=True)), ['111', '222', '333'])
+        self.assertTrue(Doctor.objects.get(crm='333').attends_sus)
+
+    def test_linha_com_crm_atualiza_pelo_crm(self):
+        existing = self.doctor('João Silva', crm='111')
+        result = self.run_import(['João da Silva', 'Cardiologia', '111', '', '', 'Sim'])
+        existing.refresh_from_db()
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual(existing.name, 'João da Silva')
+        self.assertTrue(existing.attends_sus)
+
+    def test_linha_sem_crm_casa_pelo_nome_sem_apagar_o_crm(self):
+        existing = self.doctor('Maria Souza', crm='111')
+        result = self.run_import(['Maria Souza', 'Cardiologia', '', '', '', 'Sim'])
+        existing.refresh_from_db()
+        self.assertEqual((result.created, result.updated), (0, 1))
+        self.assertEqual(existing.crm, '111')
+        self.assertTrue(existing.attends_sus)
+
+    def test_linha_sem_crm_com_homonimos_e_recusada(self):
+        self.doctor('Maria Souza', crm='111')
+        self.doctor('Maria Souza', crm='222')
+        result = self.run_import(['Maria Souza', 'Cardiologia', '', '', '', 'Sim'])
+        self.assertEqual((result.created, result.updated), (0, 0))
+        self.assertEqual([line for line, _ in result.errors], [2])
+        self.assertFalse(Doctor.objects.filter(attends_sus=True).exists())
+
+    def test_linha_curta_mantem_as_colunas_ausentes(self):
+        existing = self.doctor('Ana Lima', crm='111', hospital=self.hospital, city=self.city, attends_sus=True)
+        result = self.run_import(['Ana Lima', 'Cardiologia', '111'])
+        existing.refresh_from_db()
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(existing.hospital, self.hospital)
+        self.assertEqual(existing.city, self.city)
+        self.assertTrue(existing.attends_sus)
+
+    def test_linhas_de_tamanhos_diferentes_no_mesmo_lote(self):
+        short = self.doctor('Ana Lima', crm='111', hospital=self.hospital, attends_sus=True)
+        full = self.doctor('Beatriz Costa', crm='222', hospital=self.hospital, attends_sus=True)
+        self.run_import(
+            ['Ana Lima', 'Cardiologia', '111'],
+            ['Beatriz Costa', 'Cardiologia', '222', '', '', 'Não'],
+        )
+        short.refresh_from_db()
+        full.refresh_from_db()
+        self.assertEqual(short.hospital, self.hospital)
+        self.assertTrue(short.attends_sus)
+        self.assertIsNone(full.hospital)
+        self.assertFalse(full.attends_sus)
+
+
+class VisitChartTests(TestCase):
+    def test_visita_com_data_futura_fica_fora_dos_graficos(self):
+        user = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        specialty = Specialty.objects.create(name='Cardiologia')
+        hospital = Hospital.objects.create(name='Santa Casa', city=City.objects.create(name='Franca', uf='SP'))
+        doctor = Doctor.objects.create(name='João da Silva', specialty=specialty, address='', status='')
+        today = datetime.date.today()
+        for visit_date in (today, today + datetime.timedelta(days=62)):
+            visit = Visit.objects.create(doctor=doctor, specialty=specialty, hospital=hospital, visit_date=visit_date)
+            visit.members.add(user)
+
+        self.client.force_login(user)
+        for group in CHART_GROUPS:
+            with self.subTest(group=group):
+                response = self.client.get('/analytics/visits/', {'group': group})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(sum(item['total'] for item in response.json()['totals']), 1)
+
+
+class VisitRollupTests(TestCase):
+    def setUp(self):
+        self.specialty = Specialty.objects.create(name='Cardiologia')
+        self.doctor = Doctor.objects.create(name='João da Silva', specialty=self.specialty, address='', status='')
+        self.today = datetime.date.today()
+        self.dimensions = (self.today, 'Visita', self.specialty.id, None, None)
+
+    def daily_counts(self):
+        return list(VisitRollup.objects.filter(period='D', member__isnull=True).values_list('count', flat=True))
+
+    def test_combinacao_com_campos_vazios_nao_se_repete(self):
+        key = {'period': 'D', 'period_start': self.today, 'visit_type': 'Visita', 'specialty': self.specialty}
+        VisitRollup.objects.create(count=1, **key)
+        with self.assertRaises(IntegrityError):
+            VisitRollup.objects.create(count=1, **key)
+
+    def test_desconto_mexe_numa_linha_so(self):
+        analytics._apply(self.dimensions, [], 2)
+        analytics._apply(self.dimensions, [], -1)
+        self.assertEqual(self.daily_counts(), [1])
+        analytics._apply(self.dimensions, [], -1)
+        self.assertEqual(self.daily_counts(), [])
+        analytics._apply(self.dimensions, [], -1)  # sem linha: nada a descontar
+        self.assertEqual(self.daily_counts(), [])
+
+    def test_linha_criada_por_outro_processo_recebe_a_soma(self):
+        # Outro processo cria a linha entre o UPDATE vazio e o get_or_create
+        key = {'period': 'D', 'period_start': self.today, 'visit_type': 'Visita', 'specialty_id': self.specialty.id,
+               'hospital_id': None, 'city_id': None, 'member_id': None}
+        get_or_create = VisitRollup.objects.get_or_create
+
+        def racing_get_or_create(**kwargs):
+            if kwargs['period'] == 'D':
+                VisitRollup.objects.create(count=1, **key)
+            return get_or_create(**kwargs)
+
+        with mock.patch.object(VisitRollup.objects, 'get_or_create', side_effect=racing_get_or_create):
+            analytics._apply(self.dimensions, [], 1)
+        self.assertEqual(self.daily_counts(), [2])
+
+
+class EmailConfigCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        versions.forget_versions()
+        self.config = EmailConfiguration.objects.create(
+            smtp_server='smtp.example.com', smtp_port=587, email_user='colih@example.com', email_password='x',
+        )
+
+    def test_leitura_quente_nao_consulta_o_banco(self):
+        email_config.get_email_config()
+        with self.assertNumQueries(0):
+            self.assertEqual(email_config.get_email_config(), self.config)
+            self.assertEqual(email_config.connection_params()['host'], 'smtp.example.com')
+
+    def test_troca_em_outro_processo_e_percebida_apos_o_intervalo(self):
+        email_config.get_email_config()
+        # Outro processo salvou: troca a versão compartilhada sem passar por este
+        EmailConfiguration.objects.filter(pk=self.config.pk).update(smtp_server='smtp2.example.com')
+        cache.set(email_config.VERSION_KEY, 'outra', None)
+        self.assertEqual(email_config.connection_params()['host'], 'smtp.example.com')
+        later = versions.time.monotonic() + versions.VERSION_CHECK_SECONDS + 1
+        with mock.patch.object(versions.time, 'monotonic', return_value=later):
+            self.assertEqual(email_config.connection_params()['host'], 'smtp2.example.com')
+
+    def test_alteracao_no_proprio_processo_vale_na_hora(self):
+        email_config.get_email_config()
+        self.config.smtp_server = 'smtp3.example.com'
+        self.config.save()
+        self.assertEqual(email_config.connection_params()['host'], 'smtp3.example.com')
+
+
+class ExportJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        specialty = Specialty.objects.create(name='Cardiologia')
+        Doctor.objects.create(name='João da Silva', specialty=specialty, address='', status='')
+        self.client.force_login(self.user)
+
+    def test_arquivo_fica_no_pedido_e_e_baixado_pelo_web(self):
+        job = jobs.enqueue_export(self.user, 'doctors', {}, 'csv')
+        jobs.run_worker(once=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FIN')
+        response = self.client.get('/exports/%s/download/' % job.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('João da Silva', b''.join(response.streaming_content).decode('utf-8-sig'))
+
+    def test_arquivo_ausente_responde_404(self):
+        job = ExportJob.objects.create(user=self.user, kind='doctors', status='FIN')
+        self.assertEqual(self.client.get('/exports/%s/download/' % job.id).status_code, 404)
+
+    def test_pedidos_antigos_sao_apagados(self):
+        old = ExportJob.objects.create(user=self.user, kind='doctors', status='FIN', content=b'x')
+        pending = ExportJob.objects.create(user=self.user, kind='doctors')
+        recent = ExportJob.objects.create(user=self.user, kind='doctors', status='ERR')
+        cutoff = datetime.datetime.now() - datetime.timedelta(days=jobs.EXPORT_RETENTION_DAYS + 1)
+        ExportJob.objects.filter(id__in=[old.id, pending.id]).update(created_at=cutoff)
+        self.assertEqual(jobs.purge_old_jobs(), 1)
+        self.assertEqual(set(ExportJob.objects.values_list('id', flat=True)), {pending.id, recent.id})
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        specialty = Specialty.objects.create(name='Cardiologia')
+        for name in ['José da Silva', 'Sílvia Souza', 'Ana Lima']:
+            Doctor.objects.create(name=name, specialty=specialty, address='', status='')
+
+    def names(self, term):
+        return sorted(Doctor.objects.filter(search_q(Doctor, term)).values_list('name', flat=True))
+
+    def test_termo_curto_busca_trecho_em_qualquer_parte_do_nome(self):
+        self.assertEqual(self.names('si'), ['José da Silva', 'Sílvia Souza'])
+        self.assertEqual(self.names('Lí'), ['Ana Lima'])
+
+    def test_termo_longo_ignora_acentos(self):
+        self.assertEqual(self.names('SILV'), ['José da Silva', 'Sílvia Souza'])
+
+
+class GvpFeedTests(TestCase):
+    def planilha(self, nome, updated_at):
+        planilha = PlanilhaEmergencia.objects.create(
+            nome_paciente=nome, data_hora_contato=datetime.datetime.now(), status_gvp='AND',
+        )
+        PlanilhaEmergencia.objects.filter(id=planilha.id).update(updated_at=updated_at)
+        return planilha
+
+    def test_commit_atrasado_chega_pela_janela_de_releitura(self):
+        now = datetime.datetime.now()
+        self.planilha('Antiga', now - datetime.timedelta(seconds=FEED_OVERLAP_SECONDS + 5))
+        self.planilha('Primeira', now)
+        cursors = feed_cursors()
+        # Carimbada antes do cursor, mas só ficou visível depois dele
+        late = self.planilha('Atrasada', now - datetime.timedelta(seconds=2))
+        changes = changes_since(Q(), cursors['planilhas'], cursors['visits'])
+        ids = [p['id'] for p in changes['planilhas']]
+        self.assertIn(late.id, ids)
+        self.assertNotIn('Antiga', [p['nome_paciente'] for p in changes['planilhas']])
+        self.assertEqual(changes['cursors']['planilhas'], cursors['planilhas'])
+
+
+class MailQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        versions.forget_versions()
+        EmailConfiguration.objects.create(
+            smtp_server='smtp.example.com', smtp_port=587, email_user='colih@example.com', email_password='x',
+        )
+        self.email = mail_queue.enqueue_email('Assunto', '<p>Texto</p>', ['membro@example.com'])
+
+    def expire_lease(self):
+        OutboundEmail.objects.filter(id=self.email.id).update(
+            next_attempt_at=datetime.datetime.now() - datetime.timedelta(seconds=1),
+        )
+
+    def test_envio_normal(self):
+        mail_queue.run_mail_worker(once=True)
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('FIN', 1))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_mensagem_que_derruba_o_worker_para_no_limite(self):
+        for _ in range(mail_queue.MAX_ATTEMPTS):
+            self.assertEqual(len(mail_queue.claim_batch()), 1)
+            self.expire_lease()  # o worker caiu sem registrar nada
+        self.assertEqual(mail_queue.claim_batch(), [])
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('ERR', mail_queue.MAX_ATTEMPTS))
+
+    def test_erro_no_lote_nao_derruba_o_worker(self):
+        with mock.patch.object(mail_queue, 'send_batch', side_effect=RuntimeError('banco fora do ar')):
+            mail_queue.run_mail_worker(once=True)
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('RUN', 1))
+        self.expire_lease()
+        mail_queue.run_mail_worker(once=True)
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ('FIN', 2))
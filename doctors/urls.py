@@ -6,29 +6,53 @@ from . import views
 app_name = 'doctors'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('analytics/visits/', views.visit_chart_data, name='visit_chart_data'),
     path('config/email/', views.configure_email, name='configure_email'),
     path('config/email/testar/', views.testar_smtp, name='testar_smtp'),
     path('doctors/add/', views.add_doctor, name='add_doctor'),
+    path('doctors/import/', views.import_doctors_file, name='import_doctors'),
     path('doctors/list/', views.list_doctors, name='list_doctors'),
+    path('doctors/list/data/', views.list_doctors_data, name='list_doctors_data'),
+    path('doctors/nearest/', views.list_nearest_doctors, name='list_nearest_doctors'),
+    path('doctors/nearest/data/', views.list_nearest_doctors_data, name='list_nearest_doctors_data'),
+    path('doctors/coverage/', views.coverage_report, name='coverage_report'),
+    path('doctors/coverage/export/xlsx/', views.export_coverage_xlsx, name='export_coverage_xlsx'),
     path('doctors/<int:doctor_id>/edit/', views.edit_doctor, name='edit_doctor'),
     path('doctors/<int:doctor_id>/phone/<int:phone_id>/delete/', views.delete_phone, name='delete_phone'),
     path('doctors/export/xlsx/', views.export_doctors_xlsx, name='export_doctors_xlsx'),
+    path('doctors/export/csv/', views.export_doctors_csv, name='export_doctors_csv'),
     path('specialties/add/', views.add_specialty, name='add_specialties'),
     path('specialties/list/', views.list_specialties, name='list_specialties'),
     path('specialties/<int:specialty_id>/edit/', views.edit_specialty, name='edit_specialty'),
     path('phones/list/', views.list_phones, name='list_phones'),
+    path('phones/lookup/', views.phone_lookup, name='phone_lookup'),
     path('visits/add/', views.add_visit, name='add_visit'),
+    path('visits/add/batch/', views.add_visit_batch, name='add_visit_batch'),
     path('visits/list/', views.list_visits, name='list_visits'),
+    path('visits/plans/', views.list_visit_plans, name='list_visit_plans'),
+    path('visits/plans/<int:plan_id>/', views.visit_plan_detail, name='visit_plan_detail'),
     path('visits/<int:visit_id>/edit/', views.edit_visit, name='edit_visit'),
     path('visits/<int:visit_id>/delete/', views.delete_visit, name='delete_visit'),
     path('emergencia/add/', views.add_planilha_emergencia, name='add_planilha_emergencia'),
     path('emergencia/list/', views.list_planilhas, name='list_planilha_emergencia'),
+    path('emergencia/boletim/', views.gerar_boletim_diario, name='gerar_boletim_diario'),
+    path('emergencia/arquivo/', views.list_archived_cases, name='list_archived_cases'),
+    path('emergencia/arquivo/<int:archive_id>/', views.archived_case_detail, name='archived_case_detail'),
     path('emergencia/<int:planilha_id>/edit/', views.edit_planilha_emergencia, name='edit_planilha_emergencia'),
+    path('emergencia/<int:planilha_id>/historico/', views.planilha_history, name='planilha_history'),
+    path('emergencia/<int:planilha_id>/print/', views.print_planilha_emergencia, name='print_planilha_emergencia'),
+    path('emergencia/<int:planilha_id>/pdf/', views.planilha_emergencia_pdf, name='planilha_emergencia_pdf'),
     path('emergencia/<int:planilha_id>/submeter-gvp/', views.submeter_para_gvp, name='submeter_para_gvp'),
     path('emergencia/<int:planilha_id>/boletim/', views.gerar_boletim_whatsapp, name='gerar_boletim'),
     path('gvp/acompanhamentos/', views.list_gvp_active_cases, name='list_gvp_plan'),
+    path('gvp/painel/', views.gvp_board, name='gvp_board'),
+    path('gvp/painel/changes/', views.gvp_changes, name='gvp_changes'),
     path('gvp/register/', views.add_gvp_visit, name='add_gvp_visit'),
     path('gvp/<int:planilha_id>/register/', views.add_gvp_visit, name='add_gvp_visit_direct'),
+    path('exports/<str:kind>/request/', views.request_export, name='request_export'),
+    path('exports/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('exports/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views.download_export, name='download_export'),
     #path('<int:doctor_id>/results/', views.results, name='results'),
     #path('<int:doctor_id>/vote/', views.vote, name='vote'),
 ]
@@ -1,42 +1,43 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
 from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from django.core.mail import EmailMultiAlternatives, get_connection
-from .models import EmailConfiguration
+from .email_config import get_email_config
+from .mail_queue import enqueue_fanout
+
+
+def destinatarios_gvp(planilha):
+    """
+    E-mails de quem deve ser avisado sobre a planilha, numa só consulta:
+    membros GVP ativos e membros designados nos acompanhamentos dela.
+    """
+    emails = User.objects.filter(
+        Q(membrogvp__ativo=True) | Q(gvp_assignments__planilha=planilha),
+        is_active=True,
+    ).exclude(email='').values_list('email', flat=True).distinct()
+    # O mesmo endereço pode estar cadastrado com maiúsculas diferentes
+    unicos = {}
+    for email in emails:
+        unicos.setdefault(email.strip().lower(), email.strip())
+    return sorted(unicos.values())
+
 
 def disparar_alerta_gvp(planilha, request):
-    config = EmailConfiguration.objects.first()
+    config = get_email_config()
     if not config:
         return False
+    destinatarios = destinatarios_gvp(planilha)
+    if not destinatarios:
+        return False
 
     assunto = f"🚨 GVP: Acompanhamento Urgente - {planilha.nome_paciente}"
-    
+
     # Contexto para o template
     context = {
         'planilha': planilha,
         'site_url': request.build_absolute_uri('/')[:-1] # Pega a URL base do sistema
     }
 
-    # Renderiza o HTML e cria uma versão em texto simples (fallback)
+    # Renderiza o HTML uma vez por planilha; o worker da fila (run_mail_worker)
+    # envia as mensagens em grupos de cópia oculta pela mesma conexão
     html_content = render_to_string('emails/alerta_gvp.html', context)
-    text_content = strip_tags(html_content)
-
-    try:
-        connection = get_connection(
-            host=config.smtp_server,
-            port=config.smtp_port,
-            username=config.email_user,
-            password=config.email_password,
-            use_tls=config.use_tls
-        )
-
-        # Usamos EmailMultiAlternatives para enviar HTML + Texto
-        email = EmailMultiAlternatives(
-            assunto, text_content, config.email_user, ['amigao.ituverava@gmail.com'], # Troque pelo e-mail da equipe
-            connection=connection
-        )
-        email.attach_alternative(html_content, "text/html")
-        email.send()
-        return True
-    except Exception as e:
-        print(f"Erro ao enviar e-mail: {e}")
-        return False
\ No newline at end of file
+    return enqueue_fanout(assunto, html_content, destinatarios)
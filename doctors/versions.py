@@ -0,0 +1,45 @@
+"""
+Versões compartilhadas entre processos, com cópia local em cada um.
+
+A versão de um dado (configuração de e-mail, grupos do GVP...) fica no
+cache do Django, que é o mesmo para todos os processos e máquinas
+(settings.CACHES). Como esse cache fica no banco, cada processo guarda a
+última versão lida e só volta a conferi-la depois de VERSION_CHECK_SECONDS:
+nas leituras do meio não há consulta nenhuma. Uma troca feita em outro
+processo é percebida em até VERSION_CHECK_SECONDS; no processo que trocou,
+na hora.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+
+VERSION_CHECK_SECONDS = 30
+
+_seen = {}  # chave -> (versão, time.monotonic() da leitura)
+
+
+def current_version(key):
+    now = time.monotonic()
+    seen = _seen.get(key)
+    if seen is not None and now - seen[1] < VERSION_CHECK_SECONDS:
+        return seen[0]
+    version = cache.get(key)
+    if version is None:
+        # Primeira leitura (ou cache limpo): quem gravar primeiro define a versão
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    _seen[key] = (version, now)
+    return version
+
+
+def bump_version(key):
+    version = uuid.uuid4().hex
+    cache.set(key, version, None)
+    _seen[key] = (version, time.monotonic())
+    return version
+
+
+def forget_versions():
+    """Descarta as cópias locais (a próxima leitura confere o cache)."""
+    _seen.clear()
@@ -1,26 +1,76 @@
-import openpyxl
+import copy
+import datetime
+import io
 import smtplib
+import tempfile
 from unidecode import unidecode
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
-from django.http import Http404, HttpResponse, JsonResponse
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import Count, DateField, F, Prefetch, Q, Value
+from django.db.models.functions import Coalesce
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.template import loader
 
-from .forms import (EmailConfigForm, AddDoctorForm, AddPhoneForm, AddSpecialtyForm, AddVisitForm, FindDoctorForm,
-                    FindSpecialtyForm, FindVisitForm, PlanilhaEmergenciaForm, FindPlanilhaForm, FilterGvpStatusForm, GvpVisitForm)
-from .models import EmailConfiguration, Doctor, Phone, Specialty, Visit, PlanilhaEmergencia, GvpVisit
+from .forms import (EmailConfigForm, AddDoctorForm, AddPhoneForm, AddSpecialtyForm, AddVisitForm, BatchVisitForm,
+                    CoverageReportForm, FindArchivedCaseForm, FindDoctorForm, FindPhoneForm, FindSpecialtyForm, FindVisitForm, ImportDoctorsForm,
+                    NearestDoctorsForm, PlanilhaEmergenciaForm, FindPlanilhaForm, FilterGvpStatusForm, GvpVisitForm,
+                    VisitPlanForm)
+from .analytics import CHART_GROUPS, CHART_MONTHS, chart_data, daily_chart_data
+from .archive import load_payload, search_archive
+from .bulletins import case_bulletin, daily_bulletin
+from .choices import doctor_total
+from .coverage import coverage_days, coverage_summary, overdue_doctors
+from .email_config import get_email_config
+from .exports import (DOCTOR_COLUMNS, EXPORT_KINDS, XLSX_CONTENT_TYPE, column_widths, doctor_export_queryset, doctor_row,
+                      export_rows, stream_csv, write_xlsx)
+from .feed import BOARD_STATUSES, changes_since, feed_cursors
+from .filters import doctor_filters, doctor_specialty_q, phone_filters, planilha_filters, visit_filters
+from .geo import NEAREST_LIMIT, nearest_doctors, place_coordinates
+from .history import record_change, snapshot, timeline
+from .gvp_scope import request_scope_q
+from .imports import import_doctors
+from .jobs import enqueue_export
+from .models import (ArchivedCase, CaseHistory, City, Doctor, ExportJob, Hospital, Phone, Specialty, Visit, PlanilhaEmergencia,
+                     GvpVisit, VisitPlan)
+from .pagination import encode_cursor, keyset_paginate
+from .printable import printable_planilha
+from .phones import MIN_LOOKUP_DIGITS, lookup_phone
+from .scheduler import create_plan
+from .search import search_q
 from .utils import disparar_alerta_gvp
+from .visit_batch import record_visit_batch
 
 # Create your views here.
 
+DOCTORS_PER_PAGE = 50
+MAX_OFFSET_START = 1000  # maior 'start' aceito sem cursor no endpoint do DataTables
+PHONES_PER_PAGE = 50
+ASSIGNMENTS_PER_PAGE = 100
+PLANILHAS_PER_PAGE = 50
+BOARD_CASES = 100
+FEED_POLL_SECONDS = 10  # intervalo de consulta do painel GVP ao vivo
+DOCTOR_SORT_COLUMNS = {
+    '0': 'name',
+    '1': 'specialty__name',
+    '2': 'city__name',
+    '3': 'hospital__name',
+    '4': 'last_visit',
+    '5': 'visit_count',
+}
+
 
 @login_required
 @permission_required('admin.can_change_email_config', raise_exception=True)
 def configure_email(request):
-    # Tenta pegar a primeira configuração existente ou cria uma nova
-    config = EmailConfiguration.objects.first()
+    # Configuração atual (do cache) ou uma nova; o formulário recebe uma
+    # cópia para não alterar a instância em cache se o POST for inválido
+    config = get_email_config()
+    if config is not None:
+        config = copy.copy(config)
     
     if request.method == 'POST':
         form = EmailConfigForm(request.POST, instance=config)
@@ -70,6 +120,21 @@ def index(request):
     }
     return HttpResponse(template.render(context, request))
 
+@login_required
+@permission_required('doctors.view_visit', raise_exception=True)
+def visit_chart_data(request):
+    """Séries dos gráficos do painel, lidas só dos resumos (VisitRollup)."""
+    group = request.GET.get('group', 'visit_type')
+    if group == 'daily':
+        return JsonResponse(daily_chart_data())
+    if group not in CHART_GROUPS:
+        return JsonResponse({'error': 'Agrupamento inválido.'}, status=400)
+    try:
+        months = min(max(int(request.GET.get('months', CHART_MONTHS)), 1), 36)
+    except ValueError:
+        return JsonResponse({'error': 'Quantidade de meses inválida.'}, status=400)
+    return JsonResponse(chart_data(group, months=months))
+
 @login_required
 @permission_required('doctors.add_specialty', raise_exception=True)
 def add_specialty(request):
@@ -144,6 +209,30 @@ def add_doctor(request):
     }
     return HttpResponse(template.render(context, request))
 
+@login_required
+@permission_required('doctors.add_doctor', raise_exception=True)
+@permission_required('doctors.change_doctor', raise_exception=True)
+def import_doctors_file(request):
+    result = None
+    if request.method == 'POST':
+        form = ImportDoctorsForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            result = import_doctors(upload, upload.name)
+            if result.errors:
+                messages.warning(request, f'Importação concluída com {len(result.errors)} linha(s) com erro.')
+            else:
+                messages.success(request, 'Importação concluída com sucesso.')
+    else:
+        form = ImportDoctorsForm()
+    context = {
+        'title': 'Importar Médicos em Lote',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'form': form,
+        'result': result,
+    }
+    return render(request, 'doctors/import.html', context)
+
 @login_required
 @permission_required('doctors.change_doctor', raise_exception=True)
 def edit_doctor(request, doctor_id):
@@ -181,80 +270,61 @@ def edit_doctor(request, doctor_id):
 @login_required
 @permission_required('doctors.view_doctor', raise_exception=True)
 def export_doctors_xlsx(request):
-    filter_search = {}
-    for key, value in request.GET.items():
-        if key in ['name', 'hospital', 'city'] and value:
-            filter_search['%s__icontains' % key] = value
-        elif key in ['specialty'] and value:
-            filter_search[key] = value
-    doctors = Doctor.objects.filter(**filter_search).select_related('specialty', 'hospital')
-
-
-    # 1. Criar o Workbook e a planilha ativa
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Lista de Médicos"
-
-    # 2. Definir o cabeçalho
-    columns = [
-        'Nome completo do Médico', 
-        'Especialidade 1', 
-        'Especialidade 2 (opcional)', 
-        'Especialidade 3 (opcional)', 
-        'Subespecialidade (opcional)', 
-        'Tipo de paciente', 
-        'Atende SUS?', 
-        'Faz cirurgias?', 
-        'Data da última visita ', 
-        'É Testemunha de Jeová?', 
-        'É Consultor  informado ao HID?', 
-    ]
-    ws.append(columns)
-
-    # Estilizar o cabeçalho (Negrito e Cor de fundo)
-    for cell in ws[1]:
-        cell.font = openpyxl.styles.Font(bold=True, color="FFFFFF")
-        cell.fill = openpyxl.styles.PatternFill(start_color="4E73DF", end_color="4E73DF", fill_type="solid")
-
-    # 3. Buscar os dados do banco
-    # Usamos select_related para performance nas chaves estrangeiras
-    doctors = Doctor.objects.filter(**filter_search).select_related('specialty', 'hospital')
-
-    for doctor in doctors:
-        ws.append([
-            doctor.name,
-            doctor.specialty.name if doctor.specialty else "",
-            doctor.specialty2.name if doctor.specialty2 else "",
-            doctor.specialty3.name if doctor.specialty3 else "",
-            doctor.subspecialty if doctor.subspecialty else "",
-            doctor.type_patient,
-            'Sim'if doctor.attends_sus else 'Não',
-            'Sim'if doctor.performs_surgeries else 'Não',
-            'Sim'if doctor.last_visit else 'Não',
-            'Sim'if doctor.is_jehovah_witness else 'Não',
-            'Sim'if doctor.is_hid_consultant else 'Não',
-        ])
-
-    # 4. Ajustar a largura das colunas automaticamente
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except: pass
-        ws.column_dimensions[column].width = max_length + 2
-
-    # 5. Preparar a resposta do navegador
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    doctors = doctor_export_queryset(doctor_filters(request.GET))
+
+    # As linhas vão para os arquivos temporários do workbook write-only e o
+    # resultado é enviado em blocos, sem montar a planilha na memória.
+    output = tempfile.TemporaryFile()
+    write_xlsx(
+        output, "Lista de Médicos", DOCTOR_COLUMNS,
+        export_rows(doctors, doctor_row),
+        widths=column_widths(doctors, DOCTOR_COLUMNS),
     )
-    response['Content-Disposition'] = 'attachment; filename="Relatorio_Medicos.xlsx"'
-    
-    wb.save(response)
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename='Relatorio_Medicos.xlsx', content_type=XLSX_CONTENT_TYPE,
+    )
+
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def export_doctors_csv(request):
+    doctors = doctor_export_queryset(doctor_filters(request.GET))
+    response = StreamingHttpResponse(
+        stream_csv(DOCTOR_COLUMNS, export_rows(doctors, doctor_row)),
+        content_type='text/csv; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="Relatorio_Medicos.csv"'
     return response
 
+def _doctor_list_queryset(params):
+    # Traz especialidade, cidade e hospital no mesmo SELECT (sem N+1 no template)
+    return Doctor.objects.filter(doctor_filters(params))\
+        .select_related('specialty', 'city', 'hospital')\
+        .only('name', 'last_visit', 'visit_count', 'specialty__name', 'city__name', 'hospital__name')
+
+def _doctor_sorted(doctors, column):
+    # Ordenação por (coluna, id) para a paginação por cursor.
+    field = DOCTOR_SORT_COLUMNS.get(column, 'name')
+    if field in ['name', 'visit_count']:
+        return doctors, (field, 'id')
+    if field == 'last_visit':
+        # Nunca visitados ficam juntos no início (ordem crescente)
+        sort_key = Coalesce(field, Value(datetime.date.min), output_field=DateField())
+    else:
+        sort_key = Coalesce(field, Value(''))
+    return doctors.annotate(sort_key=sort_key), ('sort_key', 'id')
+
+def _doctor_row(doctor):
+    return {
+        'id': doctor.id,
+        'name': doctor.name,
+        'specialty': doctor.specialty.name if doctor.specialty else '',
+        'city': doctor.city.name if doctor.city else '',
+        'hospital': doctor.hospital.name if doctor.hospital else '',
+        'last_visit': doctor.last_visit.strftime('%d/%m/%Y') if doctor.last_visit else '',
+        'visit_count': doctor.visit_count,
+    }
+
 @login_required
 @permission_required('doctors.view_doctor', raise_exception=True)
 def list_doctors(request):
@@ -263,22 +333,175 @@ def list_doctors(request):
     form.fields['specialty'].required = False
     form.fields['hospital'].required = False
     form.fields['city'].required = False
-    filter_search = {}
-    for key, value in request.GET.items():
-        if key in ['name', 'hospital', 'city'] and value:
-            filter_search['%s__icontains' % key] = value
-        elif key in ['specialty'] and value:
-            filter_search[key] = value
-    doctors = Doctor.objects.filter(**filter_search)
+    doctors = _doctor_list_queryset(request.GET)
+    page = keyset_paginate(
+        doctors, ('name', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=DOCTORS_PER_PAGE,
+    )
+    # Filtros atuais sem os cursores, para montar os links de navegação
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
     template = loader.get_template('doctors/list.html')
     context = {
         'title': 'Relação de Médicos Cooperadores',
         'username': '%s %s' % (request.user.first_name, request.user.last_name),
-        'doctors': doctors,
+        'doctors': page,
+        'page': page,
+        'total_filtered': doctors.count() if doctor_filters(request.GET) else doctor_total(),
+        'total': doctor_total(),
+        'per_page': DOCTORS_PER_PAGE,
+        'querystring': querystring.urlencode(),
         'form': form,
     }
     return HttpResponse(template.render(context, request))
 
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def list_doctors_data(request):
+    """
+    Endpoint JSON no formato do DataTables (server-side processing).
+    O cliente envia o cursor da página anterior em 'cursor'; sem ele, a
+    posição 'start' é convertida em cursor uma única vez.
+    """
+    params = request.GET
+    doctors = _doctor_list_queryset(params)
+    search = params.get('search[value]', '').strip()
+    filtered = bool(search or doctor_filters(params))
+    if search:
+        doctors = doctors.filter(
+            search_q(Doctor, search) | search_q(Hospital, search, 'hospital__') | search_q(City, search, 'city__')
+        )
+
+    try:
+        length = min(max(int(params.get('length', DOCTORS_PER_PAGE)), 1), 200)
+        start = max(int(params.get('start', 0)), 0)
+        draw = int(params.get('draw', 0))
+    except ValueError:
+        return JsonResponse({'error': 'Parâmetros de paginação inválidos.'}, status=400)
+
+    descending = params.get('order[0][dir]') == 'desc'
+    doctors, keys = _doctor_sorted(doctors, params.get('order[0][column]', '0'))
+    cursor = params.get('cursor')
+    # Sem cursor, a posição só é convertida por OFFSET nas primeiras páginas;
+    # além disso, volta para a primeira (o cliente navega por cursor)
+    if not cursor and 0 < start <= MAX_OFFSET_START:
+        order = [('-%s' if descending else '%s') % key for key in keys]
+        anchor = doctors.order_by(*order).values_list(*keys)[start - 1:start]
+        cursor = encode_cursor(anchor[0]) if anchor else None
+
+    page = keyset_paginate(doctors, keys, after=cursor, per_page=length, descending=descending)
+    total = doctor_total()
+    return JsonResponse({
+        'draw': draw,
+        'recordsTotal': total,
+        'recordsFiltered': doctors.count() if filtered else total,
+        'data': [_doctor_row(doctor) for doctor in page],
+        'next_cursor': page.next_cursor,
+    })
+
+def _nearest_search(params):
+    """Valida os parâmetros e devolve (form, origem, [(distância, médico)])."""
+    form = NearestDoctorsForm(params)
+    if not form.is_valid():
+        return form, None, []
+    data = form.cleaned_data
+    origin = place_coordinates(data['hospital']) or place_coordinates(data['city'])
+    if origin is None:
+        form.add_error(None, "O local escolhido ainda não tem coordenadas (rode o comando load_gazetteer).")
+        return form, None, []
+    filters = Q()
+    if data['specialty']:
+        filters &= doctor_specialty_q(data['specialty'].pk)
+    if data['attends_sus']:
+        filters &= Q(attends_sus=True)
+    if data['attends_private']:
+        filters &= Q(attends_private=True)
+    doctors = Doctor.objects.select_related('specialty', 'city', 'hospital')\
+        .only('name', 'latitude', 'longitude', 'attends_sus', 'attends_private',
+              'specialty__name', 'city__name', 'hospital__name')
+    results = nearest_doctors(*origin, limit=data['limit'] or NEAREST_LIMIT, filters=filters, queryset=doctors)
+    return form, origin, results
+
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def list_nearest_doctors(request):
+    form, origin, results = _nearest_search(request.GET) if request.GET else (NearestDoctorsForm(), None, [])
+    template = loader.get_template('doctors/nearest.html')
+    context = {
+        'title': 'Médicos Cooperadores Mais Próximos',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'form': form,
+        'origin': origin,
+        'results': results,
+    }
+    return HttpResponse(template.render(context, request))
+
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def list_nearest_doctors_data(request):
+    form, origin, results = _nearest_search(request.GET)
+    if origin is None:
+        return JsonResponse({'errors': form.errors.get_json_data()}, status=400)
+    data = [{
+        'id': doctor.id,
+        'name': doctor.name,
+        'specialty': doctor.specialty.name if doctor.specialty else '',
+        'city': doctor.city.name if doctor.city else '',
+        'hospital': doctor.hospital.name if doctor.hospital else '',
+        'attends_sus': doctor.attends_sus,
+        'attends_private': doctor.attends_private,
+        'distance_km': round(distance, 1),
+    } for distance, doctor in results]
+    return JsonResponse({'origin': {'latitude': origin[0], 'longitude': origin[1]}, 'data': data})
+
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def coverage_report(request):
+    form = CoverageReportForm(request.GET or None)
+    group = request.GET.get('group') or 'city'
+    days = coverage_days(request.GET)
+    doctors = overdue_doctors(request.GET)\
+        .select_related('specialty', 'city', 'hospital')\
+        .only('name', 'last_visit', 'last_visit_type', 'visit_count',
+              'specialty__name', 'city__name', 'hospital__name')
+    page = keyset_paginate(
+        doctors, ('name', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=DOCTORS_PER_PAGE,
+    )
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
+    context = {
+        'title': 'Médicos sem Visita há %d Dias' % days,
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'form': form,
+        'days': days,
+        'summary': coverage_summary(request.GET, group),
+        'page': page,
+        'total_filtered': doctors.count(),
+        'querystring': querystring.urlencode(),
+    }
+    return render(request, 'doctors/coverage.html', context)
+
+@login_required
+@permission_required('doctors.view_doctor', raise_exception=True)
+def export_coverage_xlsx(request):
+    export = EXPORT_KINDS['coverage']
+    doctors = export.queryset(request.GET)
+    output = tempfile.TemporaryFile()
+    write_xlsx(
+        output, export.title, export.columns,
+        export_rows(doctors, export.row),
+        widths=column_widths(doctors, export.columns),
+    )
+    output.seek(0)
+    return FileResponse(
+        output, as_attachment=True, filename='%s.xlsx' % export.filename, content_type=XLSX_CONTENT_TYPE,
+    )
+
 @login_required
 @permission_required('doctors.delete_phone', raise_exception=True)
 def delete_phone(request, doctor_id, phone_id):
@@ -290,16 +513,72 @@ def delete_phone(request, doctor_id, phone_id):
 @login_required
 @permission_required('doctors.view_phone', raise_exception=True)
 def list_phones(request):
-    phones = Phone.objects.all()
-    print(phones)
+    form = FindPhoneForm(request.GET)
+    form.is_valid()
+    grouped = bool(form.cleaned_data.get('group'))
+    phones = Phone.objects.filter(phone_filters(request.GET))
+    if grouped:
+        # Página de médicos com os telefones de todos eles numa segunda consulta
+        items = Doctor.objects.filter(id__in=phones.values('doctor_id'))\
+            .select_related('specialty').only('name', 'specialty__name')\
+            .prefetch_related(Prefetch('phone_set', queryset=phones.only('doctor_id', 'number', 'observation')
+                                       .order_by('id')))
+        keys = ('name', 'id')
+    else:
+        # Médico e especialidade no mesmo SELECT do telefone
+        items = phones.select_related('doctor__specialty')\
+            .only('number', 'observation', 'doctor__name', 'doctor__specialty__name')\
+            .annotate(doctor_name=F('doctor__name'))
+        keys = ('doctor_name', 'id')
+    page = keyset_paginate(
+        items, keys,
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=PHONES_PER_PAGE,
+    )
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
     template = loader.get_template('phones/list.html')
     context = {
         'title': 'Contatos telefônicos dos médicos',
         'username': '%s %s' % (request.user.first_name, request.user.last_name),
-        'phones': phones,
+        'form': form,
+        'grouped': grouped,
+        'page': page,
+        'total_filtered': items.count(),
+        'querystring': querystring.urlencode(),
     }
     return HttpResponse(template.render(context, request))
 
+def _phone_owner(entry, owner):
+    """Descrição do dono do número para a consulta reversa."""
+    if entry.source == 'phone':
+        doctor = owner.doctor
+        return {'name': doctor.name, 'detail': doctor.specialty.name if doctor.specialty else '',
+                'url': '/doctors/%s/edit/' % doctor.id}
+    if entry.source == 'hospital':
+        return {'name': owner.name, 'detail': owner.city.name, 'url': ''}
+    if entry.source == 'contato':
+        return {'name': owner.nome_telefonou, 'detail': 'Paciente: %s' % owner.nome_paciente,
+                'url': '/emergencia/%s/edit/' % owner.id}
+    hospital = owner.nome_hospital.name if owner.nome_hospital else ''
+    return {'name': hospital or owner.nome_paciente, 'detail': 'Paciente: %s' % owner.nome_paciente,
+            'url': '/emergencia/%s/edit/' % owner.id}
+
+@login_required
+def phone_lookup(request):
+    """Consulta reversa: quem tem o número (ou o final de número) em 'q'."""
+    term = request.GET.get('q', '')
+    if len([c for c in term if c.isdigit()]) < MIN_LOOKUP_DIGITS:
+        return JsonResponse({'error': 'Informe ao menos %d dígitos.' % MIN_LOOKUP_DIGITS}, status=400)
+    data = []
+    for entry, owner in lookup_phone(term, request.user):
+        row = {'source': entry.source, 'source_label': entry.get_source_display(),
+               'number': entry.number, 'digits': entry.digits}
+        row.update(_phone_owner(entry, owner))
+        data.append(row)
+    return JsonResponse({'data': data})
+
 @login_required
 @permission_required('doctors.view_doctor', raise_exception=True)
 def detail(request, doctor_id):
@@ -324,28 +603,12 @@ def list_visits(request):
     for field in form.fields:
         form.fields[field].required = False
 
-    # 3. Monta o dicionário de filtros
-    filter_search = {}
-    
-    if form.is_valid():
-        # Pegamos os dados limpos do formulário
-        data = form.cleaned_data
-        
-        # Filtro por nome do médico (relacionamento doctor -> name)
-        if data.get('doctor_name'):
-            filter_search['doctor__name__icontains'] = data['doctor_name']
-        
-        # Filtro por tipo de visita (exato)
-        if data.get('visit_type'):
-            filter_search['visit_type'] = data['visit_type']
-            
-        # Filtro por especialidade (exato ou nome)
-        if data.get('specialty'):
-            filter_search['specialty'] = data['specialty']
+    # 3. Monta os filtros (nome do médico sem acentos, tipo e especialidade)
+    filter_search = visit_filters(request.GET)
 
     # 4. Busca no banco de dados com os filtros aplicados
     # select_related otimiza a consulta trazendo os dados do médico e especialidade juntos
-    visits = Visit.objects.filter(**filter_search).select_related('doctor', 'specialty').order_by('-visit_date')
+    visits = Visit.objects.filter(filter_search).select_related('doctor', 'specialty').order_by('-visit_date')
 
     template = loader.get_template('visits/list.html')
     context = {
@@ -382,6 +645,32 @@ def add_visit(request):
     # Certifique-se de criar este arquivo HTML no passo seguinte
     return render(request, 'visits/add.html', context)
 
+@login_required
+@permission_required('doctors.add_visit', raise_exception=True)
+def add_visit_batch(request):
+    if request.method == 'POST':
+        form = BatchVisitForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            visits = record_visit_batch(
+                data['doctors'], data['members'], data['visit_date'], data['visit_type'],
+                specialty=data['specialty'], hospital=data['hospital'],
+                article=data['article'], outcome=data['outcome'],
+            )
+            messages.success(request, f'{len(visits)} visita(s) registrada(s) com sucesso!')
+            return redirect('/visits/list')
+        else:
+            messages.error(request, 'Erro ao registrar as visitas. Verifique os campos.')
+    else:
+        form = BatchVisitForm(initial={'hospital': request.GET.get('hospital')})
+
+    context = {
+        'title': 'Registrar Visitas em Lote',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'form': form,
+    }
+    return render(request, 'visits/add.html', context)
+
 @login_required
 @permission_required('doctors.change_visit', raise_exception=True)
 def edit_visit(request, visit_id):
@@ -432,13 +721,66 @@ def delete_visit(request, visit_id):
     }
     return render(request, 'visits/delete.html', context)
 
+@login_required
+@permission_required('doctors.view_visit', raise_exception=True)
+def list_visit_plans(request):
+    if request.method == 'POST':
+        if not request.user.has_perm('doctors.add_visit'):
+            raise PermissionDenied
+        form = VisitPlanForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            plan = create_plan(data['period_start'], days=data['days'], specialty=data['specialty'],
+                               city=data['city'], user=request.user)
+            messages.success(request, f'Escala gerada: {plan.due_total - plan.unassigned} visita(s) distribuída(s).')
+            if plan.unassigned:
+                messages.warning(request, f'{plan.unassigned} médico(s) ficaram sem membro disponível.')
+            return redirect('/visits/plans/%d/' % plan.id)
+    else:
+        form = VisitPlanForm()
+    plans = VisitPlan.objects.select_related('specialty', 'city', 'created_by')[:20]
+    context = {
+        'title': 'Escalas de Visitas',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'form': form,
+        'plans': plans,
+    }
+    return render(request, 'visits/plans.html', context)
+
+@login_required
+@permission_required('doctors.view_visit', raise_exception=True)
+def visit_plan_detail(request, plan_id):
+    plan = get_object_or_404(VisitPlan.objects.select_related('specialty', 'city'), id=plan_id)
+    # Resumo por membro numa única agregação
+    summary = plan.assignments.values('member__first_name', 'member__last_name', 'member__username')\
+        .annotate(total=Count('id')).order_by('-total', 'member__first_name')
+    assignments = plan.assignments.select_related('member', 'doctor__specialty', 'doctor__city', 'doctor__hospital')\
+        .only('due_date', 'member_id', 'member__first_name', 'member__last_name', 'member__username',
+              'doctor__name', 'doctor__last_visit', 'doctor__last_visit_type', 'doctor__specialty__name',
+              'doctor__city__name', 'doctor__hospital__name')
+    page = keyset_paginate(
+        assignments, ('member_id', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=ASSIGNMENTS_PER_PAGE,
+    )
+    context = {
+        'title': str(plan),
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'plan': plan,
+        'summary': summary,
+        'page': page,
+    }
+    return render(request, 'visits/plan_detail.html', context)
+
 @login_required
 @permission_required('doctors.add_planilhaemergencia', raise_exception=True)
 def add_planilha_emergencia(request):
     if request.method == 'POST':
         form = PlanilhaEmergenciaForm(request.POST)
         if form.is_valid():
-            planilha = form.save()
+            with transaction.atomic():
+                planilha = form.save()
+                record_change(planilha, None, request.user)
             messages.success(request, f'Planilha do paciente {planilha.nome_paciente} salva com sucesso!')
             # Você pode redirecionar para a lista de planilhas ou para o detalhe desta planilha
             return redirect('/emergencia/list') 
@@ -462,11 +804,15 @@ def edit_planilha_emergencia(request, planilha_id):
     planilha = get_object_or_404(PlanilhaEmergencia, id=planilha_id)
 
     if request.method == 'POST':
+        # Retrato antes do form: is_valid() já aplica o POST na instância
+        previous = snapshot(planilha)
         # 2. Passamos o POST e a instância (registro atual) para o form
         form = PlanilhaEmergenciaForm(request.POST, instance=planilha)
         
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
+                record_change(planilha, previous, request.user)
             messages.success(request, f'Planilha do paciente {planilha.nome_paciente} atualizada com sucesso!')
             return redirect('/emergencia/list/') # Ajuste para sua URL de listagem
         else:
@@ -484,53 +830,130 @@ def edit_planilha_emergencia(request, planilha_id):
     # Reutilizamos o mesmo template de adição para manter o layout de abas
     return render(request, 'emergency/add.html', context)
 
+@login_required
+@permission_required('doctors.view_planilhaemergencia', raise_exception=True)
+def planilha_history(request, planilha_id):
+    planilha = get_object_or_404(PlanilhaEmergencia.objects.only('nome_paciente', 'data_hora_contato'), id=planilha_id)
+    # Toda a linha do tempo numa consulta, pelo índice (planilha, created_at, id)
+    entries = CaseHistory.objects.filter(planilha=planilha).select_related('user').order_by('-created_at', '-id')
+    context = {
+        'title': f'Histórico: {planilha.nome_paciente}',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'planilha': planilha,
+        'timeline': timeline(entries),
+    }
+    return render(request, 'emergency/history.html', context)
+
+@login_required
+@permission_required('doctors.view_planilhaemergencia', raise_exception=True)
+def print_planilha_emergencia(request, planilha_id):
+    content = printable_planilha(planilha_id, 'html')
+    if content is None:
+        raise Http404
+    return HttpResponse(content)
+
+@login_required
+@permission_required('doctors.view_planilhaemergencia', raise_exception=True)
+def planilha_emergencia_pdf(request, planilha_id):
+    content = printable_planilha(planilha_id, 'pdf')
+    if content is None:
+        raise Http404
+    response = HttpResponse(content, content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="Planilha_Emergencia_%s.pdf"' % planilha_id
+    return response
+
 @login_required
 @permission_required('doctors.view_planilhaemergencia', raise_exception=True)
 def list_planilhas(request):
     form = FindPlanilhaForm(request.GET)
-    filter_search = {}
+    # Nome do paciente (contém, sem acentos) e hospital (ID exato)
+    filter_search = planilha_filters(request.GET)
 
-    if form.is_valid():
-        data = form.cleaned_data
-        
-        # Filtro por texto (contém)
-        if data.get('nome_paciente'):
-            filter_search['nome_paciente__icontains'] = data['nome_paciente']
-        
-        # Filtro exato (ID do hospital)
-        if data.get('nome_hospital'):
-            filter_search['nome_hospital'] = data['nome_hospital']
-
-    # Busca no banco ordenando da mais recente para a mais antiga
-    planilhas = PlanilhaEmergencia.objects.filter(**filter_search)\
+    # Só as colunas da tabela; os campos de texto longos ficam de fora
+    planilhas = PlanilhaEmergencia.objects.filter(filter_search)\
         .select_related('nome_hospital')\
-        .order_by('-data_hora_contato')
+        .only('data_hora_contato', 'nome_paciente', 'medico_responsavel', 'nome_telefonou', 'status_gvp',
+              'tipo_atendimento', 'nome_hospital__name', 'especialidade_responsavel_id')
+    # Da mais recente para a mais antiga, por cursor (índices em data_hora_contato)
+    page = keyset_paginate(
+        planilhas, ('data_hora_contato', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=PLANILHAS_PER_PAGE, descending=True,
+    )
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
 
     template = loader.get_template('emergency/list.html')
     context = {
         'title': 'Gestão de Planilhas de Emergência',
-        'planilhas': planilhas,
+        'planilhas': page,
+        'page': page,
+        'total_filtered': planilhas.count(),
+        'querystring': querystring.urlencode(),
         'form': form,
     }
     return HttpResponse(template.render(context, request))
 
+@login_required
+@permission_required('doctors.view_planilhaemergencia', raise_exception=True)
+def list_archived_cases(request):
+    form = FindArchivedCaseForm(request.GET)
+    # Busca separada, só na tabela de arquivo (ver archive.py)
+    casos = search_archive(request.GET.get('nome_paciente', ''), request.GET.get('hospital', '')).defer('payload')
+    page = keyset_paginate(
+        casos, ('data_hora_contato', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=PLANILHAS_PER_PAGE, descending=True,
+    )
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
+    context = {
+        'title': 'Casos Arquivados',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'casos': page,
+        'page': page,
+        'total_filtered': casos.count(),
+        'querystring': querystring.urlencode(),
+        'form': form,
+    }
+    return render(request, 'emergency/archived_list.html', context)
+
+@login_required
+@permission_required('doctors.view_planilhaemergencia', raise_exception=True)
+def archived_case_detail(request, archive_id):
+    caso = get_object_or_404(ArchivedCase, id=archive_id)
+    data = load_payload(caso)
+    context = {
+        'title': f'Caso Arquivado: {caso.nome_paciente}',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'caso': caso,
+        'sections': data['sheet'],
+        'visits': data['visits'],
+    }
+    return render(request, 'emergency/archived_detail.html', context)
+
 @login_required
 @permission_required('doctors.change_planilhaemergencia', raise_exception=True)
 def submeter_para_gvp(request, planilha_id):
     # Busca a planilha
     planilha = get_object_or_404(PlanilhaEmergencia, id=planilha_id)
+    previous = snapshot(planilha)
     
     # Altera o status para 'Em Acompanhamento'
     planilha.status_gvp = 'AND'
-    planilha.save()
+    with transaction.atomic():
+        planilha.save()
+        record_change(planilha, previous, request.user)
 
-    # Dispara o e-mail automático
+    # Coloca os e-mails de alerta na fila (enviados pelo run_mail_worker)
     enviado = disparar_alerta_gvp(planilha, request)
 
     if enviado:
-        messages.success(request, f'Sucesso! {planilha.nome_paciente} enviado ao GVP e equipe notificada por e-mail.')
+        messages.success(request, f'Sucesso! {planilha.nome_paciente} enviado ao GVP; o alerta aos membros foi colocado na fila de envio.')
     else:
-        messages.warning(request, f'Status alterado, mas houve uma falha ao enviar o e-mail de alerta.')
+        messages.warning(request, 'Status alterado, mas não há configuração de e-mail ou membros GVP com e-mail para receber o alerta.')
     
     # Redireciona de volta para a lista onde ele estava
     return redirect('/emergencia/list/')
@@ -538,23 +961,21 @@ def submeter_para_gvp(request, planilha_id):
 @login_required
 @permission_required('doctors.change_planilhaemergencia', raise_exception=True)
 def gerar_boletim_whatsapp(request, planilha_id):
-    p = get_object_or_404(PlanilhaEmergencia, id=planilha_id)
-    
-    # Montagem do texto
-    texto = (
-        f"*📋 BOLETIM DE ACOMPANHAMENTO - GVP*\n\n"
-        f"*👤 PACIENTE:* {p.nome_paciente}\n"
-        f"*🏥 HOSPITAL:* {p.nome_hospital.name if p.nome_hospital else 'Não informado'}\n"
-        f"*🚪 QUARTO:* {p.numero_quarto or '-'}\n"
-        f"*🩺 MÉDICO:* {p.medico_responsavel}\n"
-        f"*📝 DIAGNÓSTICO:* {p.problema_especifico[:200]}...\n\n"
-        f"*💡 ESTRATÉGIA:* {p.estrategias_opcoes[:200]}...\n\n"
-        f"*📍 SITUAÇÃO GVP:* {p.get_status_gvp_display()}\n"
-        f"------------------------------------------\n"
-        f"_Gerado via Sistema COLIH/GVP em {p.updated_at.strftime('%d/%m/%Y %H:%M')} por {request.user.first_name + ' ' + request.user.last_name}_"
-    )
-    
-    return JsonResponse({'texto': texto})
+    p = get_object_or_404(PlanilhaEmergencia.objects.only('updated_at'), id=planilha_id)
+    return JsonResponse({'texto': case_bulletin(p, request.user)})
+
+@login_required
+@permission_required('doctors.change_planilhaemergencia', raise_exception=True)
+def gerar_boletim_diario(request):
+    # Todos os casos em acompanhamento, do contato mais recente para o mais antigo
+    casos = PlanilhaEmergencia.objects.filter(request_scope_q(request), status_gvp='AND')\
+        .order_by('-data_hora_contato', '-id')
+    texto, trechos = daily_bulletin(casos, request.user)
+    return JsonResponse({
+        'texto': texto,
+        'total': len(trechos),
+        'casos': [{'id': planilha_id, 'nome_paciente': nome, 'texto': trecho} for planilha_id, nome, trecho in trechos],
+    })
 
 @login_required
 @permission_required('doctors.view_gvpvisit', raise_exception=True)
@@ -562,27 +983,72 @@ def list_gvp_active_cases(request):
     form = FilterGvpStatusForm(request.GET)
     # Filtro base: exclui os 'PEN' (Pendentes)
     filter_search = {'status_gvp__in': ['AND', 'FIN']}
+    name_search = request_scope_q(request)
     title = 'Acompanhamentos GVP (Ativos e Concluídos)'
-    if not request.user.is_superuser and request.user.groups.filter(name='GVP - Operacional').exists():
-        my_active = GvpVisit.objects.filter(designated_members=request.user).values_list('planilha__id', flat=True)
-        filter_search['id__in'] = my_active
+    if name_search:
         title = 'Meus Acompanhamentos GVP (Ativos e Concluídos)'
     if form.is_valid():
         if form.cleaned_data.get('nome_paciente'):
-            filter_search['nome_paciente__icontains'] = form.cleaned_data['nome_paciente']
+            name_search &= search_q(PlanilhaEmergencia, form.cleaned_data['nome_paciente'])
         if form.cleaned_data.get('status_gvp'):
             filter_search['status_gvp'] = form.cleaned_data['status_gvp']
         if form.cleaned_data.get('hospital'):
-            filter_search['nome_hospital'] = form.cleaned_data['hospital']
+            filter_search['nome_hospital_id'] = form.cleaned_data['hospital']
 
-    planilhas = PlanilhaEmergencia.objects.filter(**filter_search).select_related('nome_hospital')
+    planilhas = PlanilhaEmergencia.objects.filter(name_search, **filter_search)\
+        .select_related('nome_hospital')\
+        .only('data_hora_contato', 'nome_paciente', 'status_gvp', 'updated_at', 'nome_hospital__name')
+    page = keyset_paginate(
+        planilhas, ('data_hora_contato', 'id'),
+        after=request.GET.get('after'), before=request.GET.get('before'),
+        per_page=PLANILHAS_PER_PAGE, descending=True,
+    )
+    querystring = request.GET.copy()
+    querystring.pop('after', None)
+    querystring.pop('before', None)
     context = {
         'title': title,
-        'planilhas': planilhas,
+        'planilhas': page,
+        'page': page,
+        'total_filtered': planilhas.count(),
+        'querystring': querystring.urlencode(),
         'form': form,
     }
     return render(request, 'gvp/list_plan.html', context)
 
+@login_required
+@permission_required('doctors.view_gvpvisit', raise_exception=True)
+def gvp_board(request):
+    scope = request_scope_q(request)
+    # Cursores lidos antes das linhas: o que mudar no meio chega pelo feed
+    cursors = feed_cursors()
+    planilhas = PlanilhaEmergencia.objects.filter(scope, status_gvp__in=BOARD_STATUSES)\
+        .select_related('nome_hospital')\
+        .only('nome_paciente', 'status_gvp', 'updated_at', 'nome_hospital__name')\
+        .order_by('-updated_at', '-id')[:BOARD_CASES]
+    context = {
+        'title': 'Painel GVP ao Vivo',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'planilhas': planilhas,
+        'cursors': cursors,
+        'poll_seconds': FEED_POLL_SECONDS,
+    }
+    return render(request, 'gvp/board.html', context)
+
+@login_required
+@permission_required('doctors.view_gvpvisit', raise_exception=True)
+def gvp_changes(request):
+    """
+    Polling do painel GVP: planilhas e visitas alteradas depois dos
+    cursores. Responde na hora (duas leituras por intervalo nos índices
+    (updated_at, id)); o painel repete a consulta a cada FEED_POLL_SECONDS.
+    """
+    planilhas_cursor = request.GET.get('planilhas')
+    visits_cursor = request.GET.get('visits')
+    if not planilhas_cursor or not visits_cursor:
+        return JsonResponse({'planilhas': [], 'visits': [], 'cursors': feed_cursors(), 'more': False})
+    return JsonResponse(changes_since(request_scope_q(request), planilhas_cursor, visits_cursor))
+
 @login_required
 @permission_required('doctors.add_gvpvisit', raise_exception=True)
 def add_gvp_visit(request, planilha_id=None):
@@ -594,17 +1060,25 @@ def add_gvp_visit(request, planilha_id=None):
     if request.method == 'POST':
         # Busca se já existe uma visita para esta planilha para atualizar em vez de duplicar
         gvpvisit = GvpVisit.objects.filter(planilha=planilha).first()
+        # O acompanhamento é reaproveitado: o histórico guarda o que cada registro alterou
+        previous_visit = snapshot(gvpvisit) if gvpvisit else None
         form = GvpVisitForm(request.POST, instance=gvpvisit, user=request.user)
         if form.is_valid():
-            viva_gvp = form.save()
-            # Lógica de finalização de status
-            if form.cleaned_data.get('finalizar_caso'):
-                planilha.status_gvp = 'FIN'
-                messages.info(request, "Caso Finalizado.")
-            else:
-                # Se desmarcar, ele volta para 'Em Andamento' (opcional)
-                planilha.status_gvp = 'AND'
-            planilha.save()
+            with transaction.atomic():
+                viva_gvp = form.save()
+                record_change(viva_gvp, previous_visit, request.user)
+                # Sem planilha na URL, vale a escolhida no formulário
+                planilha = viva_gvp.planilha
+                previous = snapshot(planilha)
+                # Lógica de finalização de status
+                if form.cleaned_data.get('finalizar_caso'):
+                    planilha.status_gvp = 'FIN'
+                    messages.info(request, "Caso Finalizado.")
+                else:
+                    # Se desmarcar, ele volta para 'Em Andamento' (opcional)
+                    planilha.status_gvp = 'AND'
+                planilha.save()
+                record_change(planilha, previous, request.user)
             messages.success(request, f'Ação do GVP registrada para o paciente {viva_gvp.planilha.nome_paciente}.')
             return redirect('/gvp/acompanhamentos/') # Ou para uma lista própria do GVP
         else:
@@ -639,4 +1113,61 @@ def add_gvp_visit(request, planilha_id=None):
         'planilha': planilha, # Passamos a planilha para mostrar os dados de leitura
         'title': 'Registro de Atuação GVP'
     }
-    return render(request, 'gvp/add.html', context)
\ No newline at end of file
+    return render(request, 'gvp/add.html', context)
+
+
+@login_required
+def request_export(request, kind):
+    # Enfileira a exportação com os filtros da listagem (querystring da action)
+    if kind not in EXPORT_KINDS:
+        raise Http404("Tipo de exportação inválido")
+    if not request.user.has_perm(EXPORT_KINDS[kind].permission):
+        raise PermissionDenied
+    if request.method != 'POST':
+        return redirect('/')
+    file_format = 'csv' if request.POST.get('file_format') == 'csv' else 'xlsx'
+    job = enqueue_export(request.user, kind, request.GET, file_format)
+    messages.info(request, 'Exportação adicionada à fila. O arquivo ficará disponível nesta página.')
+    return redirect('/exports/%s/' % job.id)
+
+def _get_export_job(request, job_id, with_content=False):
+    queryset = ExportJob.objects.all() if with_content else ExportJob.objects.defer('content')
+    job = get_object_or_404(queryset, id=job_id)
+    if job.user_id != request.user.id and not request.user.is_superuser:
+        raise Http404("Exportação não encontrada")
+    return job
+
+@login_required
+def export_job_detail(request, job_id):
+    job = _get_export_job(request, job_id)
+    context = {
+        'title': 'Exportação em segundo plano',
+        'username': '%s %s' % (request.user.first_name, request.user.last_name),
+        'job': job,
+    }
+    return render(request, 'exports/status.html', context)
+
+@login_required
+def export_job_status(request, job_id):
+    job = _get_export_job(request, job_id)
+    return JsonResponse({
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress,
+        'total': job.total,
+        'percent': job.percent,
+        'error': job.error,
+        'download_url': '/exports/%s/download/' % job.id if job.status == 'FIN' else None,
+    })
+
+@login_required
+def download_export(request, job_id):
+    job = _get_export_job(request, job_id, with_content=True)
+    if job.status != 'FIN':
+        raise Http404("Arquivo ainda não disponível")
+    if job.content is None:
+        raise Http404("Arquivo expirado, peça a exportação novamente")
+    content_type = XLSX_CONTENT_TYPE if job.file_format == 'xlsx' else 'text/csv; charset=utf-8'
+    return FileResponse(
+        io.BytesIO(job.content), as_attachment=True, filename=job.filename, content_type=content_type,
+    )
@@ -0,0 +1,33 @@
+"""
+Registro de várias visitas de uma só vez (ronda num hospital).
+
+As visitas compartilham data, tipo, local, assunto e membros; só o médico
+(e, se não informada, a especialidade) muda. Tudo é gravado com
+bulk_create, inclusive a tabela intermediária dos membros, e como o
+bulk_create não dispara sinais os contadores do médico (visit_stats) e os
+resumos (analytics) são atualizados aqui, também em lote.
+"""
+from django.db import transaction
+
+from . import analytics, visit_stats
+from .models import Visit
+
+
+@transaction.atomic
+def record_visit_batch(doctors, members, visit_date, visit_type, specialty=None, hospital=None,
+                       article=None, outcome=None):
+    """Cria uma visita por médico de `doctors` e devolve a lista de visitas."""
+    visits = Visit.objects.bulk_create([
+        Visit(doctor=doctor, specialty_id=specialty.pk if specialty else doctor.specialty_id,
+              hospital=hospital, visit_date=visit_date, visit_type=visit_type,
+              article=article or None, outcome=outcome or None)
+        for doctor in doctors
+    ])
+    member_ids = [member.pk for member in members]
+    Through = Visit.members.through
+    Through.objects.bulk_create([
+        Through(visit_id=visit.pk, user_id=member_id) for visit in visits for member_id in member_ids
+    ])
+    visit_stats.visits_added(visits)
+    analytics.visits_added(visits, member_ids)
+    return visits
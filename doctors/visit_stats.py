@@ -0,0 +1,77 @@
+"""
+Contadores de visitas desnormalizados no Doctor (last_visit, visit_count e
+last_visit_type).
+
+Cada gravação de Visit ajusta só o médico afetado: o total com F() +/- 1 e a
+última visita com uma leitura no índice (doctor, visit_date). O comando
+`rebuild_visit_stats` recalcula tudo num único UPDATE.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Doctor, Visit
+
+
+def refresh_last_visit(doctor_id):
+    latest = Visit.objects.filter(doctor_id=doctor_id)\
+        .order_by('-visit_date', '-id').values('visit_date', 'visit_type').first()
+    Doctor.objects.filter(pk=doctor_id).update(
+        last_visit=latest['visit_date'] if latest else None,
+        last_visit_type=latest['visit_type'] if latest else None,
+    )
+
+
+def visit_added(visit):
+    Doctor.objects.filter(pk=visit.doctor_id).update(visit_count=F('visit_count') + 1)
+    # Só substitui a última visita se esta for igual ou mais recente
+    Doctor.objects.filter(pk=visit.doctor_id)\
+        .filter(Q(last_visit__isnull=True) | Q(last_visit__lte=visit.visit_date))\
+        .update(last_visit=visit.visit_date, last_visit_type=visit.visit_type)
+
+
+def visits_added(visits):
+    """
+    visit_added para visitas gravadas com bulk_create (que não dispara
+    sinais): um UPDATE por quantidade de visitas e por (data, tipo).
+    """
+    per_doctor = defaultdict(list)
+    for visit in visits:
+        per_doctor[visit.doctor_id].append(visit)
+    by_count = defaultdict(list)
+    by_latest = defaultdict(list)
+    for doctor_id, doctor_visits in per_doctor.items():
+        by_count[len(doctor_visits)].append(doctor_id)
+        latest = max(doctor_visits, key=lambda visit: visit.visit_date)
+        by_latest[(latest.visit_date, latest.visit_type)].append(doctor_id)
+    for count, doctor_ids in by_count.items():
+        Doctor.objects.filter(pk__in=doctor_ids).update(visit_count=F('visit_count') + count)
+    for (visit_date, visit_type), doctor_ids in by_latest.items():
+        Doctor.objects.filter(pk__in=doctor_ids)\
+            .filter(Q(last_visit__isnull=True) | Q(last_visit__lte=visit_date))\
+            .update(last_visit=visit_date, last_visit_type=visit_type)
+
+
+def visit_changed(visit, previous_doctor_id):
+    if previous_doctor_id and previous_doctor_id != visit.doctor_id:
+        visit_removed(previous_doctor_id)
+        Doctor.objects.filter(pk=visit.doctor_id).update(visit_count=F('visit_count') + 1)
+    refresh_last_visit(visit.doctor_id)
+
+
+def visit_removed(doctor_id):
+    Doctor.objects.filter(pk=doctor_id).update(visit_count=Greatest(F('visit_count') - 1, Value(0)))
+    refresh_last_visit(doctor_id)
+
+
+def rebuild_visit_stats():
+    """Recalcula os campos de todos os médicos num único UPDATE com subconsultas."""
+    visits = Visit.objects.filter(doctor=OuterRef('pk')).order_by()
+    latest = visits.order_by('-visit_date', '-id')
+    total = visits.values('doctor').annotate(n=Count('id')).values('n')
+    return Doctor.objects.update(
+        visit_count=Coalesce(Subquery(total), Value(0)),
+        last_visit=Subquery(latest.values('visit_date')[:1]),
+        last_visit_type=Subquery(latest.values('visit_type')[:1]),
+    )